@@ -29,6 +29,13 @@ from services.scheduler_service import SchedulerService
 from services.layout_service import LayoutService
 from services.settings_service import SettingsService
 from services.auth_service import AuthService
+from services.browser_pool import BrowserPool
+from services.render_client import RenderClient
+from services.session_store import SessionStore
+from services.panel_cache import PanelCache
+from services.request_filter import RequestFilter
+from services.capture_workers import CaptureWorkerPool
+from services.image_preparer import ImagePreparer
 
 # Import auth routes
 from api.auth_routes import router as auth_router
@@ -45,6 +52,7 @@ from api.layout_routes import router as layout_router
 from api.report_routes import router as report_router
 from api.schedule_routes import router as schedule_router
 from api.settings_routes import router as settings_router
+from api.pdf_download import close_pdf_data
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -85,6 +93,24 @@ scheduler_service = SchedulerService("schedules")
 layout_service = LayoutService("layouts")
 settings_service = SettingsService("config", "settings.json")
 auth_service = AuthService("config", "users.json")
+browser_pool = BrowserPool()
+render_client = RenderClient()
+session_store = SessionStore("config/sessions")
+panel_cache = PanelCache("cache/panels")
+request_filter = RequestFilter()
+capture_workers = CaptureWorkerPool()
+image_preparer = ImagePreparer()
+
+# Shared services of every PDFGenerator, keyed by their constructor argument
+capture_services = {
+    "browser_pool": browser_pool,
+    "render_client": render_client,
+    "session_store": session_store,
+    "panel_cache": panel_cache,
+    "request_filter": request_filter,
+    "capture_workers": capture_workers,
+    "image_preparer": image_preparer
+}
 
 # Ein globales Dict zur Speicherung von Fortschrittsinformationen
 progress_data = {}
@@ -132,6 +158,11 @@ def update_progress(job_id, percentage, message=None):
     for job in list(progress_data.keys()):
         job_time = datetime.fromisoformat(progress_data[job]["timestamp"])
         if (current_time - job_time).total_seconds() > 1800:  # 30 Minuten
+            # Release the spooled PDF (memory or temporary file) with the job,
+            # downloads still streaming it close it when they finish
+            pdf_data = progress_data[job].get("pdf_data")
+            if pdf_data is not None:
+                close_pdf_data(pdf_data)
             del progress_data[job]
 
 # Include routers
@@ -207,6 +238,19 @@ async def startup_event():
         # as schedules may reference layouts for server_id
         scheduler_service.migrate_schedules_to_server_id(default_server_id)
         
+        # Start the shared browser pool used for panel capture
+        browser_pool.configure(app_settings.get("capture", {}))
+        await browser_pool.start()
+        render_client.configure(app_settings.get("capture", {}))
+        await render_client.start()
+        session_store.configure(app_settings.get("capture", {}))
+        panel_cache.configure(app_settings.get("capture", {}))
+        request_filter.configure(app_settings.get("capture", {}))
+        capture_workers.configure(app_settings.get("capture", {}))
+        await capture_workers.start()
+        image_preparer.configure(app_settings.get("capture", {}))
+        image_preparer.start()
+        
         # Get email settings
         email_settings = app_settings.get("email", {})
         
@@ -215,7 +259,9 @@ async def startup_event():
             grafana_service, 
             template_service, 
             layout_service,
-            email_settings=email_settings
+            email_settings=email_settings,
+            capture_services=capture_services,
+            capture_settings=app_settings.get("capture", {})
         )
         
         logger.info(f"Grafana PDF Reporter v{VERSION} started successfully")
@@ -228,6 +274,10 @@ async def shutdown_event():
     logger.info("Shutting down application...")
     try:
         await scheduler_service.shutdown()
+        await browser_pool.stop()
+        await render_client.stop()
+        await capture_workers.stop()
+        image_preparer.stop()
         logger.info("Application shutdown complete")
     except Exception as e:
         logger.error(f"Error during shutdown: {str(e)}")
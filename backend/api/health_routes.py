@@ -47,4 +47,64 @@ async def queue_status():
         return {
             "status": "error",
             "message": "Scheduler service not initialized"
-        }
\ No newline at end of file
+        }
+
+@router.get("/health/browser")
+async def browser_pool_status():
+    """Get health and statistics of the shared browser pool"""
+    from api.api_controller import browser_pool, session_store, request_filter
+    
+    if browser_pool:
+        status = await browser_pool.health_check()
+        if session_store:
+            status["sessions"] = {**session_store.stats, "persist": session_store.persist}
+        if request_filter:
+            status["requests"] = request_filter.get_stats()
+        return status
+    else:
+        return {
+            "status": "error",
+            "message": "Browser pool not initialized"
+        }
+
+@router.get("/health/render")
+async def render_client_status():
+    """Get statistics of the Grafana render endpoint client"""
+    from api.api_controller import render_client
+    
+    if render_client:
+        return {"status": "ok", **render_client.get_stats()}
+    else:
+        return {
+            "status": "error",
+            "message": "Render client not initialized"
+        }
+
+@router.get("/health/workers")
+async def capture_workers_status():
+    """Get state and statistics of the capture worker processes"""
+    from api.api_controller import capture_workers, image_preparer
+    
+    if capture_workers:
+        status = {"status": "ok", **capture_workers.get_stats()}
+        if image_preparer:
+            status["image_preparer"] = image_preparer.get_stats()
+        return status
+    else:
+        return {
+            "status": "error",
+            "message": "Capture workers not initialized"
+        }
+
+@router.get("/health/cache")
+async def panel_cache_status():
+    """Get hit/miss statistics of the panel image cache"""
+    from api.api_controller import panel_cache
+    
+    if panel_cache:
+        return {"status": "ok", **panel_cache.get_stats()}
+    else:
+        return {
+            "status": "error",
+            "message": "Panel cache not initialized"
+        }
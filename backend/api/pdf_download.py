@@ -0,0 +1,150 @@
+import os
+import sys
+import logging
+import threading
+import weakref
+from fastapi import HTTPException
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(os.environ.get('LOGLEVEL', 'DEBUG').upper())
+formatter = logging.Formatter("%(asctime)s [%(levelname)5s] %(name)30s: %(message)s")
+stream_handler = logging.StreamHandler(sys.stdout)
+stream_handler.setFormatter(formatter)
+logger.addHandler(stream_handler)
+
+
+# Concurrent downloads of a job share the read position of its PDF file
+pdf_read_lock = threading.Lock()
+PDF_CHUNK_SIZE = 256 * 1024
+
+# Open downloads per PDF file, an expired job closes its file after the last one
+pdf_readers = {}
+pdf_close_pending = set()
+
+def open_pdf_reader(pdf_data) -> bool:
+    """
+    Register a download of a generated PDF
+    
+    Args:
+        pdf_data: PDF file object returned by PDFGenerator.generate_report
+    
+    Returns:
+        True if the PDF can be read, False if its job has expired
+    """
+    with pdf_read_lock:
+        if pdf_data.closed or id(pdf_data) in pdf_close_pending:
+            return False
+        pdf_readers[id(pdf_data)] = pdf_readers.get(id(pdf_data), 0) + 1
+        return True
+
+def release_pdf_reader(pdf_data):
+    """
+    Unregister a download of a generated PDF, closes the file if its job expired meanwhile
+    
+    Args:
+        pdf_data: PDF file object passed to open_pdf_reader
+    """
+    with pdf_read_lock:
+        readers = pdf_readers.pop(id(pdf_data), 1) - 1
+        if readers > 0:
+            pdf_readers[id(pdf_data)] = readers
+            return
+        if id(pdf_data) not in pdf_close_pending:
+            return
+        pdf_close_pending.discard(id(pdf_data))
+        pdf_data.close()
+    logger.debug("Closed PDF of an expired job after its last download")
+
+def close_pdf_data(pdf_data):
+    """
+    Close the PDF of an expired job, deferred while downloads are still reading it
+    
+    Args:
+        pdf_data: PDF file object returned by PDFGenerator.generate_report
+    """
+    with pdf_read_lock:
+        if pdf_readers.get(id(pdf_data)):
+            pdf_close_pending.add(id(pdf_data))
+            return
+        pdf_data.close()
+
+def iter_pdf_data(pdf_data, start: int = 0, end: int = None):
+    """
+    Read a generated PDF in chunks for a StreamingResponse
+    
+    Args:
+        pdf_data: PDF file object returned by PDFGenerator.generate_report
+        start: First byte to read
+        end: Byte after the last one to read, None reads to the end
+    
+    Yields:
+        Chunks of the PDF
+    """
+    offset = start
+    while end is None or offset < end:
+        size = PDF_CHUNK_SIZE if end is None else min(PDF_CHUNK_SIZE, end - offset)
+        with pdf_read_lock:
+            pdf_data.seek(offset)
+            chunk = pdf_data.read(size)
+        if not chunk:
+            break
+        offset += len(chunk)
+        yield chunk
+
+def stream_pdf_data(pdf_data, start: int = 0, end: int = None):
+    """
+    Read a PDF registered with open_pdf_reader, released once the response is done with it
+    
+    Args:
+        pdf_data: PDF file object passed to open_pdf_reader
+        start: First byte to read
+        end: Byte after the last one to read, None reads to the end
+    
+    Returns:
+        Generator of PDF chunks
+    """
+    chunks = iter_pdf_data(pdf_data, start, end)
+    # Also released when the client disconnects before or during the download
+    weakref.finalize(chunks, release_pdf_reader, pdf_data)
+    return chunks
+
+def get_pdf_size(pdf_data) -> int:
+    """Get the size of a generated PDF in bytes"""
+    with pdf_read_lock:
+        pdf_data.seek(0, os.SEEK_END)
+        return pdf_data.tell()
+
+def parse_range(range_header: str, size: int):
+    """
+    Parse the Range header of a download, only single byte ranges are served partially
+    
+    Args:
+        range_header: Value of the Range header, e.g. "bytes=0-1023", "bytes=1024-" or "bytes=-500"
+        size: Size of the file in bytes
+    
+    Returns:
+        Tuple (start, end) with end exclusive, or None to serve the whole file
+    
+    Raises:
+        HTTPException: 416 if the range lies outside the file
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) + 1 if last else size
+        else:
+            # Suffix range, the last bytes of the file
+            start = max(0, size - int(last))
+            end = size
+    except ValueError:
+        return None
+    end = min(end, size)
+    if start >= size or start >= end:
+        raise HTTPException(status_code=416, detail="Requested range not satisfiable",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
@@ -4,15 +4,16 @@ import uuid
 import logging
 import asyncio
 import json
-from fastapi import APIRouter, Depends, HTTPException, Body, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Body, BackgroundTasks, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 from datetime import datetime
 from io import BytesIO
 
-# Create PDF generator directly instead of using the factory
+# PDF generators are created from the shared capture services of api_controller
 from services.pdf_generator import PDFGenerator
+from api.pdf_download import open_pdf_reader, release_pdf_reader, stream_pdf_data, get_pdf_size, parse_range
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -45,11 +46,17 @@ async def get_template_service():
     from api.api_controller import template_service
     return template_service
 
+# Dependency to get the shared services passed to each PDFGenerator
+async def get_capture_services():
+    from api.api_controller import capture_services
+    return capture_services
+
 @router.post("/preview")
 async def generate_preview(
     request_data: dict = Body(...),
     grafana_service = Depends(get_grafana_service),
-    template_service = Depends(get_template_service)
+    template_service = Depends(get_template_service),
+    capture_services = Depends(get_capture_services)
 ):
     """Generate a preview of the report"""
     logger.debug(f"Generating preview for layout with {len(request_data.get('panels', []))} panels")
@@ -109,15 +116,12 @@ async def generate_preview(
         grafana_conn = grafana_service.get_connection_info()
     
     try:
-        # Get URLs for grafana connection from the current server context
-        grafana_url = grafana_conn.get("url")
-        grafana_username = grafana_conn.get("username")
-        grafana_password = grafana_conn.get("password")
+        capture_backend = grafana_service.get_server_option("captureBackend", "playwright")
         
-        logger.info(f"Creating PDF Generator with Grafana URL: {grafana_url}")
+        logger.info(f"Creating PDF Generator with Grafana URL: {grafana_conn.get('url')}")
         
-        # Create PDF generator directly
-        pdf_generator = PDFGenerator(grafana_url, grafana_username, grafana_password)
+        # Create PDF generator for the current server context
+        pdf_generator = PDFGenerator.from_connection(grafana_conn, capture_backend, capture_services)
         await pdf_generator.initialize()
         
         try:
@@ -136,6 +140,10 @@ async def generate_preview(
             progress_data[job_id]["pdf_data"] = pdf_data
             progress_data[job_id]["percentage"] = 100
             progress_data[job_id]["message"] = "PDF generation complete"
+            progress_data[job_id]["failed_panels"] = pdf_generator.failed_panels
+            progress_data[job_id]["capture_stats"] = pdf_generator.capture_stats
+            if pdf_generator.failed_panels:
+                logger.warning(f"Preview {job_id}: {len(pdf_generator.failed_panels)} panels could not be captured")
             progress_data[job_id]["server_id"] = server_id
             
             # Add 100% to history
@@ -156,7 +164,9 @@ async def generate_preview(
                 "job_id": job_id,
                 "status": "completed",
                 "download_url": f"/api/download/{job_id}",
-                "server_id": server_id
+                "server_id": server_id,
+                "failed_panels": pdf_generator.failed_panels,
+                "capture_stats": pdf_generator.capture_stats
             }
         finally:
             # Make sure to close the PDF generator
@@ -191,21 +201,55 @@ async def generate_preview(
             grafana_service.set_current_server(original_server)
 
 @router.get("/download/{job_id}")
-async def download_pdf(job_id: str):
-    """Download a generated PDF file"""
+async def download_pdf(job_id: str, request: Request):
+    """Download a generated PDF file, byte ranges are served for viewers loading it in parts"""
     logger.info(f"Download requested for job {job_id}")
     progress_data = get_progress_data()
     
     # Prüfen, ob das PDF im progress_data verfügbar ist
-    if job_id in progress_data and "pdf_data" in progress_data[job_id]:
+    # An expired job keeps its PDF open until downloads reading it are done
+    if (job_id in progress_data and "pdf_data" in progress_data[job_id]
+            and open_pdf_reader(progress_data[job_id]["pdf_data"])):
         pdf_data = progress_data[job_id]["pdf_data"]
         filename = f"grafana-report-{datetime.now().strftime('%Y%m%d-%H%M%S')}.pdf"
         
+        try:
+            size = get_pdf_size(pdf_data)
+            headers = {
+                "Content-Disposition": f"attachment; filename={filename}",
+                "Accept-Ranges": "bytes",
+                # The PDF of a job never changes
+                "ETag": f'"{job_id}"'
+            }
+            
+            byte_range = None
+            range_header = request.headers.get("range")
+            if_range = request.headers.get("if-range")
+            if range_header and (not if_range or if_range == headers["ETag"]):
+                byte_range = parse_range(range_header, size)
+        except BaseException:
+            release_pdf_reader(pdf_data)
+            raise
+        
+        # Streamed from the spooled file, the PDF is not copied into memory per download
+        if byte_range:
+            start, end = byte_range
+            logger.debug(f"Serving bytes {start}-{end - 1} of PDF for job {job_id}")
+            headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+            headers["Content-Length"] = str(end - start)
+            return StreamingResponse(
+                stream_pdf_data(pdf_data, start, end),
+                status_code=206,
+                media_type="application/pdf",
+                headers=headers
+            )
+        
         logger.info(f"Serving PDF for job {job_id} with filename {filename}")
+        headers["Content-Length"] = str(size)
         return StreamingResponse(
-            pdf_data, 
+            stream_pdf_data(pdf_data),
             media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+            headers=headers
         )
     else:
         logger.warning(f"PDF not found for job {job_id}")
@@ -222,7 +266,8 @@ async def download_pdf(job_id: str):
 async def export_report(
     request_data: dict = Body(...),
     grafana_service = Depends(get_grafana_service),
-    template_service = Depends(get_template_service)
+    template_service = Depends(get_template_service),
+    capture_services = Depends(get_capture_services)
 ):
     """Generate and export a PDF report"""
     logger.debug(f"Exporting report for layout with {len(request_data.get('panels', []))} panels")
@@ -271,15 +316,12 @@ async def export_report(
             logger.info(f"Job {job_id} was cancelled before starting PDF generation")
             raise HTTPException(status_code=400, detail="Report generation cancelled by user")
         
-        # Get URLs for grafana connection from the current server context
-        grafana_url = grafana_conn.get("url")
-        grafana_username = grafana_conn.get("username")
-        grafana_password = grafana_conn.get("password")
+        capture_backend = grafana_service.get_server_option("captureBackend", "playwright")
         
-        logger.info(f"Creating PDF Generator with Grafana URL: {grafana_url}")
+        logger.info(f"Creating PDF Generator with Grafana URL: {grafana_conn.get('url')}")
         
-        # Create PDF generator directly
-        pdf_generator = PDFGenerator(grafana_url, grafana_username, grafana_password)
+        # Create PDF generator for the current server context
+        pdf_generator = PDFGenerator.from_connection(grafana_conn, capture_backend, capture_services)
         await pdf_generator.initialize()
         
         try:
@@ -316,6 +358,10 @@ async def export_report(
             progress_data[job_id]["pdf_data"] = pdf_data
             progress_data[job_id]["percentage"] = 100
             progress_data[job_id]["message"] = "PDF export complete"
+            progress_data[job_id]["failed_panels"] = pdf_generator.failed_panels
+            progress_data[job_id]["capture_stats"] = pdf_generator.capture_stats
+            if pdf_generator.failed_panels:
+                logger.warning(f"Report {job_id}: {len(pdf_generator.failed_panels)} panels could not be captured")
             
             # Add 100% to history if not already there
             if "history" in progress_data[job_id]:
@@ -339,7 +385,9 @@ async def export_report(
                 "job_id": job_id,
                 "status": "completed",
                 "download_url": f"/api/download/{job_id}",
-                "server_id": server_id
+                "server_id": server_id,
+                "failed_panels": pdf_generator.failed_panels,
+                "capture_stats": pdf_generator.capture_stats
             }
         finally:
             # Make sure to close the PDF generator to release resources
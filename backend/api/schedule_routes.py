@@ -152,6 +152,7 @@ async def download_history_report(
         logger.warning(f"History report file {file_path} not found")
         raise HTTPException(status_code=404, detail="Report file not found")
     
+    # FileResponse answers Range requests itself, viewers can load the report in parts
     return FileResponse(
         file_path,
         media_type="application/pdf",
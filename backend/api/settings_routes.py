@@ -78,9 +78,10 @@ async def apply_settings():
     logger.debug("Applying settings to running services")
     try:
         # Import here to avoid circular imports
-        from api.api_controller import grafana_service, scheduler_service, settings_service
+        from api.api_controller import grafana_service, scheduler_service, settings_service, browser_pool, render_client, session_store, panel_cache, request_filter, capture_workers, image_preparer
         
-        # Load current settings
+        # Load current settings, dropping values compiled from an older settings file
+        settings_service.invalidate_cache()
         app_settings = settings_service.get_decrypted_settings()  # Use decrypted settings
         
         # Apply multi-server configuration
@@ -98,10 +99,32 @@ async def apply_settings():
             if not success:
                 logger.warning("Failed to update Grafana configuration")
         
+        # Apply capture settings and drop contexts logged in with old credentials
+        if browser_pool:
+            browser_pool.configure(app_settings.get("capture", {}))
+            await browser_pool.invalidate_contexts()
+        if render_client:
+            render_client.configure(app_settings.get("capture", {}))
+        if session_store:
+            session_store.configure(app_settings.get("capture", {}))
+            session_store.invalidate()
+        if panel_cache:
+            panel_cache.configure(app_settings.get("capture", {}))
+        if request_filter:
+            request_filter.configure(app_settings.get("capture", {}))
+        if capture_workers:
+            # Workers hold contexts logged in with the old credentials
+            capture_workers.configure(app_settings.get("capture", {}))
+            await capture_workers.restart()
+        if image_preparer:
+            image_preparer.configure(app_settings.get("capture", {}))
+            image_preparer.restart()
+        
         # Apply email settings if Scheduler service is initialized
         if scheduler_service:
             email_settings = app_settings.get("email", {})
             scheduler_service.update_email_settings(email_settings)
+            scheduler_service.update_capture_settings(app_settings.get("capture", {}))
         
         return {"status": "settings applied"}
     except Exception as e:
@@ -233,6 +256,13 @@ async def update_grafana_server(
     was_default = settings["grafana_servers"][server_index].get("is_default", False)
     will_be_default = server.get("is_default", was_default)
     
+    # Keep per-server settings that are not part of the request
+    server = {**settings["grafana_servers"][server_index], **server}
+    
+    # An apiToken of null removes the stored token, the server logs in with username and password again
+    if "apiToken" in server and server["apiToken"] is None:
+        del server["apiToken"]
+    
     # Ensure server ID doesn't change
     server["id"] = server_id
     
@@ -330,7 +360,8 @@ async def test_grafana_server_connection(
         server_id,
         settings.get("url"),
         settings.get("username"),
-        settings.get("password")
+        settings.get("password"),
+        api_token=settings.get("apiToken") or None
     )
     
     if success:
@@ -0,0 +1,357 @@
+import os
+import sys
+import asyncio
+import logging
+from typing import Dict, Any, List, Callable, Awaitable
+from datetime import datetime
+from playwright.async_api import async_playwright, BrowserContext
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(os.environ.get('LOGLEVEL', 'DEBUG').upper())
+formatter = logging.Formatter("%(asctime)s [%(levelname)5s] %(name)30s: %(message)s")
+stream_handler = logging.StreamHandler(sys.stdout)
+stream_handler.setFormatter(formatter)
+logger.addHandler(stream_handler)
+
+class BrowserPool:
+    """Long-lived Chromium pool handing out logged-in browser contexts per Grafana server"""
+
+    def __init__(self, max_pages_per_browser: int = 500, enabled: bool = True):
+        """
+        Initialize Browser Pool
+
+        Args:
+            max_pages_per_browser: Number of pages a browser may open before it is recycled
+            enabled: Whether the pool should be used at all
+        """
+        self.max_pages_per_browser = max_pages_per_browser
+        self.enabled = enabled
+
+        self._playwright = None
+        self._loop = None
+        self._lock = None
+        self._browser = None      # Entry of the browser used for new contexts
+        self._retired = []        # Entries of recycled browsers still having leased contexts
+        self._contexts = {}       # Context key -> context entry
+        self._context_entries = {}  # Context object -> context entry, including stale ones
+
+        self.stats = {
+            "browsers_launched": 0,
+            "browsers_recycled": 0,
+            "contexts_created": 0,
+            "contexts_reused": 0,
+            "pages_opened": 0,
+            "health_check_failures": 0,
+            "browser_crashes": 0
+        }
+
+    def configure(self, capture_settings: Dict[str, Any]):
+        """
+        Apply capture settings to the pool
+
+        Args:
+            capture_settings: "capture" section of the application settings
+        """
+        if not capture_settings:
+            return
+        self.enabled = capture_settings.get("browserPool", self.enabled)
+        self.max_pages_per_browser = int(capture_settings.get("maxPagesPerBrowser", self.max_pages_per_browser))
+        logger.debug(f"Browser pool configured: enabled={self.enabled}, max_pages_per_browser={self.max_pages_per_browser}")
+
+    async def start(self):
+        """Start Playwright and launch the first browser"""
+        if not self.enabled:
+            logger.info("Browser pool disabled, each report will launch its own browser")
+            return
+        if self._playwright:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._lock = asyncio.Lock()
+        try:
+            self._playwright = await async_playwright().start()
+            async with self._lock:
+                await self._launch_browser()
+            logger.info("Browser pool started")
+        except Exception as e:
+            logger.error(f"Error starting browser pool: {str(e)}")
+            await self.stop()
+
+    async def stop(self):
+        """Close all contexts and browsers and stop Playwright"""
+        entries = list(self._retired)
+        if self._browser:
+            entries.append(self._browser)
+
+        for context_entry in list(self._context_entries.values()):
+            await self._close_context(context_entry)
+        self._contexts = {}
+        self._context_entries = {}
+
+        for entry in entries:
+            await self._close_browser(entry)
+        self._browser = None
+        self._retired = []
+
+        if self._playwright:
+            try:
+                await self._playwright.stop()
+            except Exception as e:
+                logger.warning(f"Error stopping Playwright: {str(e)}")
+            self._playwright = None
+            logger.info("Browser pool stopped")
+        self._loop = None
+
+    def is_available(self) -> bool:
+        """
+        Check if the pool can hand out contexts to the caller
+
+        Playwright objects are bound to the event loop they were created in,
+        so the pool is only usable from the loop it was started on.
+
+        Returns:
+            True if the pool is running on the current event loop
+        """
+        if not self.enabled or not self._playwright:
+            return False
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    async def acquire_context(self, key: str, login: Callable[[BrowserContext], Awaitable[None]],
+                              context_options: Dict[str, Any] = None) -> BrowserContext:
+        """
+        Get a logged-in browser context for a Grafana server
+
+        Args:
+            key: Context key identifying the Grafana server, user and context options
+            login: Coroutine function logging a fresh context in to Grafana
+            context_options: Optional Playwright new_context options (e.g. device_scale_factor)
+
+        Returns:
+            Playwright browser context, must be handed back with release_context
+        """
+        async with self._lock:
+            await self._ensure_browser()
+
+            context_entry = self._contexts.get(key)
+            if context_entry and context_entry["browser"] is not self._browser:
+                # Context lives on a recycled browser, new work goes to the current one
+                self._contexts.pop(key)
+                context_entry = None
+
+            if context_entry:
+                self.stats["contexts_reused"] += 1
+                logger.debug(f"Reusing browser context for '{key}'")
+            else:
+                context_entry = await self._create_context(key, login, context_options)
+                self._contexts[key] = context_entry
+
+            context_entry["leases"] += 1
+            context_entry["browser"]["leases"] += 1
+            context_entry["last_used"] = datetime.now().isoformat()
+            return context_entry["context"]
+
+    async def release_context(self, key: str, context: BrowserContext):
+        """
+        Hand a context obtained with acquire_context back to the pool
+
+        Args:
+            key: Context key used when acquiring
+            context: The context to release
+        """
+        async with self._lock:
+            context_entry = self._context_entries.get(context)
+            if not context_entry:
+                logger.warning(f"Released unknown browser context for '{key}'")
+                return
+
+            context_entry["leases"] = max(0, context_entry["leases"] - 1)
+            browser_entry = context_entry["browser"]
+            browser_entry["leases"] = max(0, browser_entry["leases"] - 1)
+
+            # Drop contexts that are no longer handed out
+            if context_entry.get("stale") and context_entry["leases"] == 0:
+                await self._close_context(context_entry)
+
+            # Close recycled browsers once their last lease is gone
+            if browser_entry["retired"] and browser_entry["leases"] == 0:
+                self._retired = [b for b in self._retired if b is not browser_entry]
+                await self._close_browser(browser_entry)
+
+    async def invalidate_contexts(self):
+        """Drop all cached contexts, e.g. after Grafana credentials changed"""
+        if not self._lock:
+            return
+        async with self._lock:
+            for key, context_entry in list(self._contexts.items()):
+                self._contexts.pop(key)
+                if context_entry["leases"] == 0:
+                    await self._close_context(context_entry)
+                else:
+                    context_entry["stale"] = True
+            logger.info("Browser pool contexts invalidated")
+
+    async def health_check(self) -> Dict[str, Any]:
+        """
+        Check that the current browser is alive and relaunch it if necessary
+
+        Returns:
+            Dict with health status and pool stats
+        """
+        if not self.enabled:
+            return {"status": "disabled", **self.get_stats()}
+        if not self._playwright:
+            return {"status": "stopped", **self.get_stats()}
+
+        async with self._lock:
+            healthy = self._browser is not None and self._browser["browser"].is_connected()
+            if not healthy:
+                self.stats["health_check_failures"] += 1
+                logger.warning("Browser pool health check failed, relaunching browser")
+                await self._ensure_browser()
+
+        return {"status": "ok" if healthy else "recovered", **self.get_stats()}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get pool statistics
+
+        Returns:
+            Dict with counters and current pool state
+        """
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "running": self._playwright is not None,
+            "max_pages_per_browser": self.max_pages_per_browser,
+            "current_browser_pages": self._browser["pages"] if self._browser else 0,
+            "current_browser_leases": self._browser["leases"] if self._browser else 0,
+            "retired_browsers": len(self._retired),
+            "contexts": {
+                key: {
+                    "leases": entry["leases"],
+                    "created": entry["created"],
+                    "last_used": entry["last_used"]
+                }
+                for key, entry in self._contexts.items()
+            }
+        }
+
+    async def _ensure_browser(self):
+        """Make sure a connected, non-exhausted browser is available (lock must be held)"""
+        if self._browser and not self._browser["browser"].is_connected():
+            logger.warning("Pooled browser is disconnected, launching a new one")
+            for context_entry in self._drop_browser_contexts(self._browser):
+                await self._close_context(context_entry)
+            self._browser = None
+
+        if self._browser and self._browser["pages"] >= self.max_pages_per_browser:
+            logger.info(f"Browser opened {self._browser['pages']} pages, recycling")
+            self.stats["browsers_recycled"] += 1
+            for context_entry in self._drop_browser_contexts(self._browser):
+                await self._close_context(context_entry)
+            old_browser = self._browser
+            self._browser = None
+            if old_browser["leases"] == 0:
+                await self._close_browser(old_browser)
+            else:
+                old_browser["retired"] = True
+                self._retired.append(old_browser)
+
+        if not self._browser:
+            await self._launch_browser()
+
+    async def _launch_browser(self):
+        """Launch a new Chromium instance (lock must be held)"""
+        # https://github.com/microsoft/playwright-python/issues/2820
+        browser = await self._playwright.chromium.launch(headless=True, channel="chromium")
+        browser_entry = {
+            "browser": browser,
+            "pages": 0,
+            "leases": 0,
+            "retired": False,
+            "closing": False,
+            "launched": datetime.now().isoformat()
+        }
+
+        def on_disconnected(_):
+            # Crash or OOM kill: contexts of the browser must not be handed out again
+            if browser_entry["closing"]:
+                return
+            self.stats["browser_crashes"] += 1
+            logger.error("Pooled Chromium browser disconnected unexpectedly")
+            # Idle contexts died with the browser, there is nothing left to close
+            for context_entry in self._drop_browser_contexts(browser_entry):
+                self._context_entries.pop(context_entry["context"], None)
+            if self._browser is browser_entry:
+                self._browser = None
+            self._retired = [b for b in self._retired if b is not browser_entry]
+
+        browser.on("disconnected", on_disconnected)
+        self._browser = browser_entry
+        self.stats["browsers_launched"] += 1
+        logger.info("Launched pooled Chromium browser")
+
+    async def _create_context(self, key: str, login: Callable[[BrowserContext], Awaitable[None]],
+                              context_options: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Create and log in a new context on the current browser (lock must be held)"""
+        browser_entry = self._browser
+        context = await browser_entry["browser"].new_context(ignore_https_errors=True, **(context_options or {}))
+
+        def on_page(page):
+            browser_entry["pages"] += 1
+            self.stats["pages_opened"] += 1
+
+        context.on("page", on_page)
+
+        try:
+            await login(context)
+        except Exception:
+            await context.close()
+            raise
+
+        self.stats["contexts_created"] += 1
+        logger.info(f"Created pooled browser context for '{key}'")
+        now = datetime.now().isoformat()
+        context_entry = {
+            "key": key,
+            "context": context,
+            "browser": browser_entry,
+            "leases": 0,
+            "stale": False,
+            "created": now,
+            "last_used": now
+        }
+        self._context_entries[context] = context_entry
+        return context_entry
+
+    def _drop_browser_contexts(self, browser_entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Remove all contexts of a browser from the key map, returning the idle ones (leased ones close on release)"""
+        idle = []
+        for key, context_entry in list(self._contexts.items()):
+            if context_entry["browser"] is browser_entry:
+                self._contexts.pop(key)
+                context_entry["stale"] = True
+                if context_entry["leases"] == 0:
+                    idle.append(context_entry)
+        return idle
+
+    async def _close_context(self, context_entry: Dict[str, Any]):
+        """Close a context, ignoring errors from already dead browsers"""
+        self._context_entries.pop(context_entry["context"], None)
+        try:
+            await context_entry["context"].close()
+        except Exception as e:
+            logger.debug(f"Error closing browser context '{context_entry['key']}': {str(e)}")
+
+    async def _close_browser(self, browser_entry: Dict[str, Any]):
+        """Close a browser, ignoring errors from already dead browsers"""
+        browser_entry["closing"] = True
+        try:
+            await browser_entry["browser"].close()
+            logger.info("Closed pooled Chromium browser")
+        except Exception as e:
+            logger.debug(f"Error closing browser: {str(e)}")
@@ -0,0 +1,468 @@
+import os
+import sys
+import time
+import queue
+import asyncio
+import logging
+import itertools
+import threading
+import multiprocessing
+from typing import Dict, Any, List, Tuple
+from io import BytesIO
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(os.environ.get('LOGLEVEL', 'DEBUG').upper())
+formatter = logging.Formatter("%(asctime)s [%(levelname)5s] %(name)30s: %(message)s")
+stream_handler = logging.StreamHandler(sys.stdout)
+stream_handler.setFormatter(formatter)
+logger.addHandler(stream_handler)
+
+class CaptureWorkerPool:
+    """Separate capture processes, each running its own Chromium, fed with panel captures over a local queue"""
+
+    # A worker hands its pooled context back after this many tasks, so the browser pool can
+    # recycle the browser, and drops contexts of connections unused for this many seconds
+    GENERATOR_MAX_TASKS = 50
+    GENERATOR_IDLE_SECONDS = 300
+
+    def __init__(self, workers: int = 0, pages_per_worker: int = 2):
+        """
+        Initialize Capture Worker Pool
+
+        Args:
+            workers: Number of worker processes, 0 captures panels in the API process
+            pages_per_worker: Number of captures a worker runs at the same time
+        """
+        self.workers = workers
+        self.pages_per_worker = pages_per_worker
+        self.capture_settings = {}
+
+        self._loop = None
+        self._mp_context = multiprocessing.get_context("spawn")
+        self._task_queue = None
+        self._result_queue = None
+        self._processes = {}      # Worker ID -> process
+        self._pending = {}        # Task ID -> future of the capture
+        self._task_workers = {}   # Task ID -> ID of the worker running it
+        self._task_ids = itertools.count(1)
+        self._reader = None
+        self._stopping = False
+
+        self.stats = {
+            "tasks": 0,
+            "failures": 0,
+            "worker_restarts": 0
+        }
+
+    def configure(self, capture_settings: Dict[str, Any]):
+        """
+        Apply capture settings to the pool, running workers pick them up after restart
+
+        Args:
+            capture_settings: "capture" section of the application settings
+        """
+        if not capture_settings:
+            return
+        self.workers = max(0, int(capture_settings.get("captureWorkers", self.workers)))
+        self.pages_per_worker = max(1, int(capture_settings.get("captureWorkerPages", self.pages_per_worker)))
+        self.capture_settings = dict(capture_settings)
+        logger.debug(f"Capture workers configured: workers={self.workers}, pages_per_worker={self.pages_per_worker}")
+
+    async def start(self):
+        """Start the worker processes and the thread collecting their results"""
+        if self.workers <= 0:
+            logger.info("Capture workers disabled, panels are captured in the API process")
+            return
+        if self._processes:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        self._task_queue = self._mp_context.Queue()
+        self._result_queue = self._mp_context.Queue()
+        for worker_id in range(self.workers):
+            self._start_worker(worker_id)
+
+        self._reader = threading.Thread(target=self._read_results, name="capture-worker-results", daemon=True)
+        self._reader.start()
+        logger.info(f"Started {self.workers} capture worker processes")
+
+    async def stop(self):
+        """Stop the worker processes, failing captures that are still queued"""
+        if not self._processes:
+            return
+
+        self._stopping = True
+        for _ in self._processes:
+            self._task_queue.put(None)
+        for worker_id, process in list(self._processes.items()):
+            await asyncio.to_thread(process.join, 30)
+            if process.is_alive():
+                logger.warning(f"Capture worker {worker_id} did not stop, terminating it")
+                process.terminate()
+                await asyncio.to_thread(process.join, 5)
+        self._processes = {}
+
+        self._result_queue.put(None)
+        await asyncio.to_thread(self._reader.join, 5)
+        self._reader = None
+
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(Exception("Capture workers stopped"))
+        self._pending = {}
+        self._task_workers = {}
+        self._task_queue = None
+        self._result_queue = None
+        self._loop = None
+        logger.info("Capture workers stopped")
+
+    async def restart(self):
+        """Restart the workers, e.g. after capture settings or Grafana credentials changed"""
+        await self.stop()
+        await self.start()
+
+    def is_available(self) -> bool:
+        """
+        Check if captures can be handed to the workers from the current event loop
+
+        Returns:
+            True if workers are running and were started on the current event loop
+        """
+        if not self._processes or self._stopping:
+            return False
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    async def capture_panel(self, connection: Dict[str, Any], panel_url: str, width: int, height: int,
+                            grafana_version: str, selector: str = None, vector: bool = False,
+                            encoding: Dict[str, Any] = None, capture_settings: Dict[str, Any] = None,
+                            timeout: float = None, timings: Dict[str, float] = None) -> BytesIO:
+        """
+        Capture a panel in one of the worker processes
+
+        Args:
+            connection: Grafana connection (grafana_url, username, password, api_token)
+            panel_url: URL to the panel
+            width: Desired width
+            height: Desired height
+            grafana_version: Grafana version
+            selector: Grafana selector for the version, resolved in the API process
+            vector: Print the panel to a one-page PDF instead of taking a screenshot
+            encoding: Image encoding of the report, PNG if not given
+            capture_settings: Capture settings of the report
+            timeout: Time in seconds the worker may spend on the capture
+            timings: Optional dict, the worker's screenshot and encoding time is added to its "encode_seconds"
+
+        Returns:
+            BytesIO object containing the panel image (PNG, JPEG, WebP or PDF)
+        """
+        data = await self._submit(timings, {
+            "kind": "panel",
+            "connection": connection,
+            "url": panel_url,
+            "width": width,
+            "height": height,
+            "grafana_version": grafana_version,
+            "selector": selector,
+            "vector": vector,
+            "encoding": encoding,
+            "capture_settings": capture_settings or self.capture_settings,
+            "timeout": timeout
+        })
+        return BytesIO(data)
+
+    async def capture_dashboard_panels(self, connection: Dict[str, Any], dashboard_url: str, panel_ids: List[Any],
+                                       width: int, encoding: Dict[str, Any] = None,
+                                       capture_settings: Dict[str, Any] = None, timeout: float = None,
+                                       timings: Dict[str, float] = None,
+                                       panel_sizes: Dict[str, Tuple[int, int]] = None) -> Dict[str, BytesIO]:
+        """
+        Capture several panels from one load of the full dashboard in one of the worker processes
+
+        Args:
+            connection: Grafana connection (grafana_url, username, password, api_token)
+            dashboard_url: Kiosk mode URL of the dashboard
+            panel_ids: IDs of the panels to capture
+            width: Viewport width of the dashboard
+            encoding: Image encoding of the report, PNG if not given
+            capture_settings: Capture settings of the report
+            timeout: Time in seconds the worker may spend on the capture
+            timings: Optional dict, the worker's screenshot and encoding time is added to its "encode_seconds"
+            panel_sizes: Optional dict of panel ID (as string) to the CSS pixel size of its PDF cell
+
+        Returns:
+            Dict of panel ID (as string) to BytesIO image, panels not found on the dashboard are missing
+        """
+        images = await self._submit(timings, {
+            "kind": "dashboard",
+            "connection": connection,
+            "url": dashboard_url,
+            "panel_ids": list(panel_ids),
+            "width": width,
+            "panel_sizes": panel_sizes,
+            "encoding": encoding,
+            "capture_settings": capture_settings or self.capture_settings,
+            "timeout": timeout
+        })
+        return {panel_id: BytesIO(data) for panel_id, data in images.items()}
+
+    async def prewarm_dashboard(self, connection: Dict[str, Any], dashboard_url: str, width: int,
+                                capture_settings: Dict[str, Any] = None, timeout: float = None):
+        """
+        Log in and load a dashboard in one of the worker processes ahead of a scheduled report
+
+        Args:
+            connection: Grafana connection (grafana_url, username, password, api_token)
+            dashboard_url: Kiosk mode URL of the dashboard
+            width: Viewport width
+            capture_settings: Capture settings of the report
+            timeout: Time in seconds the worker may spend on the dashboard
+        """
+        await self._submit(None, {
+            "kind": "prewarm",
+            "connection": connection,
+            "url": dashboard_url,
+            "width": width,
+            "capture_settings": capture_settings or self.capture_settings,
+            "timeout": timeout
+        })
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get worker statistics
+
+        Returns:
+            Dict with counters and current worker state
+        """
+        return {
+            **self.stats,
+            "workers": self.workers,
+            "pages_per_worker": self.pages_per_worker,
+            "running": len(self._processes),
+            "queued": len(self._pending) - len(self._task_workers),
+            "in_progress": len(self._task_workers)
+        }
+
+    async def _submit(self, timings: Dict[str, float], task: Dict[str, Any]):
+        """Queue a task for the workers and wait for its result"""
+        task_id = next(self._task_ids)
+        future = self._loop.create_future()
+        self._pending[task_id] = future
+        self.stats["tasks"] += 1
+        try:
+            self._task_queue.put({**task, "id": task_id})
+            result, encode_seconds = await future
+            if timings is not None:
+                timings["encode_seconds"] = timings.get("encode_seconds", 0.0) + encode_seconds
+            return result
+        except Exception:
+            self.stats["failures"] += 1
+            raise
+        finally:
+            # A cancelled capture is still finished by its worker, the result is dropped
+            self._pending.pop(task_id, None)
+            self._task_workers.pop(task_id, None)
+
+    def _start_worker(self, worker_id: int):
+        """Launch the process of a worker slot"""
+        process = self._mp_context.Process(
+            target=_run_worker,
+            args=(worker_id, self._task_queue, self._result_queue, self.capture_settings, self.pages_per_worker),
+            name=f"capture-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        self._processes[worker_id] = process
+
+    def _read_results(self):
+        """Hand worker results to the event loop and watch for dead workers (runs in a thread)"""
+        while True:
+            try:
+                message = self._result_queue.get(timeout=1)
+            except queue.Empty:
+                if not self._stopping:
+                    self._loop.call_soon_threadsafe(self._check_workers)
+                continue
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+            self._loop.call_soon_threadsafe(self._handle_message, message)
+
+    def _handle_message(self, message):
+        """Resolve the future of a task from a worker message"""
+        kind, task_id, payload = message
+        if kind == "started":
+            if task_id in self._pending:
+                self._task_workers[task_id] = payload
+            return
+
+        self._task_workers.pop(task_id, None)
+        future = self._pending.get(task_id)
+        if future is None or future.done():
+            return
+        if kind == "done":
+            future.set_result(payload)
+        else:
+            future.set_exception(Exception(payload))
+
+    def _check_workers(self):
+        """Restart crashed worker processes and fail the captures they were running"""
+        if self._stopping:
+            return
+        for worker_id, process in list(self._processes.items()):
+            if process.is_alive():
+                continue
+            logger.error(f"Capture worker {worker_id} exited unexpectedly (exit code {process.exitcode}), restarting it")
+            for task_id, task_worker in list(self._task_workers.items()):
+                if task_worker == worker_id:
+                    self._task_workers.pop(task_id)
+                    future = self._pending.get(task_id)
+                    if future is not None and not future.done():
+                        future.set_exception(Exception(f"Capture worker {worker_id} exited unexpectedly"))
+            self.stats["worker_restarts"] += 1
+            self._start_worker(worker_id)
+
+def _run_worker(worker_id: int, task_queue, result_queue, capture_settings: Dict[str, Any], pages: int):
+    """Entry point of a worker process"""
+    try:
+        asyncio.run(_worker_loop(worker_id, task_queue, result_queue, capture_settings, pages))
+    except KeyboardInterrupt:
+        pass
+
+async def _worker_loop(worker_id: int, task_queue, result_queue, capture_settings: Dict[str, Any], pages: int):
+    """Take tasks from the queue and capture them with the worker's own browser pool"""
+    # Imported here, the API process does not need Playwright objects of the workers
+    from services.browser_pool import BrowserPool
+    from services.session_store import SessionStore
+    from services.request_filter import RequestFilter
+    from services.pdf_generator import PDFGenerator
+
+    browser_pool = BrowserPool()
+    browser_pool.configure(capture_settings)
+    browser_pool.enabled = True
+    await browser_pool.start()
+    # Sessions are only kept in memory, several processes would race for the session files
+    session_store = SessionStore(persist=False)
+    request_filter = RequestFilter()
+    request_filter.configure(capture_settings)
+
+    generators = {}  # Connection and scale -> entry of the PDFGenerator holding a pooled context
+    slots = asyncio.Semaphore(pages)
+    running = set()
+    loop = asyncio.get_running_loop()
+    logger.info(f"Capture worker {worker_id} started (pid {os.getpid()})")
+
+    async def close_generator(entry):
+        try:
+            await entry["generator"].close()
+        except Exception as e:
+            logger.debug(f"Error closing capture context: {str(e)}")
+
+    async def release_generator(entry):
+        entry["running"] -= 1
+        entry["last_used"] = time.monotonic()
+        if entry["retired"] and entry["running"] == 0:
+            await close_generator(entry)
+
+    async def get_generator(task):
+        # Idle connections (e.g. old credentials or scale) release their context
+        now = time.monotonic()
+        for stale_key, entry in list(generators.items()):
+            if entry["running"] == 0 and now - entry["last_used"] > CaptureWorkerPool.GENERATOR_IDLE_SECONDS:
+                generators.pop(stale_key)
+                await close_generator(entry)
+
+        connection = task["connection"]
+        settings = task["capture_settings"] or {}
+        key = (connection["grafana_url"], connection.get("username"), connection.get("password"),
+               connection.get("api_token"), settings.get("captureScale"))
+        entry = generators.get(key)
+        if entry and entry["tasks"] >= CaptureWorkerPool.GENERATOR_MAX_TASKS:
+            # Closed once its running tasks are done, the next acquire may recycle the browser
+            generators.pop(key)
+            entry["retired"] = True
+            if entry["running"] == 0:
+                await close_generator(entry)
+            entry = None
+        if entry is None:
+            generator = PDFGenerator(
+                connection["grafana_url"], connection.get("username"), connection.get("password"),
+                browser_pool=browser_pool,
+                session_store=session_store,
+                request_filter=request_filter,
+                api_token=connection.get("api_token")
+            )
+            generator.grafana_selectors = {}
+            entry = {"generator": generator, "tasks": 0, "running": 0, "retired": False, "last_used": now}
+            generators[key] = entry
+        entry["tasks"] += 1
+        entry["running"] += 1
+        # Settings of the API process, the worker has no settings service
+        entry["generator"].capture_settings = settings
+        return entry
+
+    async def run_task(task):
+        timings = {"encode_seconds": 0.0}
+        entry = None
+        try:
+            entry = await get_generator(task)
+            generator = entry["generator"]
+            await generator._ensure_context()
+            failed_context = generator.context
+            try:
+                if task["kind"] == "prewarm":
+                    await asyncio.wait_for(generator.prewarm_dashboard(task["url"], task["width"]), task["timeout"])
+                    result = None
+                elif task["kind"] == "dashboard":
+                    images = await asyncio.wait_for(generator.capture_dashboard_panels(
+                        task["url"], task["panel_ids"], task["width"],
+                        encoding=task["encoding"], timings=timings,
+                        panel_sizes=task["panel_sizes"]), task["timeout"])
+                    result = {panel_id: image.getvalue() for panel_id, image in images.items()}
+                else:
+                    generator.grafana_selectors[task["grafana_version"]] = task["selector"]
+                    image = await asyncio.wait_for(generator.capture_panel(
+                        task["url"], task["width"], task["height"], task["grafana_version"],
+                        vector=task["vector"], encoding=task["encoding"], timings=timings), task["timeout"])
+                    result = image.getvalue()
+            except Exception as e:
+                if generator._is_browser_crash(e):
+                    # Next task of this connection gets a fresh context, the API process retries the panel
+                    try:
+                        await generator._recover_context(failed_context)
+                    except Exception as recover_error:
+                        logger.error(f"Capture worker {worker_id} could not relaunch browser: {str(recover_error)}")
+                raise
+            result_queue.put(("done", task["id"], (result, timings["encode_seconds"])))
+        except asyncio.TimeoutError:
+            result_queue.put(("failed", task["id"], f"Capture timed out after {task['timeout']:.1f} seconds"))
+        except Exception as e:
+            result_queue.put(("failed", task["id"], str(e) or type(e).__name__))
+        finally:
+            if entry:
+                await release_generator(entry)
+            slots.release()
+
+    try:
+        while True:
+            # Only take a task when a page is free, other workers get the rest
+            await slots.acquire()
+            task = await loop.run_in_executor(None, task_queue.get)
+            if task is None:
+                break
+            result_queue.put(("started", task["id"], worker_id))
+            job = asyncio.create_task(run_task(task))
+            running.add(job)
+            job.add_done_callback(running.discard)
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    finally:
+        for entry in generators.values():
+            await close_generator(entry)
+        await browser_pool.stop()
+        logger.info(f"Capture worker {worker_id} stopped")
@@ -39,7 +39,8 @@ class GrafanaService:
             self.add_connection("default", base_url, grafana_username, grafana_password)
             self.current_server_id = "default"
     
-    def add_connection(self, server_id: str, base_url: str, username: str, password: str) -> bool:
+    def add_connection(self, server_id: str, base_url: str, username: str, password: str,
+                       options: Dict[str, Any] = None, api_token: str = None) -> bool:
         """
         Add a new Grafana server connection
         
@@ -48,6 +49,8 @@ class GrafanaService:
             base_url: Grafana server URL
             username: Grafana username
             password: Grafana password
+            options: Optional per-server settings (e.g. capture tuning)
+            api_token: Optional service account token, used instead of username and password
             
         Returns:
             True if connection was successfully added, False otherwise
@@ -59,7 +62,7 @@ class GrafanaService:
             # https://github.com/grafana-toolbox/grafana-client
             client = GrafanaApi.from_url(
                 url=base_url+'?verify=false',
-                credential=(username, password)
+                credential=api_token or (username, password)
             )
             
             # Store connection info
@@ -67,7 +70,9 @@ class GrafanaService:
                 "client": client,
                 "url": base_url,
                 "username": username,
-                "password": password
+                "password": password,
+                "api_token": api_token,
+                "options": options or {}
             }
             
             # Test the connection
@@ -117,6 +122,28 @@ class GrafanaService:
         logger.error(f"No connection found for server ID: {server_id}")
         return None
     
+    def get_server_option(self, key: str, default: Any = None, server_id: str = None) -> Any:
+        """
+        Get a per-server setting from the server configuration
+        
+        Args:
+            key: Setting name as stored in the grafana_servers entry
+            default: Value to return if the setting is not configured
+            server_id: Server ID, or None to use the current server
+            
+        Returns:
+            Configured value or default
+        """
+        if server_id is None:
+            server_id = self.current_server_id
+        
+        connection = self.connections.get(server_id)
+        if not connection:
+            return default
+        
+        value = connection.get("options", {}).get(key)
+        return default if value is None or value == "" else value
+    
     def get_connection(self, server_id: str = None):
         """
         Get Grafana client connection for a specific server
@@ -403,21 +430,9 @@ class GrafanaService:
         Returns:
             Panel URL for Playwright to capture
         """
-        # If no server_id specified, use current
-        if server_id is None:
-            server_id = self.current_server_id
-        
-        # Get the base URL for the specified server
-        base_url = None
-        if server_id in self.connections:
-            base_url = self.connections[server_id]["url"].rstrip('/')
-        else:
-            logger.error(f"No connection found for server ID: {server_id}")
-            # Fallback to the instance's grafana_url if available
-            base_url = self.grafana_url.rstrip('/') if self.grafana_url else None
-            if not base_url:
-                logger.error("No Grafana URL available to generate panel URL")
-                return ""
+        base_url = self._get_base_url(server_id)
+        if not base_url:
+            return ""
         
         # URLencode panel URL params
         params = {'panelId': panel_id,
@@ -435,6 +450,96 @@ class GrafanaService:
 
         return panel_url
 
+    def get_dashboard_url(self, dashboard_uid: str, theme: str = "dark",
+                          time_from: str = "now-6h", time_to: str = "now",
+                          server_id: str = None) -> str:
+        """
+        Generate the kiosk mode URL of a full dashboard for Playwright to capture
+        
+        Args:
+            dashboard_uid: Dashboard UID
+            theme: Dashboard theme (light/dark)
+            time_from: Time range from
+            time_to: Time range to
+            server_id: Server ID, or None to use the current server
+            
+        Returns:
+            Dashboard URL without Grafana navigation
+        """
+        base_url = self._get_base_url(server_id)
+        if not base_url:
+            return ""
+        
+        params = {'theme': theme,
+                  'from': time_from,
+                  'to': time_to}
+        dashboard_url = f"{base_url}/d/{dashboard_uid}?{urlencode(params)}&kiosk"
+        logger.debug(f"Generated dashboard URL: {dashboard_url}")
+
+        return dashboard_url
+
+    def get_panel_render_url(self, dashboard_uid: str, panel_id: int, 
+                             width: int = 800, height: int = 400, 
+                             theme: str = "dark", time_from: str = "now-6h",
+                             time_to: str = "now", server_id: str = None, scale: float = 1) -> str:
+        """
+        Generate panel URL of Grafana's image renderer endpoint
+        
+        Args:
+            dashboard_uid: Dashboard UID
+            panel_id: Panel ID
+            width: Image width
+            height: Image height
+            theme: Panel theme (light/dark)
+            time_from: Time range from
+            time_to: Time range to
+            server_id: Server ID, or None to use the current server
+            scale: Device scale factor of the rendered image
+            
+        Returns:
+            /render/d-solo URL returning the panel as PNG
+        """
+        base_url = self._get_base_url(server_id)
+        if not base_url:
+            return ""
+        
+        params = {'panelId': panel_id,
+                  'width': width,
+                  'height': height,
+                  'theme': theme,
+                  'from': time_from,
+                  'to': time_to,
+                  'scale': scale}
+        render_url = f"{base_url}/render/d-solo/{dashboard_uid}?{urlencode(params)}"
+        logger.debug(f"Generated panel render URL: {render_url}")
+
+        return render_url
+
+    def _get_base_url(self, server_id: str = None) -> Optional[str]:
+        """
+        Get the base URL of a server without trailing slash
+        
+        Args:
+            server_id: Server ID, or None to use the current server
+            
+        Returns:
+            Base URL or None if no URL is available
+        """
+        # If no server_id specified, use current
+        if server_id is None:
+            server_id = self.current_server_id
+        
+        # Get the base URL for the specified server
+        if server_id in self.connections:
+            return self.connections[server_id]["url"].rstrip('/')
+        
+        logger.error(f"No connection found for server ID: {server_id}")
+        # Fallback to the instance's grafana_url if available
+        base_url = self.grafana_url.rstrip('/') if self.grafana_url else None
+        if not base_url:
+            logger.error("No Grafana URL available to generate panel URL")
+        return base_url
+
     def update_configuration(self, server_id: str = None, base_url: str = None, username: str = None, password: str = None) -> bool:
         """
         Update server configuration
@@ -473,7 +578,7 @@ class GrafanaService:
             try:
                 connection["client"] = GrafanaApi.from_url(
                     url=connection["url"]+'?verify=false',
-                    credential=(connection["username"], connection["password"])
+                    credential=connection.get("api_token") or (connection["username"], connection["password"])
                 )
                 logger.info(f"Grafana client for server '{server_id}' reinitialized with new settings")
                 
@@ -521,7 +626,9 @@ class GrafanaService:
                 server_id,
                 server.get("url", ""),
                 server.get("username", ""),
-                server.get("password", "")
+                server.get("password", ""),
+                options={k: v for k, v in server.items() if k not in ("password", "apiToken")},
+                api_token=server.get("apiToken") or None
             )
             
             if added:
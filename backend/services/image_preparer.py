@@ -0,0 +1,258 @@
+import os
+import sys
+import time
+import zlib
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Tuple, Optional
+from io import BytesIO
+from PIL import Image as PILImage
+from reportlab.pdfbase.pdfdoc import PDFImageXObject
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(os.environ.get('LOGLEVEL', 'DEBUG').upper())
+formatter = logging.Formatter("%(asctime)s [%(levelname)5s] %(name)30s: %(message)s")
+stream_handler = logging.StreamHandler(sys.stdout)
+stream_handler.setFormatter(formatter)
+logger.addHandler(stream_handler)
+
+class ImagePreparer:
+    """Process pool decoding and converting panel images for PDF compilation in parallel"""
+
+    def __init__(self, workers: int = 4):
+        """
+        Initialize Image Preparer
+
+        Args:
+            workers: Maximum number of processes (capped at the number of CPUs), 0 prepares images in the caller
+        """
+        self.workers = workers
+
+        self._executor = None
+
+        self.stats = {
+            "images": 0,
+            "failures": 0,
+            "downsampled": 0,
+            "restarts": 0,
+            "prepare_seconds": 0.0
+        }
+
+    def configure(self, capture_settings: Dict[str, Any]):
+        """
+        Apply capture settings, a running pool picks them up after restart
+
+        Args:
+            capture_settings: "capture" section of the application settings
+        """
+        if not capture_settings:
+            return
+        self.workers = max(0, int(capture_settings.get("pdfImageWorkers", self.workers)))
+        logger.debug(f"Image preparer configured: workers={self.workers}")
+
+    def start(self):
+        """Start the process pool"""
+        if self.workers <= 0:
+            logger.info("Image preparer disabled, images are prepared while the PDF is drawn")
+            return
+        if self._executor:
+            return
+        # Spawned, the API process runs threads and browsers that must not be forked
+        processes = min(self.workers, os.cpu_count() or 1)
+        self._executor = ProcessPoolExecutor(max_workers=processes,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        logger.info(f"Image preparer started with {processes} processes")
+
+    def stop(self):
+        """Shut the process pool down"""
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Image preparer stopped")
+
+    def restart(self):
+        """Restart the pool, e.g. after the number of workers changed"""
+        self.stop()
+        self.start()
+
+    def is_available(self) -> bool:
+        """
+        Check if images can be prepared in the process pool
+
+        Returns:
+            True if the pool is running
+        """
+        return self._executor is not None
+
+    async def prepare(self, images: List[bytes], encoding: Dict[str, Any],
+                      max_sizes: Dict[str, Tuple[int, int]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Prepare panel images for drawImage in parallel
+
+        Args:
+            images: Encoded panel images, duplicates are prepared once
+            encoding: Image encoding of the report
+            max_sizes: Optional maximum pixel size (width, height) by SHA-1 digest of the image,
+                       larger images are downsampled to fit
+
+        Returns:
+            Dict of SHA-1 digest of the image to the result of prepare_image,
+            images that failed are missing and get prepared while drawing
+        """
+        executor = self._executor
+        max_sizes = max_sizes or {}
+        unique = {}
+        for data in images:
+            digest = hashlib.sha1(data).hexdigest()
+            # JPEG is embedded as it is, not worth a round trip to the pool unless it may be downsampled
+            if data[:3] != b"\xff\xd8\xff" or digest in max_sizes:
+                unique.setdefault(digest, data)
+
+        loop = asyncio.get_running_loop()
+
+        async def run(digest):
+            # Submitting to a broken pool raises right away, gather collects it like any failure
+            return await loop.run_in_executor(executor, prepare_image, unique[digest], encoding, max_sizes.get(digest))
+
+        digests = list(unique.keys())
+        results = await asyncio.gather(*[run(digest) for digest in digests], return_exceptions=True)
+
+        # A pool process died (e.g. killed for memory), the pool accepts no more work until rebuilt
+        if any(isinstance(result, BrokenProcessPool) for result in results) and self._executor is executor:
+            logger.warning("Image preparer pool is broken, restarting it")
+            self.stats["restarts"] += 1
+            self.restart()
+
+        prepared = {}
+        for digest, result in zip(digests, results):
+            if isinstance(result, BaseException):
+                self.stats["failures"] += 1
+                logger.warning(f"Error preparing panel image: {str(result)}")
+                continue
+            self.stats["images"] += 1
+            if result["downsampled"]:
+                self.stats["downsampled"] += 1
+            self.stats["prepare_seconds"] += result["seconds"]
+            prepared[digest] = result
+        return prepared
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get preparer statistics
+
+        Returns:
+            Dict with counters and configuration
+        """
+        return {
+            **self.stats,
+            "prepare_seconds": round(self.stats["prepare_seconds"], 3),
+            "workers": self.workers,
+            "running": self._executor is not None
+        }
+
+def prepare_image(data: bytes, encoding: Dict[str, Any], max_size: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+    """
+    Turn an encoded panel image into what the PDF embeds (runs in a pool process)
+
+    JPEG is embedded as it is. Other images are decoded and their pixels Flate-compressed
+    here, so the PDF embeds the stream without compressing it in the drawing thread and
+    only the compressed stream is sent back from the pool. Lossy WebP is converted to JPEG
+    because PDF has no WebP filter. Images larger than max_size are downsampled first,
+    JPEG and lossy WebP are then encoded as JPEG again.
+
+    Args:
+        data: Encoded panel image
+        encoding: Image encoding of the report
+        max_size: Optional maximum size (width, height) in pixels, e.g. for the target DPI
+
+    Returns:
+        Dict with "kind" ("jpeg" with "data", or "flate" with "mode", "size" and the
+        compressed pixels in "data"), whether the image was "downsampled" and the time spent in "seconds"
+    """
+    started = time.monotonic()
+    # Only the header is read here, pixels are decoded on demand
+    image = PILImage.open(BytesIO(data))
+    size = None
+    if max_size and (image.width > max_size[0] or image.height > max_size[1]):
+        scale = min(max_size[0] / image.width, max_size[1] / image.height)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+
+    is_jpeg = data[:3] == b"\xff\xd8\xff"
+    if is_jpeg and size is None:
+        return {"kind": "jpeg", "data": data, "downsampled": False, "seconds": time.monotonic() - started}
+
+    lossy_webp = (image.format == "WEBP" and data[12:16] != b"VP8L"
+                  and (encoding or {}).get("format") != "webp-lossless")
+    if is_jpeg:
+        # Let the JPEG decoder scale down by a power of two while decoding
+        image.draft("RGB", size)
+    image.load()
+    if size:
+        image = image.resize(size, PILImage.LANCZOS)
+
+    if is_jpeg or lossy_webp:
+        jpeg_data = BytesIO()
+        image.convert("RGB").save(jpeg_data, "JPEG", quality=(encoding or {}).get("quality", 85))
+        return {"kind": "jpeg", "data": jpeg_data.getvalue(), "downsampled": size is not None,
+                "seconds": time.monotonic() - started}
+
+    if image.mode not in ("RGB", "L"):
+        # Alpha is dropped, as ReportLab does for images drawn without mask
+        image = image.convert("RGB")
+    return {
+        "kind": "flate",
+        "mode": image.mode,
+        "size": image.size,
+        "data": zlib.compress(image.tobytes()),
+        "downsampled": size is not None,
+        "seconds": time.monotonic() - started
+    }
+
+def embed_flate_image(pdf, name: str, result: Dict[str, Any]):
+    """
+    Add a "flate" result of prepare_image to a ReportLab document, once per name
+
+    ReportLab compresses every image it embeds itself and has no way to take an already
+    compressed stream, so the image XObject is added to the document like a form and its
+    stream is written as it is. Draw it with draw_flate_image.
+
+    Args:
+        pdf: ReportLab canvas
+        name: Form name of the image, e.g. derived from the content digest
+        result: Result of prepare_image of kind "flate"
+    """
+    if pdf.hasForm(name):
+        return
+    image = PDFImageXObject(name)
+    image.width, image.height = result["size"]
+    image.bitsPerComponent = 8
+    image.colorSpace = "DeviceGray" if result["mode"] == "L" else "DeviceRGB"
+    image._filters = ("FlateDecode",)
+    image.streamContent = result["data"]
+    image.mask = None
+    pdf._doc.addForm(name, image)
+
+def draw_flate_image(pdf, name: str, size: Tuple[int, int], x: float, y: float, width: float, height: float):
+    """
+    Draw an image added with embed_flate_image, fitted and centered into a box
+
+    Args:
+        pdf: ReportLab canvas
+        name: Form name the image was embedded with
+        size: Pixel size of the image
+        x, y: Bottom left corner of the box in points
+        width, height: Size of the box in points
+    """
+    # Image XObjects fill the unit square, keep the aspect ratio like drawImage does
+    scale = min(width / size[0], height / size[1])
+    image_width, image_height = size[0] * scale, size[1] * scale
+    pdf.saveState()
+    pdf.translate(x + (width - image_width) / 2, y + (height - image_height) / 2)
+    pdf.scale(image_width, image_height)
+    pdf.doForm(name)
+    pdf.restoreState()
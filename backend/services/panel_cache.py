@@ -0,0 +1,310 @@
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(os.environ.get('LOGLEVEL', 'DEBUG').upper())
+formatter = logging.Formatter("%(asctime)s [%(levelname)5s] %(name)30s: %(message)s")
+stream_handler = logging.StreamHandler(sys.stdout)
+stream_handler.setFormatter(formatter)
+logger.addHandler(stream_handler)
+
+class PanelCache:
+    """Content-addressed cache of captured panel images with a memory and a disk tier"""
+
+    # Seconds per unit of Grafana relative time expressions (months and years approximated)
+    TIME_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800, "M": 2592000, "y": 31536000}
+    RELATIVE_TIME_PATTERN = re.compile(r"^now((?:[+-]\d+[smhdwMy])*)(?:/[smhdwMy])?$")
+
+    def __init__(self, cache_dir: str = "cache/panels", ttl: int = 300,
+                 memory_max_mb: int = 64, disk_max_mb: int = 512, enabled: bool = True,
+                 time_step: int = 60):
+        """
+        Initialize Panel Cache
+
+        Args:
+            cache_dir: Directory of the disk tier
+            ttl: Time in seconds a cached image stays valid
+            memory_max_mb: Size limit of the memory tier in MB
+            disk_max_mb: Size limit of the disk tier in MB (0 disables the disk tier)
+            enabled: Whether the cache should be used at all
+            time_step: Step in seconds relative time ranges are rounded to in cache keys
+                (0 keeps panels with relative time ranges out of the cache)
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.memory_max_mb = memory_max_mb
+        self.disk_max_mb = disk_max_mb
+        self.enabled = enabled
+        self.time_step = time_step
+
+        self._lock = threading.Lock()  # Reports may also run in scheduler threads
+        self._memory = OrderedDict()   # Key -> (expires, image bytes), least recently used first
+        self._memory_size = 0
+        self._disk = None              # Key -> (expires, size), loaded on first use
+        self._disk_size = 0
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0
+        }
+
+    def configure(self, capture_settings: Dict[str, Any]):
+        """
+        Apply capture settings to the cache
+
+        Args:
+            capture_settings: "capture" section of the application settings
+        """
+        if not capture_settings:
+            return
+        self.enabled = capture_settings.get("panelCache", self.enabled)
+        self.ttl = int(capture_settings.get("panelCacheTtl", self.ttl))
+        self.memory_max_mb = int(capture_settings.get("panelCacheMemoryMb", self.memory_max_mb))
+        self.disk_max_mb = int(capture_settings.get("panelCacheDiskMb", self.disk_max_mb))
+        self.time_step = int(capture_settings.get("panelCacheTimeStep", self.time_step))
+        with self._lock:
+            self._evict()
+        logger.debug(f"Panel cache configured: enabled={self.enabled}, ttl={self.ttl}, "
+                     f"memory={self.memory_max_mb}MB, disk={self.disk_max_mb}MB, time step={self.time_step}s")
+
+    def is_available(self) -> bool:
+        """
+        Check if the cache should be consulted
+
+        Returns:
+            True if the cache is enabled and images stay valid for some time
+        """
+        return bool(self.enabled) and self.ttl > 0
+
+    @staticmethod
+    def make_key(**parts) -> str:
+        """
+        Build the cache key of a panel image
+
+        Args:
+            **parts: Everything that determines the image (server, org, dashboard version, panel URL, ...)
+
+        Returns:
+            Hex digest of the parts
+        """
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def resolve_time_range(self, time_from: str, time_to: str) -> Optional[Dict[str, Any]]:
+        """
+        Resolve a time range to the absolute bounds that go into cache keys
+
+        Relative bounds like now-6h are resolved against the current time rounded down to
+        the time step, so their images are only reused while the shown window stays the same.
+
+        Args:
+            time_from: Start of the time range as passed to Grafana
+            time_to: End of the time range as passed to Grafana
+
+        Returns:
+            Dict with the bounds as given and, for relative bounds, resolved to epoch seconds,
+            or None if the time range must not be cached
+        """
+        now = int(time.time())
+        if self.time_step > 0:
+            now -= now % self.time_step
+
+        time_range = {"from": str(time_from), "to": str(time_to)}
+        for bound, expression in list(time_range.items()):
+            if not expression.startswith("now"):
+                continue
+            match = self.RELATIVE_TIME_PATTERN.match(expression.replace(" ", ""))
+            if self.time_step <= 0 or not match:
+                return None
+            # Rounding suffixes like /d are ignored, keys then change more often than the window
+            offset = sum(int(amount) * self.TIME_UNITS[unit]
+                         for amount, unit in re.findall(r"([+-]\d+)([smhdwMy])", match.group(1)))
+            time_range[f"{bound}_resolved"] = now + offset
+        return time_range
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Get a cached image
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            Image bytes or None if not cached or expired
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return entry[1]
+                self._drop_memory(key)
+                self.stats["expired"] += 1
+
+            data = self._read_disk(key, now)
+            if data is not None:
+                # Promote to memory, keeping the original expiry
+                self._store_memory(key, self._disk[key][0], data)
+                self.stats["disk_hits"] += 1
+                return data
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, data: bytes):
+        """
+        Store an image
+
+        Args:
+            key: Cache key from make_key
+            data: Image bytes
+        """
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._store_memory(key, expires, data)
+            self._write_disk(key, expires, data)
+            self.stats["stores"] += 1
+            self._evict()
+
+    def invalidate(self):
+        """Drop all cached images"""
+        with self._lock:
+            self._memory = OrderedDict()
+            self._memory_size = 0
+            for key in list(self._get_disk_index().keys()):
+                self._drop_disk(key)
+        logger.info("Panel cache invalidated")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics
+
+        Returns:
+            Dict with hit/miss counters and tier sizes
+        """
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+            "disk_entries": len(self._disk) if self._disk is not None else 0,
+            "disk_bytes": self._disk_size
+        }
+
+    def _store_memory(self, key: str, expires: float, data: bytes):
+        """Put an image into the memory tier (lock must be held)"""
+        self._drop_memory(key)
+        self._memory[key] = (expires, data)
+        self._memory_size += len(data)
+
+    def _drop_memory(self, key: str):
+        """Remove an image from the memory tier (lock must be held)"""
+        entry = self._memory.pop(key, None)
+        if entry:
+            self._memory_size -= len(entry[1])
+
+    def _get_path(self, key: str) -> str:
+        """Get the file path of a cached image"""
+        return os.path.join(self.cache_dir, f"{key}.img")
+
+    def _get_disk_index(self) -> Dict[str, Any]:
+        """Scan the cache directory once and keep an index of its files (lock must be held)"""
+        if self._disk is None:
+            self._disk = OrderedDict()
+            self._disk_size = 0
+            if os.path.isdir(self.cache_dir):
+                files = []
+                for filename in os.listdir(self.cache_dir):
+                    if not filename.endswith(".img"):
+                        continue
+                    try:
+                        stat = os.stat(os.path.join(self.cache_dir, filename))
+                        files.append((stat.st_atime, filename[:-4], stat.st_mtime + self.ttl, stat.st_size))
+                    except OSError:
+                        continue
+                for _, key, expires, size in sorted(files):
+                    self._disk[key] = (expires, size)
+                    self._disk_size += size
+        return self._disk
+
+    def _read_disk(self, key: str, now: float) -> Optional[bytes]:
+        """Read an image from the disk tier (lock must be held)"""
+        if self.disk_max_mb <= 0:
+            return None
+        entry = self._get_disk_index().get(key)
+        if not entry:
+            return None
+        if entry[0] <= now:
+            self._drop_disk(key)
+            self.stats["expired"] += 1
+            return None
+        try:
+            with open(self._get_path(key), 'rb') as f:
+                data = f.read()
+            self._disk.move_to_end(key)
+            return data
+        except Exception as e:
+            logger.warning(f"Error reading cached panel {key}: {str(e)}")
+            self._drop_disk(key)
+            return None
+
+    def _write_disk(self, key: str, expires: float, data: bytes):
+        """Write an image to the disk tier (lock must be held)"""
+        if self.disk_max_mb <= 0:
+            return
+        try:
+            index = self._get_disk_index()
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            with open(self._get_path(key), 'wb') as f:
+                f.write(data)
+            if key in index:
+                self._disk_size -= index.pop(key)[1]
+            index[key] = (expires, len(data))
+            self._disk_size += len(data)
+        except Exception as e:
+            logger.warning(f"Error writing cached panel {key}: {str(e)}")
+
+    def _drop_disk(self, key: str):
+        """Remove an image from the disk tier (lock must be held)"""
+        entry = self._get_disk_index().pop(key, None)
+        if entry:
+            self._disk_size -= entry[1]
+        try:
+            os.remove(self._get_path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Evict least recently used images until both tiers fit their limits (lock must be held)"""
+        memory_limit = self.memory_max_mb * 1024 * 1024
+        while self._memory and self._memory_size > memory_limit:
+            key = next(iter(self._memory))
+            self._drop_memory(key)
+            self.stats["evictions"] += 1
+
+        if self._disk is None:
+            return
+        disk_limit = self.disk_max_mb * 1024 * 1024
+        while self._disk and self._disk_size > disk_limit:
+            key = next(iter(self._disk))
+            self._drop_disk(key)
+            self.stats["evictions"] += 1
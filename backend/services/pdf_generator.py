@@ -1,19 +1,33 @@
 import os
 import sys
+import shutil
 import tempfile
+import threading
+import time
 import asyncio
 import logging
 import json
-from typing import List, Dict, Any, Optional
+import hashlib
+import math
+from typing import List, Dict, Any, Optional, BinaryIO, Tuple
 from datetime import datetime
+from collections import OrderedDict
+from contextlib import contextmanager
+import aiohttp
 from playwright.async_api import async_playwright, Page, Browser
 from reportlab.lib.pagesizes import A4, A3, LETTER, landscape
 from reportlab.lib import colors
 from reportlab.lib.units import mm
-from reportlab.lib.utils import ImageReader
+from reportlab.lib.utils import ImageReader, simpleSplit
+from reportlab import rl_config
 from reportlab.pdfgen import canvas
+from pdfrw import PdfReader
+from pdfrw.buildxobj import pagexobj
+from pdfrw.toreportlab import makerl
 from io import BytesIO
 from PIL import Image as PILImage
+from services.request_filter import RequestFilter
+from services.image_preparer import prepare_image, embed_flate_image, draw_flate_image
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -23,10 +37,138 @@ stream_handler = logging.StreamHandler(sys.stdout)
 stream_handler.setFormatter(formatter)
 logger.addHandler(stream_handler)
 
+# Documents are drawn and written by several threads, rl_config is shared by all of them
+binary_streams_lock = threading.Lock()
+binary_streams_users = 0
+binary_streams_default = None
+
+@contextmanager
+def binary_pdf_streams():
+    """
+    Write binary streams while a document is drawn or written, ReportLab's default
+    ASCII85 encoding makes every image and page a quarter larger
+    
+    rl_config.useA85 is global, it is switched off while any document uses it and
+    restored to its previous value afterwards.
+    """
+    global binary_streams_users, binary_streams_default
+    with binary_streams_lock:
+        if binary_streams_users == 0:
+            binary_streams_default = rl_config.useA85
+            rl_config.useA85 = 0
+        binary_streams_users += 1
+    try:
+        yield
+    finally:
+        with binary_streams_lock:
+            binary_streams_users -= 1
+            if binary_streams_users == 0:
+                rl_config.useA85 = binary_streams_default
+
 class PDFGenerator:
     """Generate PDF reports from Grafana panels using Playwright for rendering"""
     
-    def __init__(self, grafana_url: str, grafana_username: str, grafana_password: str):
+    # Number of pages capturing panels in parallel if the server does not configure it
+    DEFAULT_CAPTURE_CONCURRENCY = 4
+    
+    # Render-ready detection: URL fragments of datasource queries issued by panels
+    RENDER_QUERY_PATTERNS = ["/api/ds/query", "/api/datasources/proxy", "/api/tsdb/query"]
+    # Elements Grafana shows while a panel is still loading (old and new versions)
+    RENDER_LOADING_SELECTORS = [
+        ".panel-loading",
+        '[aria-label="Panel loading bar"]',
+        '[data-testid*="loading bar" i]',
+        '[data-testid*="Panel loading" i]'
+    ]
+    # Upper bound and quiet period (seconds) of the render wait
+    DEFAULT_RENDER_MAX_WAIT = 30
+    DEFAULT_RENDER_QUIET_PERIOD = 0.5
+    
+    # Panels are captured at the physical size of their PDF cell (96 CSS pixels per inch, 72 points per inch)
+    CSS_PIXELS_PER_POINT = 96 / 72
+    # Device scale factor of capture pages, 2 gives 192 pixels per inch in the PDF
+    DEFAULT_CAPTURE_SCALE = 2
+    
+    # Dashboard capture: panels of one dashboard are captured from a single full dashboard load
+    # once a layout uses at least this many of its panels (0 disables the mode) and at least
+    # this share of the panels the dashboard renders, so small selections of large dashboards
+    # are still captured panel by panel
+    DEFAULT_DASHBOARD_CAPTURE_MIN_PANELS = 2
+    DEFAULT_DASHBOARD_CAPTURE_MIN_SHARE = 0.5
+    DEFAULT_DASHBOARD_CAPTURE_WIDTH = 1600
+    # Chromium cannot render surfaces higher than this, longer dashboards are cut off
+    DASHBOARD_MAX_HEIGHT = 16384
+    # Panel containers by panel id (Grafana up to 10 and Grafana 11 scenes)
+    DASHBOARD_PANEL_SELECTORS = ['[data-panelid="{panel_id}"]', '[data-viz-panel-key="panel-{panel_id}"]']
+    # Resizes the grid item of a dashboard panel to the size of its PDF cell, lifts it above its
+    # neighbours and shifts it left if it would leave the viewport. Returns the previous inline style.
+    RESIZE_PANEL_SCRIPT = """(element, size) => {
+        const item = element.closest('.react-grid-item') || element;
+        const previous = item.getAttribute('style');
+        item.style.transition = 'none';
+        item.style.width = size[0] + 'px';
+        item.style.height = size[1] + 'px';
+        item.style.zIndex = '10000';
+        const rect = item.getBoundingClientRect();
+        const overflow = rect.left + size[0] - document.documentElement.clientWidth;
+        if (overflow > 0) item.style.translate = `${-Math.min(overflow, rect.left)}px 0`;
+        return previous;
+    }"""
+    RESTORE_PANEL_SCRIPT = """(element, previous) => {
+        const item = element.closest('.react-grid-item') || element;
+        if (previous === null) item.removeAttribute('style');
+        else item.setAttribute('style', previous);
+    }"""
+    
+    # Time budget (seconds) of a single capture attempt, retries of failed panels and the
+    # backoff before the first retry (doubled per retry); panels failing all attempts are
+    # drawn as placeholders instead of failing the report
+    DEFAULT_PANEL_TIMEOUT = 60
+    DEFAULT_PANEL_RETRIES = 2
+    DEFAULT_PANEL_RETRY_BACKOFF = 2
+    # Time budget (seconds) of all panel captures of a report
+    DEFAULT_REPORT_TIMEOUT = 900
+    # Browser relaunches per report after Chromium crashed or was killed; panels hit by
+    # a crash are captured again without using up their retries
+    DEFAULT_BROWSER_RECOVERIES = 2
+    # Playwright error messages of crashed pages and browsers
+    BROWSER_CRASH_MESSAGES = [
+        "target crashed",
+        "page crashed",
+        "target page, context or browser has been closed",
+        "browser has been closed",
+        "browser closed",
+        "connection closed"
+    ]
+    
+    # Encodings of captured panels, set per template ("image" section). Chromium encodes PNG
+    # and JPEG screenshots itself, WebP is encoded from a PNG screenshot with Pillow
+    IMAGE_FORMATS = ["png", "jpeg", "webp", "webp-lossless"]
+    DEFAULT_IMAGE_FORMAT = "png"
+    DEFAULT_IMAGE_QUALITY = 85
+    
+    # Output settings, set per template ("pdf" section): panel images are downsampled to the
+    # DPI they are printed with (0 keeps the captured resolution), page content is compressed,
+    # linearized PDFs show their first page before they are fully downloaded (requires pikepdf)
+    DEFAULT_IMAGE_DPI = 0
+    DEFAULT_COMPRESS_PAGES = True
+    DEFAULT_LINEARIZE = False
+    
+    # Decoded header logos by URL, shared by all reports; a logo is loaded again after the TTL
+    # (seconds) so a replaced file at the same URL shows up
+    LOGO_CACHE_SIZE = 16
+    LOGO_CACHE_TTL = 600
+    _logo_cache = OrderedDict()  # URL -> (expires, ImageReader), least recently used first
+    _logo_lock = threading.Lock()
+    
+    # Size (MB) up to which a generated PDF is kept in memory, larger documents are moved
+    # to a temporary file in temp_dir while they are written
+    DEFAULT_PDF_SPOOL_MB = 8
+    
+    def __init__(self, grafana_url: str, grafana_username: str, grafana_password: str,
+                 browser_pool=None, render_client=None, capture_backend: str = "playwright",
+                 session_store=None, api_token: str = None, panel_cache=None, request_filter=None,
+                 capture_workers=None, image_preparer=None):
         """
         Initialize PDF Generator
         
@@ -34,42 +176,301 @@ class PDFGenerator:
             grafana_url: Grafana server URL
             grafana_username: Grafana username for authentication
             grafana_password: Grafana password for authentication
+            browser_pool: Optional shared BrowserPool to take the browser context from
+            render_client: Optional shared RenderClient for the "render" capture backend
+            capture_backend: "playwright" to capture panels in the browser, "render" to fetch
+                             them from Grafana's /render endpoint (Playwright is the fallback)
+            session_store: Optional SessionStore to reuse Grafana login sessions across reports
+            api_token: Optional service account token, replaces the form login if set
+            panel_cache: Optional PanelCache to reuse panel images of earlier reports
+            request_filter: Optional shared RequestFilter, a private one with default settings is used otherwise
+            capture_workers: Optional CaptureWorkerPool, browser captures run in its worker processes if it is running
+            image_preparer: Optional ImagePreparer decoding panel images for the PDF in parallel processes
         """
         # Ensure the URL is properly formatted and there are no trailing slashes
         self.grafana_url = grafana_url.rstrip('/')
         self.grafana_username = grafana_username
         self.grafana_password = grafana_password
         self.temp_dir = tempfile.mkdtemp()
+        self.browser_pool = browser_pool
+        self.render_client = render_client
+        self.own_render_client = False
+        self.capture_backend = capture_backend or "playwright"
+        self.session_store = session_store
+        self.session_checked = False
+        self.api_token = api_token
+        self.panel_cache = panel_cache
+        self.request_filter = request_filter or RequestFilter()
+        self.capture_workers = capture_workers
+        self.image_preparer = image_preparer
+        self.grafana_selectors = None  # Version -> selector, set by capture workers without settings service
+        if api_token:
+            token_digest = hashlib.sha256(api_token.encode("utf-8")).hexdigest()[:12]
+            self.pool_key = f"{self.grafana_url}|token:{token_digest}"
+        else:
+            self.pool_key = f"{self.grafana_url}|{self.grafana_username}"
+        self.playwright = None
         self.browser = None
         self.context = None
+        self.context_key = None
+        self.context_lock = asyncio.Lock()
+        self.capture_settings = None
+        self.failed_panels = []  # Panels of the last report that could not be captured
+        self.capture_stats = {}  # Panel counts and timings of the last report
+        self.dashboards = {}  # Dashboard JSON fetched for the current report, by UID
         
         # Log the actual URL being used to help with debugging
         logger.info(f"PDF Generator initialized with Grafana URL: {self.grafana_url}")
     
+    @classmethod
+    def from_connection(cls, grafana_conn: Dict[str, Any], capture_backend: str,
+                        capture_services: Dict[str, Any] = None) -> 'PDFGenerator':
+        """
+        Create a PDF generator for a Grafana server using the shared capture services
+        
+        Args:
+            grafana_conn: Connection info of the Grafana server
+            capture_backend: Capture backend of the server
+            capture_services: Shared services keyed by their constructor argument,
+                              e.g. browser_pool, panel_cache or image_preparer
+            
+        Returns:
+            PDFGenerator, not initialized yet
+        """
+        return cls(
+            grafana_conn.get("url"), grafana_conn.get("username"), grafana_conn.get("password"),
+            capture_backend=capture_backend,
+            api_token=grafana_conn.get("api_token"),
+            **(capture_services or {})
+        )
+    
     async def initialize(self):
-        """Initialize Playwright browser"""
+        """Prepare the capture backend, logging in to Grafana unless only the render endpoint is used"""
+        if self.capture_backend == "render":
+            if not (self.render_client and self.render_client.is_available()):
+                # Private client for callers running outside the application event loop
+                from services.render_client import RenderClient
+                self.render_client = RenderClient()
+                self.own_render_client = True
+                await self.render_client.start()
+            # The browser is only started if a panel has to fall back to Playwright
+            return
+        if self._use_capture_workers():
+            # Panels are captured by the worker processes, each logging in with its own browser
+            return
+
+        await self._ensure_context()
+    
+    def _use_capture_workers(self) -> bool:
+        """
+        Check if browser captures are handed to the capture worker processes
+        
+        Returns:
+            True if a capture worker pool is running on the current event loop
+        """
+        return bool(self.capture_workers and self.capture_workers.is_available())
+    
+    def _get_connection(self) -> Dict[str, Any]:
+        """
+        Get the Grafana connection passed to capture workers
+        
+        Returns:
+            Dict with URL, credentials and service account token
+        """
+        return {
+            "grafana_url": self.grafana_url,
+            "username": self.grafana_username,
+            "password": self.grafana_password,
+            "api_token": self.api_token
+        }
+    
+    async def _ensure_context(self):
+        """Get a logged-in browser context, from the shared pool if available"""
+        async with self.context_lock:
+            if not self.context:
+                await self._open_context()
+    
+    async def _open_context(self):
+        """Open the browser context (context_lock must be held)"""
+        context_options = {"device_scale_factor": self._get_capture_scale()}
+        if self.browser_pool and self.browser_pool.is_available():
+            # Contexts differ by scale, so pooled ones are kept per scale as well
+            self.context_key = f"{self.pool_key}|scale={context_options['device_scale_factor']}"
+            self.context = await self.browser_pool.acquire_context(
+                self.context_key, self._prepare_context, context_options)
+            logger.debug(f"Using pooled browser context for {self.grafana_url}")
+            
+            # A reused context may hold a session that expired in the meantime
+            if not self.api_token and not self.session_checked and not await self._is_session_valid(self.context):
+                logger.info("Pooled Grafana session expired, logging in again")
+                await self.context.clear_cookies()
+                await self._login_and_store(self.context)
+            return
+
         try:
-            playwright = await async_playwright().start()
+            self.playwright = await async_playwright().start()
             # https://github.com/microsoft/playwright-python/issues/2820
-            self.browser = await playwright.chromium.launch(headless=True, channel="chromium")
-            self.context = await self.browser.new_context(ignore_https_errors=True)
+            self.browser = await self.playwright.chromium.launch(headless=True, channel="chromium")
+            self.context = await self.browser.new_context(ignore_https_errors=True, **context_options)
         except Exception as e:
             logger.error(f"Error initializing Playwright Browser: {str(e)}")
             raise
 
         # Login to Grafana
-        await self._login_to_grafana()
+        await self._prepare_context(self.context)
+    
+    def _is_browser_crash(self, error: Exception) -> bool:
+        """
+        Check if a capture failed because the page or browser crashed
+        
+        Args:
+            error: Exception raised by the capture
+            
+        Returns:
+            True if the browser is disconnected or the error reports a crash
+        """
+        browser = self.context.browser if self.context else None
+        if browser is not None and not browser.is_connected():
+            return True
+        message = str(error).lower()
+        return any(crash_message in message for crash_message in self.BROWSER_CRASH_MESSAGES)
+    
+    async def _recover_context(self, failed_context) -> bool:
+        """
+        Replace a browser context whose browser crashed, logging in again
+        
+        Args:
+            failed_context: Context the failed capture ran in
+            
+        Returns:
+            True if a new browser context was opened, False if the browser is still
+            alive or the context was already replaced by a concurrent capture
+        """
+        async with self.context_lock:
+            if self.context is not failed_context:
+                return False
+            browser = failed_context.browser if failed_context else None
+            if browser is not None and browser.is_connected():
+                # Only a page crashed, the context can still be used
+                return False
+            
+            logger.warning(f"Browser for {self.grafana_url} crashed or disconnected, relaunching")
+            await self._discard_context()
+            await self._open_context()
+            return True
+    
+    async def _discard_context(self):
+        """Drop the current context of a crashed browser (context_lock must be held)"""
+        if self.browser is None:
+            if self.context and self.browser_pool:
+                try:
+                    await self.browser_pool.release_context(self.context_key, self.context)
+                except Exception as e:
+                    logger.debug(f"Error releasing crashed browser context: {str(e)}")
+        else:
+            for closable in (self.context, self.browser):
+                try:
+                    await closable.close()
+                except Exception as e:
+                    logger.debug(f"Error closing crashed browser: {str(e)}")
+            try:
+                await self.playwright.stop()
+            except Exception as e:
+                logger.debug(f"Error stopping Playwright: {str(e)}")
+        self.context = None
+        self.browser = None
+        self.playwright = None
     
     async def close(self):
-        """Close Playwright browser"""
+        """Release the browser context or close the private Playwright browser"""
+        # Spooled PDFs moved to disk have no name there, the returned report stays readable
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+        if self.context and self.session_store and not self.api_token:
+            # Grafana rotates session tokens, keep the latest cookies for the next report
+            try:
+                self.session_store.put(self.pool_key, await self.context.storage_state())
+            except Exception as e:
+                logger.debug(f"Could not store Grafana session: {str(e)}")
+
+        if self.own_render_client:
+            await self.render_client.stop()
+            self.render_client = None
+            self.own_render_client = False
+
+        if self.browser is None:
+            if self.context and self.browser_pool:
+                await self.browser_pool.release_context(self.context_key, self.context)
+            self.context = None
+            return
+
         if self.context:
             await self.context.close()
         if self.browser:
             await self.browser.close()
+        if self.playwright:
+            await self.playwright.stop()
+        self.context = None
+        self.browser = None
+        self.playwright = None
     
-    async def _login_to_grafana(self):
-        """Authenticate with Grafana"""
-        page = await self.context.new_page()
+    async def _prepare_context(self, context):
+        """Set up request filtering on a new browser context and log it in"""
+        await self.request_filter.install(context, self.grafana_url, self.api_token)
+        await self._authenticate_context(context)
+    
+    async def _authenticate_context(self, context):
+        """Authenticate a browser context, reusing a stored Grafana session if it is still valid"""
+        if self.api_token:
+            # The request filter sends the token with every request to Grafana, no login page needed
+            self.session_checked = True
+            logger.info(f"Using service account token for {self.grafana_url}")
+            return
+
+        state = self.session_store.get(self.pool_key) if self.session_store else None
+        if state:
+            await context.add_cookies(state.get("cookies", []))
+            if await self._is_session_valid(context):
+                self.session_store.stats["reused"] += 1
+                self.session_checked = True
+                logger.info(f"Reusing stored Grafana session for {self.grafana_url}")
+                return
+            logger.info("Stored Grafana session is no longer valid, logging in again")
+            self.session_store.invalidate(self.pool_key)
+            await context.clear_cookies()
+
+        await self._login_and_store(context)
+    
+    async def _login_and_store(self, context):
+        """Log a context in with the login form and remember the resulting session"""
+        await self._login_to_grafana(context)
+        self.session_checked = True
+        if self.session_store:
+            self.session_store.stats["logins"] += 1
+            self.session_store.put(self.pool_key, await context.storage_state())
+    
+    async def _is_session_valid(self, context) -> bool:
+        """
+        Probe the Grafana API with the session cookies of a context
+        
+        Args:
+            context: Browser context to check
+            
+        Returns:
+            True if Grafana accepts the session, False on 401 or errors
+        """
+        try:
+            response = await context.request.get(f"{self.grafana_url}/api/user")
+            if response.status == 401:
+                logger.debug("Grafana session probe returned 401")
+            return response.ok
+        except Exception as e:
+            logger.warning(f"Error validating Grafana session: {str(e)}")
+            return False
+    
+    async def _login_to_grafana(self, context):
+        """Authenticate a browser context with Grafana"""
+        page = await context.new_page()
         
         try:
             logger.debug(f"Attempting to log in to Grafana at {self.grafana_url}/login")
@@ -85,7 +486,9 @@ class PDFGenerator:
         finally:
             await page.close()
     
-    async def capture_panel(self, panel_url: str, width: int, height: int, grafana_version: str) -> BytesIO:
+    async def capture_panel(self, panel_url: str, width: int, height: int, grafana_version: str,
+                            page: Page = None, vector: bool = False, encoding: Dict[str, Any] = None,
+                            timings: Dict[str, float] = None) -> BytesIO:
         """
         Capture a panel as image using Playwright
         
@@ -94,39 +497,36 @@ class PDFGenerator:
             width: Desired width
             height: Desired height
             grafana_version: Grafana version
+            page: Optional page to reuse, a new page is opened and closed otherwise
+            vector: Print the panel to a one-page PDF instead of taking a screenshot
+            encoding: Image encoding from _get_image_encoding, PNG if not given
+            timings: Optional dict, the screenshot and encoding time is added to its "encode_seconds"
             
         Returns:
-            BytesIO object containing the panel image
+            BytesIO object containing the panel image (PNG, JPEG, WebP or PDF)
         """
-        page = await self.context.new_page()
+        own_page = page is None
+        if own_page:
+            await self._ensure_context()
+            page = await self.context.new_page()
+        
+        # Track datasource queries from before the navigation starts
+        query_state = self._track_queries(page)
         
         try:
             logger.info(f"Capturing panel from URL: {panel_url}")
             await page.set_viewport_size({"width": width, "height": height})
             await page.goto(panel_url, wait_until="domcontentloaded")
             
-            # Import settings service to get selectors
-            from api.api_controller import settings_service
-            
-            # Get selectors from settings
-            settings = settings_service.get_decrypted_settings()
-            selectors = settings.get("grafana_selectors", [])
-            
-            # Find matching selector for the version
+            # Find matching selector for the version, compiled once from the settings
             # see: https://autify.com/blog/playwright-get-by-id
-            selector_found = False
-            for selector_config in selectors:
-                if grafana_version.startswith(selector_config.get("version", "")):
-                    selector = selector_config.get("selector", "")
-                    if selector:
-                        logger.debug(f"Using selector '{selector}' for Grafana version {grafana_version}")
-                        #await page.get_by_test_id(selector).wait_for(timeout=30000)
-                        await page.locator(f'[data-testid^="{selector}"]').wait_for(timeout=30000);
-                        selector_found = True
-                        break
-            
-            # Default fallback if no matching selector found
-            if not selector_found:
+            selector = self._get_grafana_selector(grafana_version)
+            if selector:
+                logger.debug(f"Using selector '{selector}' for Grafana version {grafana_version}")
+                #await page.get_by_test_id(selector).wait_for(timeout=30000)
+                await page.locator(f'[data-testid^="{selector}"]').wait_for(timeout=30000);
+            else:
+                # Default fallback if no matching selector found
                 logger.warning(f"No matching selector for Grafana version {grafana_version}, using defaults")
                 if grafana_version.startswith("9."):
                     #await page.get_by_test_id("header-container").wait_for(timeout=30000)
@@ -136,14 +536,544 @@ class PDFGenerator:
                     await page.locator(f'[data-testid^="data-testid panel content"]').wait_for(timeout=30000);
             
             await page.wait_for_load_state(state="domcontentloaded", timeout=60000)
-            await asyncio.sleep(3)  # Give charts time to render
+            
+            # Give charts time to render: wait until queries settled and loading indicators are gone
+            capture_settings = self._get_capture_settings()
+            await self._wait_for_render(
+                page,
+                query_state,
+                float(capture_settings.get("renderMaxWait", self.DEFAULT_RENDER_MAX_WAIT)),
+                float(capture_settings.get("renderQuietPeriod", self.DEFAULT_RENDER_QUIET_PERIOD))
+            )
+            
+            if vector:
+                # Keep the on-screen look, Chromium would apply print styles otherwise.
+                # Text and SVG stay vectors, canvas based visualizations are embedded as bitmaps
+                await page.emulate_media(media="screen")
+                pdf_data = await page.pdf(
+                    width=f"{width}px",
+                    height=f"{height}px",
+                    print_background=True,
+                    page_ranges="1"
+                )
+                return BytesIO(pdf_data)
             
             # Take screenshot
-            screenshot = await page.screenshot(type="png")
+            screenshot = await self._take_screenshot(page, encoding, timings)
 
             return BytesIO(screenshot)
         finally:
-            await page.close()
+            self._untrack_queries(page, query_state)
+            if own_page:
+                await page.close()
+
+    async def capture_dashboard_panels(self, dashboard_url: str, panel_ids: List[Any], width: int,
+                                       page: Page = None, encoding: Dict[str, Any] = None,
+                                       timings: Dict[str, float] = None,
+                                       panel_sizes: Dict[str, Tuple[int, int]] = None) -> Dict[str, BytesIO]:
+        """
+        Capture several panels from one load of the full dashboard
+        
+        Args:
+            dashboard_url: Kiosk mode URL of the dashboard
+            panel_ids: IDs of the panels to capture
+            width: Viewport width of the dashboard
+            page: Optional page to reuse, a new page is opened and closed otherwise
+            encoding: Image encoding from _get_image_encoding, PNG if not given
+            timings: Optional dict, the screenshot and encoding time is added to its "encode_seconds"
+            panel_sizes: Optional dict of panel ID (as string) to the CSS pixel size of its PDF cell,
+                listed panels are resized to it before the screenshot, the others keep their dashboard size
+            
+        Returns:
+            Dict of panel ID (as string) to BytesIO image, panels not found on the dashboard are missing
+        """
+        own_page = page is None
+        if own_page:
+            await self._ensure_context()
+            page = await self.context.new_page()
+        
+        query_state = self._track_queries(page)
+        
+        try:
+            logger.info(f"Capturing {len(panel_ids)} panels from dashboard URL: {dashboard_url}")
+            await page.set_viewport_size({"width": width, "height": 1000})
+            await page.goto(dashboard_url, wait_until="domcontentloaded")
+            await page.locator("[data-panelid], [data-viz-panel-key]").first.wait_for(timeout=30000)
+            
+            # Grafana only renders panels inside the viewport, so size it to the whole dashboard
+            dashboard_height = await page.evaluate("""() => {
+                const grid = document.querySelector('.react-grid-layout');
+                if (!grid) return document.documentElement.scrollHeight;
+                return Math.ceil(grid.getBoundingClientRect().top + grid.scrollHeight);
+            }""")
+            viewport_height = min(max(int(dashboard_height), 1000), self.DASHBOARD_MAX_HEIGHT)
+            if viewport_height > 1000:
+                await page.set_viewport_size({"width": width, "height": viewport_height})
+            
+            capture_settings = self._get_capture_settings()
+            render_max_wait = float(capture_settings.get("renderMaxWait", self.DEFAULT_RENDER_MAX_WAIT))
+            render_quiet_period = float(capture_settings.get("renderQuietPeriod", self.DEFAULT_RENDER_QUIET_PERIOD))
+            await self._wait_for_render(page, query_state, render_max_wait, render_quiet_period)
+            
+            panel_sizes = panel_sizes or {}
+            images = {}
+            for panel_id in panel_ids:
+                selector = ", ".join(s.format(panel_id=panel_id) for s in self.DASHBOARD_PANEL_SELECTORS)
+                panel = page.locator(selector).first
+                if await panel.count() == 0:
+                    logger.warning(f"Panel {panel_id} not found on dashboard (collapsed row?)")
+                    continue
+                
+                size = panel_sizes.get(str(panel_id))
+                if not size:
+                    images[str(panel_id)] = BytesIO(await self._take_screenshot(panel, encoding, timings))
+                    continue
+                
+                # Give the panel the aspect ratio of its cell, it re-renders at the new size
+                previous_style = await panel.evaluate(self.RESIZE_PANEL_SCRIPT, list(size))
+                try:
+                    await self._wait_for_render(page, query_state, render_max_wait, render_quiet_period)
+                    images[str(panel_id)] = BytesIO(await self._take_screenshot(panel, encoding, timings))
+                finally:
+                    await panel.evaluate(self.RESTORE_PANEL_SCRIPT, previous_style)
+            
+            return images
+        finally:
+            self._untrack_queries(page, query_state)
+            if own_page:
+                await page.close()
+
+    async def _take_screenshot(self, target, encoding: Dict[str, Any] = None,
+                               timings: Dict[str, float] = None) -> bytes:
+        """
+        Take a screenshot of a page or element in the requested encoding
+        
+        Args:
+            target: Playwright page or locator
+            encoding: Image encoding from _get_image_encoding, PNG if not given
+            timings: Optional dict, the elapsed time is added to its "encode_seconds"
+            
+        Returns:
+            Encoded image
+        """
+        encoding = encoding or {"format": self.DEFAULT_IMAGE_FORMAT, "quality": self.DEFAULT_IMAGE_QUALITY}
+        started = time.monotonic()
+        if encoding["format"] == "jpeg":
+            data = await target.screenshot(type="jpeg", quality=encoding["quality"])
+        else:
+            data = await target.screenshot(type="png")
+            if encoding["format"] != "png":
+                # Chromium cannot write WebP screenshots, keep the event loop free while Pillow encodes
+                data = await asyncio.to_thread(self._encode_image, data, encoding)
+        if timings is not None:
+            timings["encode_seconds"] = timings.get("encode_seconds", 0.0) + time.monotonic() - started
+        return data
+
+    def _encode_image(self, data: bytes, encoding: Dict[str, Any]) -> bytes:
+        """
+        Re-encode a PNG image (screenshot or render endpoint response)
+        
+        Args:
+            data: PNG image
+            encoding: Image encoding from _get_image_encoding
+            
+        Returns:
+            Image in the requested encoding
+        """
+        image = PILImage.open(BytesIO(data))
+        output = BytesIO()
+        if encoding["format"] == "jpeg":
+            image.convert("RGB").save(output, "JPEG", quality=encoding["quality"], optimize=True)
+        elif encoding["format"] == "webp":
+            image.save(output, "WEBP", quality=encoding["quality"])
+        elif encoding["format"] == "webp-lossless":
+            image.save(output, "WEBP", lossless=True)
+        else:
+            return data
+        return output.getvalue()
+
+    def _get_image_encoding(self, template: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get the encoding of captured panels from the "image" section of a template
+        
+        Args:
+            template: Template configuration
+            
+        Returns:
+            Dict with format (one of IMAGE_FORMATS) and quality (1-100, JPEG and lossy WebP)
+        """
+        image_settings = template.get("image") or {}
+        image_format = str(image_settings.get("format", self.DEFAULT_IMAGE_FORMAT)).lower()
+        if image_format == "jpg":
+            image_format = "jpeg"
+        if image_format not in self.IMAGE_FORMATS:
+            logger.warning(f"Unknown image format '{image_format}' in template, using {self.DEFAULT_IMAGE_FORMAT}")
+            image_format = self.DEFAULT_IMAGE_FORMAT
+        # Missing, cleared (null or empty) and out of range values fall back to the default
+        quality = image_settings.get("quality")
+        try:
+            quality = int(float(quality))
+        except (TypeError, ValueError, OverflowError):
+            quality = None
+        if quality is None or not 1 <= quality <= 100:
+            if image_settings.get("quality") not in (None, ""):
+                logger.warning(f"Invalid image quality '{image_settings.get('quality')}' in template, "
+                               f"using {self.DEFAULT_IMAGE_QUALITY}")
+            quality = self.DEFAULT_IMAGE_QUALITY
+        return {"format": image_format, "quality": quality}
+
+    def _get_pdf_settings(self, template: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get the output settings of the PDF from the "pdf" section of a template
+        
+        Args:
+            template: Template configuration
+            
+        Returns:
+            Dict with image_dpi (0 keeps the captured resolution), compress_pages and linearize
+        """
+        pdf_settings = template.get("pdf") or {}
+        return {
+            "image_dpi": max(0, int(pdf_settings.get("imageDpi", self.DEFAULT_IMAGE_DPI) or 0)),
+            "compress_pages": bool(pdf_settings.get("compressPages", self.DEFAULT_COMPRESS_PAGES)),
+            "linearize": bool(pdf_settings.get("linearize", self.DEFAULT_LINEARIZE))
+        }
+
+    def _get_image_max_sizes(self, panel_images: List[Dict[str, Any]], template: Dict[str, Any],
+                             layout: Dict[str, int], dpi: int) -> Dict[str, Any]:
+        """
+        Compute the pixel size panel images need to be printed with the target DPI
+        
+        Args:
+            panel_images: Captured panels with position info
+            template: Template configuration
+            layout: Layout configuration (rows, columns)
+            dpi: Target resolution, 0 keeps the captured resolution
+            
+        Returns:
+            Dict of content digest to maximum (width, height) in pixels, an image placed more
+            than once gets the size of its largest box
+        """
+        if dpi <= 0:
+            return {}
+        geometry = self._compute_page_geometry(self._ensure_numeric_values(template), layout)
+        max_sizes = {}
+        for panel in panel_images:
+            if panel.get("error") or panel["image"] is None or panel["image"].getvalue()[:5] == b"%PDF-":
+                continue
+            digest = hashlib.sha1(panel["image"].getvalue()).hexdigest()
+            self._merge_max_size(max_sizes, digest, self._get_print_size(panel, geometry, dpi))
+        return max_sizes
+
+    def _get_print_size(self, panel: Dict[str, Any], geometry: Dict[str, Any], dpi: int) -> Tuple[int, int]:
+        """
+        Compute the pixel size of a panel box printed with a DPI
+        
+        Args:
+            panel: Panel with grid position (x, y, w, h)
+            geometry: Page geometry from _compute_page_geometry
+            dpi: Target resolution
+            
+        Returns:
+            Tuple (width, height) in pixels
+        """
+        _, _, width, height = self._get_panel_box(panel, geometry)
+        # PDF points are 1/72 inch
+        return math.ceil(width / 72 * dpi), math.ceil(height / 72 * dpi)
+
+    @staticmethod
+    def _merge_max_size(max_sizes: Dict[Any, Tuple[int, int]], key, size: Tuple[int, int]):
+        """Store a pixel size under a key, keeping the larger width and height of an existing entry"""
+        if key in max_sizes:
+            size = (max(size[0], max_sizes[key][0]), max(size[1], max_sizes[key][1]))
+        max_sizes[key] = size
+
+    def _get_grafana_selector(self, grafana_version: str) -> Optional[str]:
+        """
+        Get the panel selector configured for a Grafana version
+        
+        Args:
+            grafana_version: Grafana version
+            
+        Returns:
+            Selector or None to use the defaults
+        """
+        if self.grafana_selectors is not None:
+            return self.grafana_selectors.get(grafana_version)
+        
+        # Import here to avoid circular imports
+        from api.api_controller import settings_service
+        return settings_service.get_grafana_selector(grafana_version)
+
+    async def prewarm(self, dashboard_urls: List[str]) -> int:
+        """
+        Log in and load dashboards ahead of a scheduled report, so the report starts hot
+        
+        The logged-in context stays in the browser pool and Grafana's static assets land in
+        the asset cache of the request filter. Without pool or capture workers nothing would
+        outlive this generator, so nothing is done then.
+        
+        Args:
+            dashboard_urls: Kiosk mode URLs of the dashboards used by the report
+            
+        Returns:
+            Number of dashboards loaded
+        """
+        capture_settings = self._get_capture_settings()
+        width = int(capture_settings.get("dashboardCaptureWidth", self.DEFAULT_DASHBOARD_CAPTURE_WIDTH))
+        timeout = float(capture_settings.get("panelTimeout", self.DEFAULT_PANEL_TIMEOUT))
+        
+        if self._use_capture_workers():
+            results = await asyncio.gather(*[
+                self.capture_workers.prewarm_dashboard(self._get_connection(), dashboard_url, width,
+                                                       capture_settings=capture_settings, timeout=timeout)
+                for dashboard_url in dashboard_urls
+            ], return_exceptions=True)
+        elif self.browser_pool and self.browser_pool.is_available():
+            await self._ensure_context()
+            results = []
+            for dashboard_url in dashboard_urls:
+                try:
+                    results.append(await asyncio.wait_for(self.prewarm_dashboard(dashboard_url, width), timeout))
+                except Exception as e:
+                    results.append(e)
+        else:
+            logger.debug("Neither browser pool nor capture workers running, skipping pre-warm")
+            return 0
+        
+        for dashboard_url, result in zip(dashboard_urls, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Pre-warming {dashboard_url} failed: {str(result) or type(result).__name__}")
+        return sum(1 for result in results if not isinstance(result, BaseException))
+
+    async def prewarm_dashboard(self, dashboard_url: str, width: int, page: Page = None):
+        """
+        Load a dashboard once and wait until it rendered, without capturing anything
+        
+        Args:
+            dashboard_url: Kiosk mode URL of the dashboard
+            width: Viewport width
+            page: Optional page to reuse, a new page is opened and closed otherwise
+        """
+        own_page = page is None
+        if own_page:
+            await self._ensure_context()
+            page = await self.context.new_page()
+        
+        query_state = self._track_queries(page)
+        
+        try:
+            logger.info(f"Pre-warming dashboard URL: {dashboard_url}")
+            await page.set_viewport_size({"width": width, "height": 1000})
+            await page.goto(dashboard_url, wait_until="domcontentloaded")
+            capture_settings = self._get_capture_settings()
+            await self._wait_for_render(
+                page,
+                query_state,
+                float(capture_settings.get("renderMaxWait", self.DEFAULT_RENDER_MAX_WAIT)),
+                float(capture_settings.get("renderQuietPeriod", self.DEFAULT_RENDER_QUIET_PERIOD))
+            )
+        finally:
+            self._untrack_queries(page, query_state)
+            if own_page:
+                await page.close()
+
+    def _get_capture_settings(self) -> Dict[str, Any]:
+        """
+        Get the "capture" section of the application settings, loaded once per generator
+        
+        Returns:
+            Capture settings dict (empty if not configured)
+        """
+        if self.capture_settings is None:
+            try:
+                # Import here to avoid circular imports
+                from api.api_controller import settings_service
+                settings = settings_service.get_settings() or {}
+                self.capture_settings = settings.get("capture", {})
+            except Exception as e:
+                logger.warning(f"Could not load capture settings, using defaults: {str(e)}")
+                self.capture_settings = {}
+        return self.capture_settings
+
+    async def _get_dashboard_version(self, grafana_service, dashboard_uid: str, server_id: str = None) -> Optional[int]:
+        """
+        Get the version of a dashboard, part of the panel cache key
+        
+        Args:
+            grafana_service: Instance of GrafanaService
+            dashboard_uid: Dashboard UID
+            server_id: Server ID, or None to use the current server
+            
+        Returns:
+            Dashboard version or None if it could not be fetched
+        """
+        dashboard = await self._get_dashboard(grafana_service, dashboard_uid, server_id)
+        return dashboard.get("dashboard", {}).get("version")
+
+    async def _get_dashboard(self, grafana_service, dashboard_uid: str, server_id: str = None) -> Dict[str, Any]:
+        """
+        Get the JSON model of a dashboard, fetched once per report
+        
+        Args:
+            grafana_service: Instance of GrafanaService
+            dashboard_uid: Dashboard UID
+            server_id: Server ID, or None to use the current server
+            
+        Returns:
+            Dashboard as returned by the Grafana API, empty if it could not be fetched
+        """
+        if dashboard_uid not in self.dashboards:
+            # The Grafana client is synchronous, keep the event loop free for running captures
+            dashboard = await asyncio.to_thread(grafana_service.get_dashboard_by_uid, dashboard_uid, server_id)
+            self.dashboards[dashboard_uid] = dashboard or {}
+        return self.dashboards[dashboard_uid]
+
+    def _get_capture_scale(self) -> float:
+        """
+        Get the device scale factor panels are captured with
+        
+        Returns:
+            Scale factor from the capture settings
+        """
+        return float(self._get_capture_settings().get("captureScale", self.DEFAULT_CAPTURE_SCALE))
+
+    def _is_vector_capture(self) -> bool:
+        """
+        Check if panels are printed to PDF and embedded as vectors instead of screenshots
+        
+        Returns:
+            True if vector capture is enabled in the capture settings
+        """
+        return bool(self._get_capture_settings().get("vectorCapture", False))
+
+    async def _plan_dashboard_captures(self, panels: List[Dict[str, Any]], grafana_service, server_id: str,
+                                       panel_size) -> Dict[str, Dict[Any, Tuple[int, int]]]:
+        """
+        Decide which dashboards are captured as a whole instead of panel by panel
+        
+        A dashboard load renders every panel of the dashboard, so it only pays off if the layout
+        uses a large enough share of them.
+        
+        Args:
+            panels: Panels of the layout
+            grafana_service: Instance of GrafanaService
+            server_id: Server ID, or None to use the current server
+            panel_size: Function returning the CSS pixel size of a layout panel's cell
+            
+        Returns:
+            Dict of dashboard UID to its panels used in the layout, by panel ID with the cell size
+            of their first occurrence
+        """
+        capture_settings = self._get_capture_settings()
+        min_panels = int(capture_settings.get("dashboardCaptureMinPanels", self.DEFAULT_DASHBOARD_CAPTURE_MIN_PANELS))
+        if min_panels <= 0 or self.capture_backend == "render" or self._is_vector_capture():
+            return {}
+        min_share = float(capture_settings.get("dashboardCaptureMinShare", self.DEFAULT_DASHBOARD_CAPTURE_MIN_SHARE))
+        
+        panels_by_dashboard = {}
+        for panel_item in panels:
+            panel_sizes = panels_by_dashboard.setdefault(panel_item["dashboardUid"], {})
+            if panel_item["panelId"] not in panel_sizes:
+                panel_sizes[panel_item["panelId"]] = panel_size(panel_item)
+        
+        plan = {}
+        for uid, panel_sizes in panels_by_dashboard.items():
+            if len(panel_sizes) < min_panels:
+                continue
+            # Panels of collapsed rows are nested in their row and not rendered
+            dashboard = await self._get_dashboard(grafana_service, uid, server_id)
+            rendered_panels = sum(1 for panel in dashboard.get("dashboard", {}).get("panels", [])
+                                  if panel.get("type") != "row")
+            if not rendered_panels or len(panel_sizes) / rendered_panels < min_share:
+                logger.debug(f"Layout uses {len(panel_sizes)} of {rendered_panels} panels of dashboard {uid}, "
+                             f"capturing them panel by panel")
+                continue
+            plan[uid] = panel_sizes
+            logger.debug(f"Capturing {len(panel_sizes)} panels of dashboard {uid} from a single dashboard load")
+        return plan
+
+    def _track_queries(self, page: Page) -> Dict[str, Any]:
+        """
+        Count in-flight datasource queries of a page through Playwright network events
+        
+        Args:
+            page: Page to observe
+            
+        Returns:
+            Tracking state, to be passed to _wait_for_render and _untrack_queries
+        """
+        state = {"inflight": set(), "last_activity": time.monotonic()}
+        
+        def is_query(request):
+            return any(pattern in request.url for pattern in self.RENDER_QUERY_PATTERNS)
+        
+        def on_request(request):
+            if is_query(request):
+                state["inflight"].add(request)
+                state["last_activity"] = time.monotonic()
+        
+        def on_request_done(request):
+            if request in state["inflight"]:
+                state["inflight"].discard(request)
+                state["last_activity"] = time.monotonic()
+        
+        state["listeners"] = [
+            ("request", on_request),
+            ("requestfinished", on_request_done),
+            ("requestfailed", on_request_done)
+        ]
+        for event, handler in state["listeners"]:
+            page.on(event, handler)
+        return state
+
+    def _untrack_queries(self, page: Page, state: Dict[str, Any]):
+        """Remove the network listeners added by _track_queries"""
+        for event, handler in state.get("listeners", []):
+            try:
+                page.remove_listener(event, handler)
+            except Exception as e:
+                logger.debug(f"Error removing {event} listener: {str(e)}")
+
+    async def _wait_for_render(self, page: Page, state: Dict[str, Any], max_wait: float, quiet_period: float) -> bool:
+        """
+        Wait until a panel has finished rendering
+        
+        The panel counts as rendered once no datasource query is in flight, no loading
+        indicator is shown and both conditions held for the quiet period.
+        
+        Args:
+            page: Page showing the panel
+            state: Query tracking state from _track_queries
+            max_wait: Maximum time to wait in seconds
+            quiet_period: Time in seconds without query activity before the panel counts as rendered
+            
+        Returns:
+            True if the panel settled, False if max_wait was reached
+        """
+        loading_indicators = page.locator(", ".join(self.RENDER_LOADING_SELECTORS))
+        start = time.monotonic()
+        settled_since = None
+        
+        while True:
+            now = time.monotonic()
+            settled = not state["inflight"] and await loading_indicators.count() == 0
+            if not settled:
+                settled_since = None
+            elif settled_since is None:
+                settled_since = now
+            
+            if (settled_since is not None and now - settled_since >= quiet_period
+                    and now - state["last_activity"] >= quiet_period):
+                logger.debug(f"Panel rendered after {now - start:.2f}s")
+                return True
+            
+            if now - start >= max_wait:
+                logger.warning(f"Panel did not settle within {max_wait}s "
+                               f"({len(state['inflight'])} queries in flight), capturing anyway")
+                return False
+            
+            await asyncio.sleep(0.1)
 
     def _ensure_numeric_values(self, template):
         """
@@ -176,23 +1106,17 @@ class PDFGenerator:
 
         return template
 
-    def _generate_multi_page_pdf(self, panel_images: List[Dict[str, Any]], template: Dict[str, Any], 
-                                 layout: Dict[str, int], time_range=None, grafana_version=None) -> BytesIO:
+    def _compute_page_geometry(self, template: Dict[str, Any], layout: Dict[str, int]) -> Dict[str, Any]:
         """
-        Generate multi-page PDF report from panel images
+        Compute page size and grid cell dimensions of the report
         
         Args:
-            panel_images: List of panel image data (BytesIO objects) with position info
-            template: Template configuration for header/footer
-            layout: Layout configuration (rows, columns, etc.)
-            time_range: Dictionary containing time range info (from, to)
+            template: Template configuration with numeric values (see _ensure_numeric_values)
+            layout: Layout configuration (rows, columns)
             
         Returns:
-            BytesIO object containing the PDF
+            Dict with page size, margins, content area and cell dimensions in PDF points
         """
-        # Ensure all template values are of the correct type
-        template = self._ensure_numeric_values(template)
-
         # Setup PDF size and orientation
         page_sizes = {
             "A4": A4,
@@ -202,17 +1126,7 @@ class PDFGenerator:
         page_size = page_sizes.get(template["page"]["size"], A4)
         
         if template["page"]["orientation"] == "landscape":
-            page_size = landscape(page_size)
-        
-        # Create PDF buffer
-        buffer = BytesIO()
-        pdf = canvas.Canvas(buffer, pagesize=page_size)
-        pdf.setAuthor("Grafana PDF Reporter")
-        pdf.setSubject("Security Report")
-        pdf.setTitle(template["header"]["title"])
-        # Add Grafana version to PDF metadata if available
-        if grafana_version:
-            pdf.setKeywords(f"Grafana {grafana_version}")
+            page_size = landscape(page_size)
 
         # Get page dimensions
         page_width, page_height = page_size
@@ -241,101 +1155,483 @@ class PDFGenerator:
         cell_width = (content_width - horizontal_spacing_total) / columns
         cell_height = (content_height - vertical_spacing_total) / rows_per_page
         
+        # Position for content area (top of content area)
+        content_y = page_height - (margins["marginTop"] * mm + template["header"]["height"] * mm + spacing_between_sections)
+        
+        return {
+            "page_size": page_size,
+            "margins": margins,
+            "content_y": content_y,
+            "spacing": spacing,
+            "rows_per_page": rows_per_page,
+            "columns": columns,
+            "cell_width": cell_width,
+            "cell_height": cell_height
+        }
+
+    def _get_panel_box(self, panel: Dict[str, Any], geometry: Dict[str, Any]):
+        """
+        Compute where a panel is placed on its page
+        
+        Args:
+            panel: Panel with grid position (x, y, w, h)
+            geometry: Page geometry from _compute_page_geometry
+            
+        Returns:
+            Tuple (x, y, width, height) in PDF points, y is the bottom edge
+        """
+        spacing = geometry["spacing"]
+        cell_width = geometry["cell_width"]
+        cell_height = geometry["cell_height"]
+        
+        # Calculate position within this page's grid
+        # Adjust y-coordinate relative to the current page
+        relative_y = panel["y"] % geometry["rows_per_page"]
+        
+        # Calculate position in PDF coordinates with spacing
+        # For x position: each cell gets its width plus spacing between cells
+        x = geometry["margins"]["marginLeft"] * mm + panel["x"] * (cell_width + spacing)
+        
+        # For y position: calculate from top of content area
+        # Each row gets its height plus spacing between rows
+        y = geometry["content_y"] - (relative_y * (cell_height + spacing) + panel["h"] * cell_height)
+        
+        # Panel dimensions
+        width = panel["w"] * cell_width
+        # If the panel spans multiple grid cells, we need to add spacing between them
+        if panel["w"] > 1:
+            width += spacing * (panel["w"] - 1)
+        
+        height = panel["h"] * cell_height
+        # If the panel spans multiple grid cells, we need to add spacing between them
+        if panel["h"] > 1:
+            height += spacing * (panel["h"] - 1)
+        
+        return x, y, width, height
+
+    def _generate_multi_page_pdf(self, panel_images: List[Dict[str, Any]], template: Dict[str, Any], 
+                                 layout: Dict[str, int], time_range=None, grafana_version=None,
+                                 image_encoding: Dict[str, Any] = None,
+                                 prepared_images: Dict[str, Dict[str, Any]] = None,
+                                 image_max_sizes: Dict[str, Any] = None,
+                                 compress_pages: bool = True) -> BinaryIO:
+        """
+        Generate multi-page PDF report from panel images
+        
+        Args:
+            panel_images: List of panel image data (BytesIO objects) with position info
+            template: Template configuration for header/footer
+            layout: Layout configuration (rows, columns, etc.)
+            time_range: Dictionary containing time range info (from, to)
+            image_encoding: Encoding the panels were captured with, see _get_image_encoding
+            prepared_images: Optional panel images prepared by the ImagePreparer, by content digest
+            image_max_sizes: Optional maximum pixel sizes of panel images by content digest, see _get_image_max_sizes
+            compress_pages: Compress the content streams of the pages
+            
+        Returns:
+            Spooled temporary file containing the PDF, positioned at its start
+        """
+        document = self._begin_pdf(template, layout, time_range, grafana_version, compress_pages)
+        
         # Group panels by page based on their y-coordinate
         panels_by_page = {}
         for panel in panel_images:
-            page_index = panel["y"] // rows_per_page
+            page_index = panel["y"] // document["geometry"]["rows_per_page"]
             if page_index not in panels_by_page:
                 panels_by_page[page_index] = []
             panels_by_page[page_index].append(panel)
         
         # Sort pages by index
         sorted_pages = sorted(panels_by_page.keys())
-        total_pages = len(sorted_pages)
-        
-        # Draw each page
-        for i, page_index in enumerate(sorted_pages):
-            if i > 0:
-                # Add a new page for subsequent pages
-                pdf.showPage()
-            
-            # Position for content area (top of content area)
-            content_y = page_height - (margins["marginTop"] * mm + template["header"]["height"] * mm + spacing_between_sections)
-            
-            # Draw header
-            self._draw_header(pdf, template["header"], page_width, page_height, margins)
-            
-            # Draw panels for this page
-            panels_on_page = panels_by_page[page_index]
-            for panel in panels_on_page:
-                # Calculate position within this page's grid
-                # Adjust y-coordinate relative to the current page
-                relative_y = panel["y"] % rows_per_page
-                
-                # Calculate position in PDF coordinates with spacing
-                # For x position: each cell gets its width plus spacing between cells
-                x = margins["marginLeft"] * mm + panel["x"] * (cell_width + spacing)
-                
-                # For y position: calculate from top of content area
-                # Each row gets its height plus spacing between rows
-                y = content_y - (relative_y * (cell_height + spacing) + panel["h"] * cell_height)
-                
-                # Panel dimensions
-                width = panel["w"] * cell_width
-                # If the panel spans multiple grid cells, we need to add spacing between them
-                if panel["w"] > 1:
-                    width += spacing * (panel["w"] - 1)
-                
-                height = panel["h"] * cell_height
-                # If the panel spans multiple grid cells, we need to add spacing between them
-                if panel["h"] > 1:
-                    height += spacing * (panel["h"] - 1)
+        try:
+            for i, page_index in enumerate(sorted_pages):
+                prepare_seconds = self._draw_pdf_page(document, panels_by_page[page_index], i + 1,
+                                                      len(sorted_pages), image_encoding, prepared_images,
+                                                      image_max_sizes)
+                if self.capture_stats:
+                    self.capture_stats["prepare_seconds"] = self.capture_stats.get("prepare_seconds", 0.0) + prepare_seconds
+        except BaseException:
+            document["buffer"].close()
+            raise
+        return self._finish_pdf(document)
 
-                try:
-                    # Ensure it's a BytesIO object
-                    if isinstance(panel["image"], BytesIO):
-                        img_data = panel["image"]
-                        img_data.seek(0)  # Ensure we're at the beginning
-                    else:
-                        logger.error(f"Unexpected image type: {type(panel['image'])}")
-                        continue  # Skip this panel
+    @binary_pdf_streams()
+    def _begin_pdf(self, template: Dict[str, Any], layout: Dict[str, int], time_range=None,
+                   grafana_version=None, compress_pages: bool = True) -> Dict[str, Any]:
+        """
+        Start a PDF document whose pages are drawn one by one with _draw_pdf_page
+        
+        Args:
+            template: Template configuration for header/footer
+            layout: Layout configuration (rows, columns, etc.)
+            time_range: Dictionary containing time range info (from, to)
+            grafana_version: Optional Grafana version for the PDF metadata
+            compress_pages: Compress the content streams of the pages
+            
+        Returns:
+            Dict with the canvas, its output file, the template with numeric values, the page
+            geometry and the images embedded so far
+        """
+        # Ensure all template values are of the correct type
+        template = self._ensure_numeric_values(template)
+        geometry = self._compute_page_geometry(template, layout)
+        page_size = geometry["page_size"]
+        page_width, page_height = page_size
+        margins = geometry["margins"]
+        
+        buffer = self._create_pdf_file()
+        pdf = canvas.Canvas(buffer, pagesize=page_size, pageCompression=1 if compress_pages else 0)
+        pdf.setAuthor("Grafana PDF Reporter")
+        pdf.setSubject("Security Report")
+        pdf.setTitle(template["header"]["title"])
+        # Add Grafana version to PDF metadata if available
+        if grafana_version:
+            pdf.setKeywords(f"Grafana {grafana_version}")
+        
+        # Static header and footer content is drawn once and stamped on every page
+        self._create_page_forms(pdf, template, page_width, page_height, margins, time_range)
+        
+        return {
+            "pdf": pdf,
+            "buffer": buffer,
+            "template": template,
+            "geometry": geometry,
+            "pages": 0,
+            "placed_images": {},  # Content digest -> embedded image from _get_panel_image
+            "embedded_images": set()  # Content digests of all images in the document
+        }
+
+    def _create_pdf_file(self) -> BinaryIO:
+        """
+        Create the file a PDF is written to
+        
+        Returns:
+            Spooled temporary file, kept in memory up to the spool size and moved to temp_dir beyond
+        """
+        spool_mb = float(self._get_capture_settings().get("pdfSpoolMb", self.DEFAULT_PDF_SPOOL_MB))
+        return tempfile.SpooledTemporaryFile(max_size=int(spool_mb * 1024 * 1024), mode="w+b", dir=self.temp_dir)
+
+    def _linearize_pdf(self, pdf_data: BinaryIO) -> BinaryIO:
+        """
+        Rewrite a PDF linearized ("fast web view"), viewers loading it in byte ranges show
+        the first page before the rest is downloaded
+        
+        Args:
+            pdf_data: PDF file from _finish_pdf, closed if it was rewritten
+            
+        Returns:
+            Spooled temporary file containing the linearized PDF, or pdf_data itself if
+            pikepdf is not installed or the PDF could not be rewritten
+        """
+        try:
+            import pikepdf
+        except ImportError:
+            logger.warning("pikepdf is not installed, PDF is not linearized")
+            return pdf_data
+        
+        output = self._create_pdf_file()
+        try:
+            pdf_data.seek(0)
+            with pikepdf.open(pdf_data) as document:
+                document.save(output, linearize=True)
+        except Exception as e:
+            output.close()
+            logger.warning(f"Error linearizing PDF, delivering it as it is: {str(e)}")
+            pdf_data.seek(0)
+            return pdf_data
+        
+        pdf_data.close()
+        output.seek(0)
+        if self.capture_stats:
+            self.capture_stats["linearized"] = True
+        return output
+
+    @binary_pdf_streams()
+    def _draw_pdf_page(self, document: Dict[str, Any], panels: List[Dict[str, Any]], page_number: int,
+                       total_pages: int, image_encoding: Dict[str, Any] = None,
+                       prepared_images: Dict[str, Dict[str, Any]] = None,
+                       image_max_sizes: Dict[str, Any] = None) -> float:
+        """
+        Draw the next page of a document started with _begin_pdf
+        
+        Runs in a drawing thread, so it leaves capture_stats["prepare_seconds"] to the caller.
+        
+        Args:
+            document: Document from _begin_pdf
+            panels: Panels of the page with position info
+            page_number: Number of the page, starting at 1
+            total_pages: Number of pages of the document
+            image_encoding: Encoding the panels were captured with, see _get_image_encoding
+            prepared_images: Optional panel images prepared by the ImagePreparer, by content digest
+            image_max_sizes: Optional maximum pixel sizes of panel images by content digest, see _get_image_max_sizes
+            
+        Returns:
+            Time in seconds spent preparing images not prepared by the ImagePreparer
+        """
+        pdf = document["pdf"]
+        template = document["template"]
+        timings = {"prepare_seconds": 0.0}
+        geometry = document["geometry"]
+        page_width, page_height = geometry["page_size"]
+        placed_images = document["placed_images"]
+        
+        if document["pages"] > 0:
+            # Add a new page for subsequent pages
+            pdf.showPage()
+        
+        # Draw header
+        pdf.doForm("header")
+        
+        # Draw panels for this page
+        for panel in panels:
+            x, y, width, height = self._get_panel_box(panel, geometry)
 
-                    # Resize image to fit cell
-                    img = PILImage.open(img_data)
-                    img = img.resize((int(width), int(height)), PILImage.Resampling.LANCZOS)
+            if panel.get("error"):
+                self._draw_placeholder(pdf, panel, x, y, width, height)
+                continue
 
-                    # Save resized image to temporary BytesIO
-                    temp_img = BytesIO()
-                    img.save(temp_img, format="PNG")
-                    temp_img.seek(0)
-                    temp_img = ImageReader(temp_img)
+            try:
+                # Ensure it's a BytesIO object
+                if isinstance(panel["image"], BytesIO):
+                    img_data = panel["image"]
+                    img_data.seek(0)  # Ensure we're at the beginning
+                else:
+                    logger.error(f"Unexpected image type: {type(panel['image'])}")
+                    continue  # Skip this panel
 
-                    # Draw image on PDF
-                    pdf.drawImage(temp_img, x, y, width=width, height=height)
-                        
-                except Exception as e:
-                    logger.error(f"Error processing panel image: {e}")
-                    continue  # Skip this panel on error
-            
-            # Draw footer with time range info and page number
-            self._draw_footer(
-                pdf, 
-                template["footer"], 
-                page_width, 
-                page_height, 
-                margins, 
-                time_range,
-                current_page=i+1, 
-                total_pages=total_pages
-            )
+                if img_data.getvalue()[:5] == b"%PDF-":
+                    # Vector capture, embedded as form XObject
+                    self._draw_pdf_panel(pdf, img_data, x, y, width, height)
+                    continue
+
+                # Panels are captured at cell size, the PDF only scales them to points.
+                # Images of another aspect ratio (dashboard captures) are fitted, not distorted
+                image = self._get_panel_image(pdf, img_data, image_encoding, placed_images, prepared_images,
+                                              image_max_sizes, document["embedded_images"], timings)
+                if "path" in image:
+                    pdf.drawImage(image["path"], x, y, width=width, height=height,
+                                  preserveAspectRatio=True, anchor='c')
+                else:
+                    draw_flate_image(pdf, image["form"], image["size"], x, y, width, height)
+                    
+            except Exception as e:
+                logger.error(f"Error processing panel image: {e}")
+                continue  # Skip this panel on error
+        
+        # Draw footer, only the page number differs between pages
+        pdf.doForm("footer")
+        self._draw_page_number(pdf, template["footer"], page_width, geometry["margins"],
+                               current_page=page_number, total_pages=total_pages)
+        document["pages"] += 1
+        return timings["prepare_seconds"]
+
+    @binary_pdf_streams()
+    def _finish_pdf(self, document: Dict[str, Any]) -> BinaryIO:
+        """
+        Write a document started with _begin_pdf
         
+        Args:
+            document: Document from _begin_pdf
+            
+        Returns:
+            Spooled temporary file containing the PDF, positioned at its start
+        """
         # Finalize PDF
-        pdf.save()
+        buffer = document["buffer"]
+        try:
+            document["pdf"].save()
+        except BaseException:
+            buffer.close()
+            raise
+        finally:
+            # ReportLab has read the JPEG files while drawing
+            for image in document["placed_images"].values():
+                if "path" in image:
+                    try:
+                        os.remove(image["path"])
+                    except OSError as e:
+                        logger.debug(f"Error removing temporary image {image['path']}: {str(e)}")
         buffer.seek(0)
+        if self.capture_stats:
+            self.capture_stats["pdf_pages"] = document["pages"]
+            self.capture_stats["pdf_images"] = len(document["embedded_images"])
         return buffer
 
-    def _draw_header(self, pdf, header_config, page_width, page_height, margins):
+    def _get_panel_image(self, pdf, img_data: BytesIO, image_encoding: Dict[str, Any], placed: Dict[str, Any],
+                         prepared: Dict[str, Dict[str, Any]] = None, max_sizes: Dict[str, Any] = None,
+                         embedded: set = None, timings: Dict[str, float] = None):
+        """
+        Embed the image of a panel in the document, without re-encoding the capture
+        
+        JPEG data is handed to ReportLab as file, which embeds it as it is without decoding
+        it even once. Other images are embedded from the Flate stream of prepare_image, see
+        embed_flate_image. Identical images are prepared once and embedded once.
+        
+        Args:
+            pdf: ReportLab canvas
+            img_data: Captured panel image
+            image_encoding: Encoding the panels were captured with
+            placed: Images embedded in this document by content digest and maximum size
+            prepared: Optional results of the ImagePreparer by content digest,
+                      images missing there are prepared here
+            max_sizes: Optional maximum pixel sizes by content digest, larger images are downsampled
+            embedded: Optional content digests of the images already in the document, for the statistics
+            timings: Optional dict, the time spent preparing the image here is added to its "prepare_seconds"
+            
+        Returns:
+            Dict with the "path" of a JPEG for drawImage, or the "form" name and pixel "size"
+            of a Flate image for draw_flate_image
+        """
+        data = img_data.getvalue()
+        digest = hashlib.sha1(data).hexdigest()
+        max_size = (max_sizes or {}).get(digest)
+        # An image needed at a larger size than where it was embedded first is embedded again
+        name = f"{digest}-{max_size[0]}x{max_size[1]}" if max_size else digest
+        if name in placed:
+            return placed[name]
+        
+        result = (prepared or {}).get(digest)
+        if result is None:
+            result = prepare_image(data, image_encoding, max_size)
+            if timings is not None:
+                timings["prepare_seconds"] = timings.get("prepare_seconds", 0.0) + result["seconds"]
+        if embedded is not None:
+            if result["downsampled"] and digest not in embedded and self.capture_stats:
+                self.capture_stats["downsampled_images"] = self.capture_stats.get("downsampled_images", 0) + 1
+            embedded.add(digest)
+        
+        if result["kind"] == "jpeg":
+            # Named by content, ReportLab identifies file images by name
+            image_path = os.path.join(self.temp_dir, f"{name}.jpg")
+            with open(image_path, "wb") as f:
+                f.write(result["data"])
+            placed[name] = {"path": image_path}
+        else:
+            embed_flate_image(pdf, f"image-{name}", result)
+            placed[name] = {"form": f"image-{name}", "size": tuple(result["size"])}
+        return placed[name]
+
+    def _draw_pdf_panel(self, pdf, pdf_data: BytesIO, x: float, y: float, width: float, height: float):
+        """
+        Draw the first page of a panel PDF as form XObject, fitted into the panel box
+        
+        Args:
+            pdf: ReportLab canvas
+            pdf_data: PDF printed by Chromium
+            x, y: Bottom left corner of the panel box in points
+            width, height: Size of the panel box in points
+        """
+        panel_page = pagexobj(PdfReader(pdf_data).pages[0])
+        x0, y0, x1, y1 = [float(value) for value in panel_page.BBox]
+        page_width, page_height = x1 - x0, y1 - y0
+        
+        # Keep the aspect ratio and center the panel like bitmap panels
+        scale = min(width / page_width, height / page_height)
+        offset_x = (width - page_width * scale) / 2
+        offset_y = (height - page_height * scale) / 2
+        
+        pdf.saveState()
+        pdf.translate(x + offset_x, y + offset_y)
+        pdf.scale(scale, scale)
+        pdf.translate(-x0, -y0)
+        pdf.doForm(makerl(pdf, panel_page))
+        pdf.restoreState()
+
+    def _draw_placeholder(self, pdf, panel: Dict[str, Any], x: float, y: float, width: float, height: float):
+        """
+        Draw a placeholder for a panel that could not be captured
+        
+        Args:
+            pdf: ReportLab canvas
+            panel: Panel entry with title and error message
+            x, y: Lower left corner of the panel box in points
+            width, height: Size of the panel box in points
+        """
+        pdf.saveState()
+        pdf.setFillColor(colors.HexColor("#f2f2f2"))
+        pdf.setStrokeColor(colors.HexColor("#b0b0b0"))
+        pdf.setLineWidth(0.5)
+        pdf.rect(x, y, width, height, stroke=1, fill=1)
+        
+        padding = 8
+        text_width = max(width - 2 * padding, 10)
+        text_y = y + height - padding - 10
+        pdf.setFillColor(colors.HexColor("#333333"))
+        if panel.get("title"):
+            pdf.setFont("Helvetica-Bold", 10)
+            for line in simpleSplit(panel["title"], "Helvetica-Bold", 10, text_width)[:2]:
+                pdf.drawString(x + padding, text_y, line)
+                text_y -= 13
+        
+        pdf.setFont("Helvetica", 9)
+        pdf.drawString(x + padding, text_y, "Panel could not be captured")
+        text_y -= 14
+        
+        pdf.setFillColor(colors.HexColor("#a00000"))
+        pdf.setFont("Helvetica", 8)
+        for line in simpleSplit(str(panel["error"]), "Helvetica", 8, text_width):
+            if text_y < y + padding:
+                break
+            pdf.drawString(x + padding, text_y, line)
+            text_y -= 10
+        pdf.restoreState()
+
+    def _create_page_forms(self, pdf, template, page_width, page_height, margins, time_range=None):
+        """
+        Draw the static header and footer content as form XObjects "header" and "footer"
+        
+        Forms are embedded once per document and referenced by every page. They must be
+        created before anything is drawn on the first page.
+        
+        Args:
+            pdf: Canvas of the document
+            template: Template configuration with numeric values
+            page_width: Page width in points
+            page_height: Page height in points
+            margins: Page margins in mm
+            time_range: Dictionary containing time range info (from, to)
+        """
+        # Same date on all pages of a report
+        date_text = datetime.now().strftime("%Y-%m-%d %H:%M")
+        
+        pdf.beginForm("header")
+        self._draw_header(pdf, template["header"], page_width, page_height, margins, date_text)
+        pdf.endForm()
+        
+        pdf.beginForm("footer")
+        self._draw_footer(pdf, template["footer"], page_width, page_height, margins, time_range)
+        pdf.endForm()
+    
+    def _get_logo(self, logo_url: str) -> ImageReader:
+        """
+        Get the decoded header logo, loaded once and shared by all reports until the TTL expires
+        
+        Args:
+            logo_url: File path or URL of the logo
+            
+        Returns:
+            ImageReader of the logo
+        """
+        with self._logo_lock:
+            cached = self._logo_cache.get(logo_url)
+            if cached and cached[0] > time.monotonic():
+                self._logo_cache.move_to_end(logo_url)
+                return cached[1]
+        
+        logo = ImageReader(logo_url)
+        # Decode now, drawImage reads the pixels of the cached reader on every report
+        logo.getRGBData()
+        with self._logo_lock:
+            self._logo_cache[logo_url] = (time.monotonic() + self.LOGO_CACHE_TTL, logo)
+            self._logo_cache.move_to_end(logo_url)
+            while len(self._logo_cache) > self.LOGO_CACHE_SIZE:
+                self._logo_cache.popitem(last=False)
+        logger.debug(f"Loaded header logo {logo_url}")
+        return logo
+    
+    def _draw_header(self, pdf, header_config, page_width, page_height, margins, date_text=None):
         """Draw header on PDF page"""
+        date_text = date_text or datetime.now().strftime("%Y-%m-%d %H:%M")
         # Header background
         pdf.setFillColor(colors.HexColor(header_config["backgroundColor"]))
         pdf.rect(
@@ -359,7 +1655,7 @@ class PDFGenerator:
         if header_config.get("logoUrl"):
             logo_height = header_config["height"] * 0.8 * mm
             pdf.drawImage(
-                header_config["logoUrl"],
+                self._get_logo(header_config["logoUrl"]),
                 page_width - (margins["marginRight"] + 30) * mm,
                 page_height - (margins["marginTop"] + header_config["height"] * 0.9) * mm,
                 width=30 * mm,
@@ -371,7 +1667,6 @@ class PDFGenerator:
             pdf.setFont("Helvetica", 9)
             
             # Calculate center position
-            date_text = datetime.now().strftime("%Y-%m-%d %H:%M")
             date_width = pdf.stringWidth(date_text, "Helvetica", 9)
             date_x = (page_width - date_width) / 2
             
@@ -386,12 +1681,11 @@ class PDFGenerator:
             pdf.drawString(
                 page_width - (margins["marginRight"] + 50) * mm,
                 page_height - (margins["marginTop"] + header_config["height"] / 2) * mm,
-                datetime.now().strftime("%Y-%m-%d %H:%M")
+                date_text
             )
     
-    def _draw_footer(self, pdf, footer_config, page_width, page_height, margins, time_range=None, 
-                     current_page=1, total_pages=1):
-        """Draw footer on PDF page with time range info and page numbers"""
+    def _draw_footer(self, pdf, footer_config, page_width, page_height, margins, time_range=None):
+        """Draw footer on PDF page with time range info, page numbers are drawn by _draw_page_number"""
         # Footer background
         pdf.setFillColor(colors.HexColor(footer_config["backgroundColor"]))
         pdf.rect(
@@ -415,14 +1709,6 @@ class PDFGenerator:
             footer_text
         )
         
-        # Page numbers - right aligned
-        page_number_text = footer_config["pageNumberFormat"].replace("(page)", str(current_page)).replace("(total)", str(total_pages))
-        pdf.drawString(
-            page_width - (margins["marginRight"] + 50) * mm,
-            (margins["marginBottom"] + footer_config["height"] / 2) * mm,
-            page_number_text
-        )
-        
         # Add time range information if available - centered
         if time_range and "from" in time_range and "to" in time_range:
             time_range_text = f"Time Range: {time_range['from']} to {time_range['to']}"
@@ -437,9 +1723,23 @@ class PDFGenerator:
                 time_range_text
             )
 
+    def _draw_page_number(self, pdf, footer_config, page_width, margins, current_page=1, total_pages=1):
+        """Draw the page number into the footer of the current page"""
+        # Forms do not change the graphics state of the page, set the footer text style
+        pdf.setFillColor(colors.HexColor(footer_config["textColor"]))
+        pdf.setFont("Helvetica", 9)
+        
+        # Page numbers - right aligned
+        page_number_text = footer_config["pageNumberFormat"].replace("(page)", str(current_page)).replace("(total)", str(total_pages))
+        pdf.drawString(
+            page_width - (margins["marginRight"] + 50) * mm,
+            (margins["marginBottom"] + footer_config["height"] / 2) * mm,
+            page_number_text
+        )
+
     async def generate_report(self, layout_config: Dict[str, Any], template_config: Dict[str, Any], 
                          grafana_service, job_id: str = None, progress_callback=None,
-                         server_id: str = None, grafana_version: str = None) -> BytesIO:
+                         server_id: str = None, grafana_version: str = None) -> BinaryIO:
         """
         Generate a complete PDF report based on layout and template
 
@@ -451,7 +1751,7 @@ class PDFGenerator:
             progress_callback: Optional callback function to report progress
         
         Returns:
-            BytesIO object containing the PDF report
+            Spooled temporary file containing the PDF report, the caller closes it
         """
         # Set the server to use if specified
         if server_id:
@@ -463,9 +1763,32 @@ class PDFGenerator:
                 grafana_version = grafana_service.get_grafana_version(server_id)
         
         try:
-            panel_images = []
             total_panels = len(layout_config["panels"])
+            panel_images = [None] * total_panels
             completed_panels = 0
+            self.failed_panels = []
+            self.dashboards = {}
+            self.capture_stats = {
+                "panels": total_panels,
+                "captured": 0,
+                "cached": 0,
+                "deduplicated": 0,
+                "failed": 0,
+                "browser_recoveries": 0,
+                "capture_seconds": 0.0,
+                "pdf_seconds": 0.0,
+                "image_format": None,
+                "image_bytes": 0,
+                "encode_seconds": 0.0,
+                "prepare_seconds": 0.0,
+                "image_dpi": 0,
+                "downsampled_images": 0,
+                "pdf_pages": 0,
+                "pdf_images": 0,
+                "pdf_bytes": 0,
+                "linearized": False
+            }
+            capture_started = time.monotonic()
             
             # Berechne Gewichtung der einzelnen Schritte
             # Wir haben: 1 Login + N Panels + 1 PDF Erstellung
@@ -485,86 +1808,599 @@ class PDFGenerator:
                 if progress_callback:
                     progress_callback(job_id, -1, "Report generation cancelled")
                 raise Exception("Report generation cancelled by user")
-                    
-            # Capture each panel
-            for panel_item in layout_config["panels"]:
-                # Check if job has been cancelled
+            
+            # Panels are captured concurrently on a bounded set of pages of the same context
+            capture_concurrency = max(1, int(grafana_service.get_server_option(
+                "captureConcurrency", self.DEFAULT_CAPTURE_CONCURRENCY, server_id)))
+            capture_concurrency = min(capture_concurrency, max(1, total_panels))
+            semaphore = asyncio.Semaphore(capture_concurrency)
+            idle_pages = []
+            open_pages = []
+            theme = layout_config.get("theme", "dark")
+            capture_settings = self._get_capture_settings()
+            dashboard_capture_width = int(capture_settings.get(
+                "dashboardCaptureWidth", self.DEFAULT_DASHBOARD_CAPTURE_WIDTH))
+            panel_timeout = float(capture_settings.get("panelTimeout", self.DEFAULT_PANEL_TIMEOUT))
+            panel_retries = max(0, int(capture_settings.get("panelRetries", self.DEFAULT_PANEL_RETRIES)))
+            panel_retry_backoff = float(capture_settings.get("panelRetryBackoff", self.DEFAULT_PANEL_RETRY_BACKOFF))
+            report_deadline = time.monotonic() + float(capture_settings.get(
+                "reportTimeout", self.DEFAULT_REPORT_TIMEOUT))
+            browser_recoveries = int(capture_settings.get("browserRecoveries", self.DEFAULT_BROWSER_RECOVERIES))
+            crashed_pages = set()
+            image_encoding = self._get_image_encoding(template_config)
+            self.capture_stats["image_format"] = image_encoding["format"]
+            # Browser captures run in the capture worker processes if they are running
+            use_workers = self._use_capture_workers()
+            logger.debug(f"Capturing {total_panels} panels with concurrency {capture_concurrency} "
+                         f"using the {self.capture_backend} backend"
+                         f"{' in capture worker processes' if use_workers else ''}")
+            
+            async def get_page():
+                # Pages are reused between panels, the semaphore bounds their number
+                await self._ensure_context()
+                while idle_pages:
+                    page = idle_pages.pop()
+                    # Pages of a context replaced after a crash are dropped
+                    if page.context is self.context and not page.is_closed():
+                        return page
+                page = await self.context.new_page()
+                page.on("crash", crashed_pages.add)
+                open_pages.append(page)
+                return page
+            
+            def put_page(page):
+                if page in crashed_pages or page.is_closed():
+                    logger.warning("Capture page crashed, opening a new one for the next panel")
+                    return
+                idle_pages.append(page)
+            
+            async def capture_with_browser(dashboard_uid, panel_id, width, height):
+                if use_workers:
+                    panel_url = grafana_service.get_panel_url(
+                        dashboard_uid, panel_id, width, height,
+                        theme=theme, time_from=time_from, time_to=time_to)
+                    return await self.capture_workers.capture_panel(
+                        self._get_connection(), panel_url, width, height, grafana_version,
+                        selector=self._get_grafana_selector(grafana_version),
+                        vector=vector_capture,
+                        encoding=image_encoding,
+                        capture_settings=capture_settings,
+                        timeout=panel_timeout,
+                        timings=self.capture_stats
+                    )
+                
+                page = await get_page()
+                try:
+                    # Generate panel URL
+                    panel_url = grafana_service.get_panel_url(
+                        dashboard_uid,
+                        panel_id,
+                        width,
+                        height,
+                        theme=theme,
+                        time_from=time_from,
+                        time_to=time_to
+                    )
+                    return await self.capture_panel(panel_url, width, height, grafana_version,
+                                                    page=page, vector=vector_capture,
+                                                    encoding=image_encoding, timings=self.capture_stats)
+                finally:
+                    put_page(page)
+            
+            async def capture_with_renderer(dashboard_uid, panel_id, width, height):
+                render_url = grafana_service.get_panel_render_url(
+                    dashboard_uid,
+                    panel_id,
+                    width,
+                    height,
+                    theme=theme,
+                    time_from=time_from,
+                    time_to=time_to,
+                    scale=capture_scale
+                )
+                if self.api_token:
+                    image = await self.render_client.fetch_panel(
+                        render_url,
+                        headers={"Authorization": f"Bearer {self.api_token}"}
+                    )
+                else:
+                    image = await self.render_client.fetch_panel(
+                        render_url,
+                        auth=aiohttp.BasicAuth(self.grafana_username, self.grafana_password)
+                    )
+                if image_encoding["format"] == "png":
+                    return image
+                # The render endpoint always delivers PNG
+                encode_started = time.monotonic()
+                image = BytesIO(await asyncio.to_thread(self._encode_image, image.getvalue(), image_encoding))
+                self.capture_stats["encode_seconds"] += time.monotonic() - encode_started
+                return image
+            
+            def time_left():
+                return report_deadline - time.monotonic()
+            
+            def raise_if_cancelled(message):
                 if job_id and self.check_job_cancelled(job_id):
-                    logger.info(f"Job {job_id} was cancelled during panel capture")
+                    logger.info(f"Job {job_id} was cancelled {message}")
                     if progress_callback:
                         progress_callback(job_id, -1, "Report generation cancelled")
                     raise Exception("Report generation cancelled by user")
+            
+            async def capture_once(dashboard_uid, panel_id, width, height):
+                # Capture the panel, falling back to the browser if the render endpoint fails
+                if self.capture_backend == "render" and self.render_client:
+                    try:
+                        return await capture_with_renderer(dashboard_uid, panel_id, width, height)
+                    except Exception as e:
+                        logger.warning(f"Render endpoint failed for panel {panel_id}, "
+                                       f"falling back to Playwright: {str(e)}")
+                return await capture_with_browser(dashboard_uid, panel_id, width, height)
+            
+            async def recover_browser(failed_context):
+                # One relaunch per crash, captures hit by the same crash find the context replaced
+                if failed_context is None:
+                    return False
+                if self.context is not failed_context:
+                    return True
+                if self.capture_stats["browser_recoveries"] >= browser_recoveries:
+                    return False
+                try:
+                    if await self._recover_context(failed_context):
+                        self.capture_stats["browser_recoveries"] += 1
+                        return True
+                except Exception as e:
+                    logger.error(f"Error relaunching browser after crash: {str(e)}")
+                    return False
+                return self.context is not failed_context and self.context is not None
+            
+            async def capture_with_retries(dashboard_uid, panel_id, width, height, on_start=None):
+                # Every attempt gets its own time budget, all of them together the rest of the report budget.
+                # Each attempt takes a capture slot, other panels use it during the backoff
+                last_error = "Report timeout exceeded before the panel could be captured"
+                attempt = 0
+                while attempt <= panel_retries:
+                    async with semaphore:
+                        raise_if_cancelled("during panel capture")
+                        if on_start:
+                            on_start()
+                            on_start = None
+                        
+                        timeout = min(panel_timeout, time_left())
+                        if timeout <= 0:
+                            break
+                        attempt_context = self.context
+                        try:
+                            return await asyncio.wait_for(capture_once(dashboard_uid, panel_id, width, height),
+                                                          timeout)
+                        except asyncio.TimeoutError:
+                            last_error = f"Capture timed out after {timeout:.1f} seconds"
+                        except Exception as e:
+                            last_error = str(e) or type(e).__name__
+                            if self._is_browser_crash(e) and await recover_browser(attempt_context):
+                                # The browser failed, not the panel: capture it again in the new context
+                                logger.warning(f"Capturing panel {panel_id} again after browser crash: {last_error}")
+                                continue
                     
+                    attempt += 1
+                    if attempt <= panel_retries:
+                        delay = min(panel_retry_backoff * 2 ** (attempt - 1), max(0, time_left()))
+                        logger.warning(f"Capture of panel {panel_id} failed (attempt {attempt}/"
+                                       f"{panel_retries + 1}), retrying in {delay:.1f}s: {last_error}")
+                        await asyncio.sleep(delay)
+                raise Exception(last_error)
+            
+            async def capture_dashboard(dashboard_uid, panel_sizes):
+                panel_ids = list(panel_sizes)
+                panel_sizes = {str(panel_id): size for panel_id, size in panel_sizes.items()}
+                async with semaphore:
+                    timeout = min(panel_timeout, time_left())
+                    if timeout <= 0:
+                        raise Exception("Report timeout exceeded")
+                    dashboard_url = grafana_service.get_dashboard_url(
+                        dashboard_uid,
+                        theme=theme,
+                        time_from=time_from,
+                        time_to=time_to
+                    )
+                    if use_workers:
+                        return await asyncio.wait_for(self.capture_workers.capture_dashboard_panels(
+                            self._get_connection(), dashboard_url, panel_ids, dashboard_capture_width,
+                            encoding=image_encoding, capture_settings=capture_settings, timeout=timeout,
+                            timings=self.capture_stats, panel_sizes=panel_sizes), timeout)
+                    page = await get_page()
+                    try:
+                        return await asyncio.wait_for(self.capture_dashboard_panels(
+                            dashboard_url, panel_ids, dashboard_capture_width, page=page,
+                            encoding=image_encoding, timings=self.capture_stats, panel_sizes=panel_sizes), timeout)
+                    finally:
+                        put_page(page)
+            
+            # Page geometry comes first, panels are captured at the size of their target cell
+            geometry = self._compute_page_geometry(
+                self._ensure_numeric_values(template_config),
+                {"rows": layout_config["rows"], "columns": layout_config["columns"]}
+            )
+            capture_scale = self._get_capture_scale()
+            vector_capture = self._is_vector_capture()
+            
+            def panel_size(panel_item):
+                # CSS pixels of the cell, the device scale factor adds the resolution
+                _, _, width, height = self._get_panel_box(panel_item, geometry)
+                return round(width * self.CSS_PIXELS_PER_POINT), round(height * self.CSS_PIXELS_PER_POINT)
+            
+            dashboard_plan = await self._plan_dashboard_captures(
+                layout_config["panels"], grafana_service, server_id, panel_size)
+            
+            def from_dashboard(panel_item):
+                # Only cells of the size the panel is resized to on the dashboard take its image
+                planned = dashboard_plan.get(panel_item["dashboardUid"], {})
+                return planned.get(panel_item["panelId"]) == panel_size(panel_item)
+            
+            # Look up panels captured by earlier reports before any page is opened
+            cached_images = {}
+            cache_keys = {}
+            cache_lookups = {}  # A panel placed several times is looked up once
+            cache_time_range = None
+            if self.panel_cache and self.panel_cache.is_available():
+                # Relative ranges are keyed by their absolute bounds, None keeps them out of the cache
+                cache_time_range = self.panel_cache.resolve_time_range(time_from, time_to)
+            if cache_time_range is not None:
+                dashboard_versions = {}
+                for dashboard_uid in {panel_item["dashboardUid"] for panel_item in layout_config["panels"]}:
+                    dashboard_versions[dashboard_uid] = await self._get_dashboard_version(
+                        grafana_service, dashboard_uid, server_id)
+                
+                for index, panel_item in enumerate(layout_config["panels"]):
+                    dashboard_uid = panel_item["dashboardUid"]
+                    if dashboard_versions.get(dashboard_uid) is None:
+                        continue
+                    width, height = panel_size(panel_item)
+                    if from_dashboard(panel_item):
+                        capture_url = grafana_service.get_dashboard_url(
+                            dashboard_uid, theme=theme, time_from=time_from, time_to=time_to)
+                        capture_url += f"#width={dashboard_capture_width}&size={width}x{height}"
+                    else:
+                        capture_url = grafana_service.get_panel_url(
+                            dashboard_uid, panel_item["panelId"], width, height,
+                            theme=theme, time_from=time_from, time_to=time_to)
+                    cache_key = self.panel_cache.make_key(
+                        server=self.grafana_url,
+                        org=layout_config.get("organizationId"),
+                        dashboard=dashboard_uid,
+                        version=dashboard_versions[dashboard_uid],
+                        panel=panel_item["panelId"],
+                        scale=capture_scale,
+                        vector=vector_capture,
+                        encoding=image_encoding,
+                        url=capture_url,
+                        time_range=cache_time_range
+                    )
+                    if cache_key not in cache_lookups:
+                        cache_lookups[cache_key] = self.panel_cache.get(cache_key)
+                    cached = cache_lookups[cache_key]
+                    if cached is not None:
+                        cached_images[index] = cached
+                    else:
+                        cache_keys[index] = cache_key
+                
+                # Dashboards whose panels are all cached need not be loaded
+                uncached = {(layout_config["panels"][index]["dashboardUid"], layout_config["panels"][index]["panelId"])
+                            for index in range(total_panels)
+                            if index not in cached_images and from_dashboard(layout_config["panels"][index])}
+                dashboard_plan = {
+                    dashboard_uid: {panel_id: size for panel_id, size in panel_sizes.items()
+                                    if (dashboard_uid, panel_id) in uncached}
+                    for dashboard_uid, panel_sizes in dashboard_plan.items()
+                }
+                dashboard_plan = {uid: panel_sizes for uid, panel_sizes in dashboard_plan.items() if panel_sizes}
+                cache_lookups.clear()
+                logger.debug(f"Panel cache: {len(cached_images)} of {total_panels} panels cached")
+            
+            # Dashboards contributing several panels are loaded once instead of once per panel
+            dashboard_tasks = {
+                dashboard_uid: asyncio.create_task(capture_dashboard(dashboard_uid, panel_sizes))
+                for dashboard_uid, panel_sizes in dashboard_plan.items()
+            }
+            
+            # Identical cells (same panel, size, theme and time range) are captured once,
+            # further occurrences wait for the first capture and reuse its image
+            shared_captures = {}
+            
+            def get_capture_key(panel_item):
+                width, height = panel_size(panel_item)
+                return (panel_item["dashboardUid"], panel_item["panelId"], width, height,
+                        theme, time_from, time_to)
+            
+            # The image of a shared capture is dropped once all of its occurrences took it
+            shared_users = {}
+            for index, panel_item in enumerate(layout_config["panels"]):
+                if index not in cached_images:
+                    capture_key = get_capture_key(panel_item)
+                    shared_users[capture_key] = shared_users.get(capture_key, 0) + 1
+            
+            def release_shared(capture_key):
+                shared_users[capture_key] -= 1
+                if shared_users[capture_key] <= 0:
+                    shared_captures.pop(capture_key, None)
+            
+            async def capture_item(index, panel_item):
+                nonlocal completed_panels
+                
+                if index in cached_images:
+                    panel_images[index] = {
+                        "image": BytesIO(cached_images.pop(index)),
+                        "x": panel_item["x"],
+                        "y": panel_item["y"],
+                        "w": panel_item["w"],
+                        "h": panel_item["h"],
+                        "title": panel_item.get("title", "")
+                    }
+                    self.capture_stats["cached"] += 1
+                    completed_panels += 1
+                    return
+                
+                width, height = panel_size(panel_item)
+                capture_key = get_capture_key(panel_item)
+                shared = shared_captures.get(capture_key)
+                if shared is not None:
+                    image_data, error = await shared
+                    release_shared(capture_key)
+                    panel_images[index] = {
+                        # Own buffer per layout item
+                        "image": BytesIO(image_data) if image_data is not None else None,
+                        "error": error,
+                        "x": panel_item["x"],
+                        "y": panel_item["y"],
+                        "w": panel_item["w"],
+                        "h": panel_item["h"],
+                        "title": panel_item.get("title", "")
+                    }
+                    self.capture_stats["deduplicated"] += 1
+                    completed_panels += 1
+                    return
+                
+                shared = asyncio.get_running_loop().create_future()
+                shared_captures[capture_key] = shared
+                try:
+                    await capture_unique(index, panel_item, width, height)
+                except BaseException:
+                    shared.cancel()
+                    raise
+                panel_image = panel_images[index]["image"]
+                shared.set_result((panel_image.getvalue() if panel_image is not None else None,
+                                   panel_images[index]["error"]))
+                release_shared(capture_key)
+            
+            async def capture_unique(index, panel_item, width, height):
+                nonlocal completed_panels
+                
+                # Wait without a capture slot, the dashboard capture needs one itself
+                dashboard_image = None
+                dashboard_task = dashboard_tasks.get(panel_item["dashboardUid"])
+                if dashboard_task and from_dashboard(panel_item):
+                    try:
+                        image = (await dashboard_task).get(str(panel_item["panelId"]))
+                        # Own buffer per layout item, a panel may appear more than once
+                        dashboard_image = BytesIO(image.getvalue()) if image else None
+                    except asyncio.TimeoutError:
+                        logger.warning(f"Dashboard capture of {panel_item['dashboardUid']} timed out, "
+                                       f"capturing panel {panel_item['panelId']} alone")
+                    except Exception as e:
+                        logger.warning(f"Dashboard capture of {panel_item['dashboardUid']} failed, "
+                                       f"capturing panel {panel_item['panelId']} alone: {str(e)}")
+                
+                # Check if job has been cancelled
+                raise_if_cancelled("during panel capture")
+                
                 dashboard_uid = panel_item["dashboardUid"]
                 panel_id = panel_item["panelId"]
 
-                # Calculate panel dimensions based on layout
-                width = 800  # Base width
-                height = 320  # Base height
+                def report_progress():
+                    # Report progress for panel capture
+                    if progress_callback and job_id:
+                        panel_name = panel_item.get("title", f"Panel {panel_id}")
+                        completed_percentage = login_weight + panel_weight * completed_panels
+                        progress_callback(
+                            job_id, 
+                            int(completed_percentage),
+                            f"Capturing panel {index+1}/{total_panels}: {panel_name}"
+                        )
 
-                # Generate panel URL
-                panel_url = grafana_service.get_panel_url(
-                    dashboard_uid,
-                    panel_id,
-                    width,
-                    height,
-                    theme=layout_config.get("theme", "dark"),
-                    time_from=time_from,
-                    time_to=time_to
-                )
-
-                # Report progress for panel capture
-                if progress_callback and job_id:
-                    panel_name = panel_item.get("title", f"Panel {panel_id}")
-                    completed_percentage = login_weight + panel_weight * completed_panels
-                    progress_callback(
-                        job_id, 
-                        int(completed_percentage),
-                        f"Capturing panel {completed_panels+1}/{total_panels}: {panel_name}"
-                    )
+                # A panel failing all attempts is drawn as placeholder, the report is still delivered.
+                # The capture slot is taken per attempt, see capture_with_retries
+                panel_image = dashboard_image
+                error = None
+                if panel_image is None:
+                    try:
+                        panel_image = await capture_with_retries(dashboard_uid, panel_id, width, height,
+                                                                 on_start=report_progress)
+                    except Exception as e:
+                        if job_id and self.check_job_cancelled(job_id):
+                            raise
+                        error = str(e)
+                        self.capture_stats["failed"] += 1
+                        logger.error(f"Giving up on panel {panel_id} of dashboard {dashboard_uid}: {error}")
+                        self.failed_panels.append({
+                            "dashboardUid": dashboard_uid,
+                            "panelId": panel_id,
+                            "title": panel_item.get("title", ""),
+                            "error": error
+                        })
+                else:
+                    report_progress()
 
-                # Capture the panel
-                panel_image = await self.capture_panel(panel_url, width, height, grafana_version)
+                if panel_image is not None:
+                    self.capture_stats["captured"] += 1
+                if panel_image is not None and index in cache_keys:
+                    self.panel_cache.put(cache_keys[index], panel_image.getvalue())
 
-                # Add to list with layout position
-                panel_images.append({
+                # Store at the layout position to keep the layout order
+                panel_images[index] = {
                     "image": panel_image,
+                    "error": error,
                     "x": panel_item["x"],
                     "y": panel_item["y"],
                     "w": panel_item["w"],
                     "h": panel_item["h"],
                     "title": panel_item.get("title", "")
-                })
+                }
                 
                 # Update progress
                 completed_panels += 1
+            
+            # Pages are drawn as soon as all of their panels are captured and their images are
+            # released then, so captures and PDF compilation overlap
+            rows_per_page = layout_config["rows"]
+            layout = {
+                "rows": layout_config["rows"],
+                "columns": layout_config["columns"]
+            }
+            page_panels = {}  # Page index -> layout indexes of its panels
+            for index, panel_item in enumerate(layout_config["panels"]):
+                page_panels.setdefault(panel_item["y"] // rows_per_page, []).append(index)
+            sorted_pages = sorted(page_panels.keys())
+            pending_panels = {page_index: len(indexes) for page_index, indexes in page_panels.items()}
+            page_ready = {page_index: asyncio.Event() for page_index in sorted_pages}
+            pdf_settings = self._get_pdf_settings(template_config)
+            self.capture_stats["image_dpi"] = pdf_settings["image_dpi"]
+            
+            # Images are embedded once per document, so the size an image is downsampled to
+            # covers every cell showing the same capture, including cells on later pages
+            capture_max_sizes = {}
+            if pdf_settings["image_dpi"] > 0:
+                for panel_item in layout_config["panels"]:
+                    self._merge_max_size(capture_max_sizes, get_capture_key(panel_item),
+                                         self._get_print_size(panel_item, geometry, pdf_settings["image_dpi"]))
+            
+            def get_image_max_sizes(page_index):
+                max_sizes = {}
+                for index in page_panels[page_index]:
+                    panel = panel_images[index]
+                    if panel["image"] is None or panel["image"].getvalue()[:5] == b"%PDF-":
+                        continue
+                    size = capture_max_sizes.get(get_capture_key(layout_config["panels"][index]))
+                    if size:
+                        self._merge_max_size(max_sizes, hashlib.sha1(panel["image"].getvalue()).hexdigest(), size)
+                return max_sizes
+            
+            async def capture_for_page(index, panel_item):
+                await capture_item(index, panel_item)
+                panel_image = panel_images[index]["image"]
+                if panel_image is not None:
+                    self.capture_stats["image_bytes"] += len(panel_image.getvalue())
+                page_index = panel_item["y"] // rows_per_page
+                pending_panels[page_index] -= 1
+                if pending_panels[page_index] == 0:
+                    page_ready[page_index].set()
+            
+            async def assemble_pdf():
+                # ReportLab drawing is synchronous, keep the event loop free for captures and other requests
+                document = await asyncio.to_thread(
+                    self._begin_pdf, template_config, layout, {"from": time_from, "to": time_to},
+                    grafana_version, pdf_settings["compress_pages"])
+                try:
+                    for page_number, page_index in enumerate(sorted_pages, start=1):
+                        await page_ready[page_index].wait()
+                        panels = [panel_images[index] for index in page_panels[page_index]]
+                        page_started = time.monotonic()
+                        image_max_sizes = get_image_max_sizes(page_index)
+                        prepared_images = {}
+                        if self.image_preparer and self.image_preparer.is_available():
+                            # Decode and convert images in parallel processes, drawing only embeds the results
+                            prepared_images = await self.image_preparer.prepare([
+                                panel["image"].getvalue() for panel in panels
+                                if panel["image"] is not None and panel["image"].getvalue()[:5] != b"%PDF-"
+                            ], image_encoding, image_max_sizes)
+                            self.capture_stats["prepare_seconds"] += sum(
+                                result["seconds"] for result in prepared_images.values())
+                        # Counted here on the event loop, the drawing thread only returns its time
+                        self.capture_stats["prepare_seconds"] += await asyncio.to_thread(
+                            self._draw_pdf_page, document, panels, page_number, len(sorted_pages),
+                            image_encoding, prepared_images, image_max_sizes)
+                        self.capture_stats["pdf_seconds"] += time.monotonic() - page_started
+                        for index in page_panels[page_index]:
+                            panel_images[index] = None
+                    
+                    finish_started = time.monotonic()
+                    pdf_data = await asyncio.to_thread(self._finish_pdf, document)
+                    if pdf_settings["linearize"]:
+                        pdf_data = await asyncio.to_thread(self._linearize_pdf, pdf_data)
+                    self.capture_stats["pdf_seconds"] += time.monotonic() - finish_started
+                    return pdf_data
+                except BaseException:
+                    document["buffer"].close()
+                    raise
+            
+            assembler = asyncio.create_task(assemble_pdf())
+            try:
+                try:
+                    tasks = [asyncio.create_task(capture_for_page(index, panel_item))
+                             for index, panel_item in enumerate(layout_config["panels"])]
+                    captures = asyncio.gather(*tasks)
+                    try:
+                        # A page that cannot be drawn stops the captures as well
+                        await asyncio.wait([captures, assembler], return_when=asyncio.FIRST_EXCEPTION)
+                        if assembler.done():
+                            assembler.result()
+                        await captures
+                    except BaseException:
+                        # Stop the remaining captures on the first failure or cancellation
+                        all_tasks = tasks + list(dashboard_tasks.values())
+                        for task in all_tasks:
+                            task.cancel()
+                        captures.cancel()
+                        await asyncio.gather(captures, *all_tasks, return_exceptions=True)
+                        raise
+                finally:
+                    for page in open_pages:
+                        try:
+                            await page.close()
+                        except Exception as e:
+                            logger.debug(f"Error closing capture page: {str(e)}")
                 
-            # Check if job has been cancelled before PDF compilation
-            if job_id and self.check_job_cancelled(job_id):
-                logger.info(f"Job {job_id} was cancelled before PDF compilation")
-                if progress_callback:
-                    progress_callback(job_id, -1, "Report generation cancelled")
-                raise Exception("Report generation cancelled by user")
+                self.capture_stats["capture_seconds"] = round(time.monotonic() - capture_started, 3)
+                logger.info(f"Panels of report captured in {self.capture_stats['capture_seconds']}s: "
+                            f"{self.capture_stats['captured']} captured, {self.capture_stats['cached']} cached, "
+                            f"{self.capture_stats['deduplicated']} reused from identical cells, "
+                            f"{self.capture_stats['failed']} failed, {self.capture_stats['image_bytes']} bytes of "
+                            f"{image_encoding['format']} images")
+                    
+                # Check if job has been cancelled before PDF compilation
+                if job_id and self.check_job_cancelled(job_id):
+                    logger.info(f"Job {job_id} was cancelled before PDF compilation")
+                    if progress_callback:
+                        progress_callback(job_id, -1, "Report generation cancelled")
+                    raise Exception("Report generation cancelled by user")
+                
+                # Report progress for PDF compilation starting
+                if progress_callback and job_id:
+                    completed_percentage = login_weight + panel_weight * total_panels
+                    progress_callback(job_id, int(completed_percentage), "All panels captured, compiling PDF")
+                
+                # Most pages are drawn by now, the last ones and the file are left
+                pdf_data = await assembler
+            except BaseException:
+                assembler.cancel()
+                await asyncio.gather(assembler, return_exceptions=True)
+                raise
             
-            # Report progress for PDF compilation starting
-            if progress_callback and job_id:
-                completed_percentage = login_weight + panel_weight * total_panels
-                progress_callback(job_id, int(completed_percentage), "All panels captured, compiling PDF")
-
-            # Generate the PDF with all panels and include time range
-            pdf_data = self._generate_multi_page_pdf(
-                panel_images=panel_images,
-                template=template_config,
-                layout={
-                    "rows": layout_config["rows"],
-                    "columns": layout_config["columns"]
-                },
-                time_range={"from": time_from, "to": time_to}
-            )
+            self.capture_stats["pdf_seconds"] = round(self.capture_stats["pdf_seconds"], 3)
+            pdf_data.seek(0, os.SEEK_END)
+            self.capture_stats["pdf_bytes"] = pdf_data.tell()
+            pdf_data.seek(0)
+            self.capture_stats["encode_seconds"] = round(self.capture_stats["encode_seconds"], 3)
+            self.capture_stats["prepare_seconds"] = round(self.capture_stats["prepare_seconds"], 3)
+            logger.info(f"PDF compiled in {self.capture_stats['pdf_seconds']}s: {self.capture_stats['pdf_bytes']} bytes, "
+                        f"{self.capture_stats['pdf_pages']} pages, {self.capture_stats['pdf_images']} images, "
+                        f"{self.capture_stats['downsampled_images']} downsampled")
             
             # Report completion
             if progress_callback and job_id:
-                progress_callback(job_id, 100, "PDF generation complete")
+                if self.failed_panels:
+                    progress_callback(job_id, 100, f"PDF generation complete, {len(self.failed_panels)} "
+                                                   f"of {total_panels} panels could not be captured")
+                else:
+                    progress_callback(job_id, 100, "PDF generation complete")
             
             return pdf_data
 
@@ -0,0 +1,133 @@
+import os
+import sys
+import asyncio
+import logging
+from typing import Dict, Any
+from io import BytesIO
+import aiohttp
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(os.environ.get('LOGLEVEL', 'DEBUG').upper())
+formatter = logging.Formatter("%(asctime)s [%(levelname)5s] %(name)30s: %(message)s")
+stream_handler = logging.StreamHandler(sys.stdout)
+stream_handler.setFormatter(formatter)
+logger.addHandler(stream_handler)
+
+class RenderClient:
+    """Fetch panel images from Grafana's /render endpoint over a pooled aiohttp session"""
+
+    def __init__(self, max_concurrency: int = 8, timeout: int = 60):
+        """
+        Initialize Render Client
+
+        Args:
+            max_concurrency: Maximum number of render requests running at the same time
+            timeout: Timeout of a single render request in seconds
+        """
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+
+        self._session = None
+        self._semaphore = None
+        self._loop = None
+
+        self.stats = {
+            "requests": 0,
+            "failures": 0
+        }
+
+    def configure(self, capture_settings: Dict[str, Any]):
+        """
+        Apply capture settings to the client
+
+        Args:
+            capture_settings: "capture" section of the application settings
+        """
+        if not capture_settings:
+            return
+        self.max_concurrency = int(capture_settings.get("renderEndpointConcurrency", self.max_concurrency))
+        self.timeout = int(capture_settings.get("renderEndpointTimeout", self.timeout))
+        if self._loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        logger.debug(f"Render client configured: max_concurrency={self.max_concurrency}, timeout={self.timeout}")
+
+    async def start(self):
+        """Open the pooled HTTP session on the current event loop"""
+        if self._session:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        # Grafana servers are frequently run with self-signed certificates, see verify=false in GrafanaService
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency, ssl=False)
+        )
+        logger.info("Render client started")
+
+    async def stop(self):
+        """Close the pooled HTTP session"""
+        if self._session:
+            await self._session.close()
+            self._session = None
+            logger.info("Render client stopped")
+        self._loop = None
+
+    def is_available(self) -> bool:
+        """
+        Check if the client can be used from the current event loop
+
+        Returns:
+            True if the session runs on the current event loop
+        """
+        if not self._session:
+            return False
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    async def fetch_panel(self, render_url: str, auth: aiohttp.BasicAuth = None,
+                          headers: Dict[str, str] = None) -> BytesIO:
+        """
+        Fetch a rendered panel image
+
+        Args:
+            render_url: Full /render/d-solo URL of the panel
+            auth: Optional basic auth credentials
+            headers: Optional request headers, e.g. a service account Authorization header
+
+        Returns:
+            BytesIO object containing the panel image
+        """
+        async with self._semaphore:
+            self.stats["requests"] += 1
+            try:
+                logger.debug(f"Fetching rendered panel from URL: {render_url}")
+                async with self._session.get(
+                    render_url,
+                    auth=auth,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout)
+                ) as response:
+                    content_type = response.headers.get("Content-Type", "")
+                    if response.status != 200 or not content_type.startswith("image/"):
+                        body = (await response.text())[:200]
+                        raise Exception(f"Render endpoint returned {response.status} ({content_type}): {body}")
+                    return BytesIO(await response.read())
+            except Exception:
+                self.stats["failures"] += 1
+                raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get client statistics
+
+        Returns:
+            Dict with request counters and configuration
+        """
+        return {
+            **self.stats,
+            "running": self._session is not None,
+            "max_concurrency": self.max_concurrency,
+            "timeout": self.timeout
+        }
@@ -0,0 +1,176 @@
+import os
+import sys
+import logging
+from collections import OrderedDict
+from typing import Dict, Any
+from playwright.async_api import BrowserContext, Route
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(os.environ.get('LOGLEVEL', 'DEBUG').upper())
+formatter = logging.Formatter("%(asctime)s [%(levelname)5s] %(name)30s: %(message)s")
+stream_handler = logging.StreamHandler(sys.stdout)
+stream_handler.setFormatter(formatter)
+logger.addHandler(stream_handler)
+
+class RequestFilter:
+    """Network interception for capture contexts: blocks resources panels do not need and caches static Grafana assets"""
+
+    # Resource types (Playwright request.resource_type) not needed to render panels
+    DEFAULT_BLOCKED_RESOURCE_TYPES = ["media", "font"]
+    # URL fragments of avatars, news feeds, live updates and telemetry
+    DEFAULT_BLOCKED_URL_PATTERNS = [
+        "/avatar/",
+        "/api/gnet/",
+        "/api/news",
+        "/api/live/",
+        "/api/frontend-metrics",
+        "/api/user/helpflags",
+        "grafana.com/api/",
+        "stats.grafana.org",
+        "rudderstack",
+        "google-analytics.com",
+        "googletagmanager.com"
+    ]
+    # Response headers describing the transfer, not the cached body
+    TRANSFER_HEADERS = ["content-encoding", "content-length", "transfer-encoding"]
+
+    def __init__(self, enabled: bool = True, asset_cache_mb: int = 64):
+        """
+        Initialize Request Filter
+
+        Args:
+            enabled: Whether requests are filtered at all
+            asset_cache_mb: Size limit of the static asset cache in MB (0 disables it)
+        """
+        self.enabled = enabled
+        self.blocked_resource_types = list(self.DEFAULT_BLOCKED_RESOURCE_TYPES)
+        self.blocked_url_patterns = list(self.DEFAULT_BLOCKED_URL_PATTERNS)
+        self.asset_cache_mb = asset_cache_mb
+
+        self._assets = OrderedDict()  # URL -> (status, headers, body), least recently used first
+        self._assets_size = 0
+
+        self.stats = {
+            "blocked": 0,
+            "asset_hits": 0,
+            "asset_misses": 0
+        }
+
+    def configure(self, capture_settings: Dict[str, Any]):
+        """
+        Apply capture settings to the filter, contexts already set up pick them up as well
+
+        Args:
+            capture_settings: "capture" section of the application settings
+        """
+        if not capture_settings:
+            return
+        self.enabled = capture_settings.get("blockResources", self.enabled)
+        self.blocked_resource_types = list(capture_settings.get("blockedResourceTypes", self.blocked_resource_types))
+        self.blocked_url_patterns = list(capture_settings.get("blockedUrlPatterns", self.blocked_url_patterns))
+        self.asset_cache_mb = int(capture_settings.get("staticAssetCacheMb", self.asset_cache_mb))
+        self._evict()
+        logger.debug(f"Request filter configured: enabled={self.enabled}, "
+                     f"blocked types={self.blocked_resource_types}, asset cache={self.asset_cache_mb}MB")
+
+    async def install(self, context: BrowserContext, grafana_url: str, api_token: str = None):
+        """
+        Route all requests of a context through the filter
+
+        Playwright disables the browser HTTP cache for routed contexts, static
+        assets below /public/ are therefore cached here and shared by all contexts.
+
+        Args:
+            context: Browser context to set up
+            grafana_url: Grafana base URL without trailing slash
+            api_token: Optional service account token sent as Authorization header to Grafana only
+        """
+        grafana_prefix = f"{grafana_url}/"
+        assets_prefix = f"{grafana_url}/public/"
+        authorization = f"Bearer {api_token}" if api_token else None
+
+        async def handle(route: Route):
+            request = route.request
+            url = request.url
+
+            if self.enabled and self._is_blocked(request.resource_type, url):
+                self.stats["blocked"] += 1
+                await route.abort("blockedbyclient")
+                return
+
+            headers = None
+            if authorization and url.startswith(grafana_prefix):
+                # Only sent to Grafana itself, not to plugin CDNs or other hosts
+                headers = {**request.headers, "authorization": authorization}
+
+            if request.method != "GET" or not url.startswith(assets_prefix) or self.asset_cache_mb <= 0:
+                await route.continue_(headers=headers)
+                return
+
+            cached = self._get_asset(url)
+            if cached:
+                self.stats["asset_hits"] += 1
+                status, asset_headers, body = cached
+                await route.fulfill(status=status, headers=asset_headers, body=body)
+                return
+
+            self.stats["asset_misses"] += 1
+            try:
+                response = await route.fetch(headers=headers)
+                body = await response.body()
+            except Exception as e:
+                logger.debug(f"Error fetching static asset {url}: {str(e)}")
+                await route.continue_(headers=headers)
+                return
+            if response.status == 200:
+                self._put_asset(url, response.status, response.headers, body)
+            await route.fulfill(response=response, body=body)
+
+        await context.route("**/*", handle)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get filter statistics
+
+        Returns:
+            Dict with counters and asset cache size
+        """
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "asset_entries": len(self._assets),
+            "asset_bytes": self._assets_size
+        }
+
+    def _is_blocked(self, resource_type: str, url: str) -> bool:
+        """Check a request against the blocked resource types and URL patterns"""
+        if resource_type == "document":
+            return False
+        if resource_type in self.blocked_resource_types:
+            return True
+        return any(pattern in url for pattern in self.blocked_url_patterns)
+
+    def _get_asset(self, url: str):
+        """Get a cached static asset"""
+        cached = self._assets.get(url)
+        if cached:
+            self._assets.move_to_end(url)
+        return cached
+
+    def _put_asset(self, url: str, status: int, headers: Dict[str, str], body: bytes):
+        """Cache a static asset, the body is stored decoded"""
+        headers = {k: v for k, v in headers.items() if k.lower() not in self.TRANSFER_HEADERS}
+        old = self._assets.pop(url, None)
+        if old:
+            self._assets_size -= len(old[2])
+        self._assets[url] = (status, headers, body)
+        self._assets_size += len(body)
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used assets above the size limit"""
+        limit = self.asset_cache_mb * 1024 * 1024
+        while self._assets and self._assets_size > limit:
+            _, (_, _, body) = self._assets.popitem(last=False)
+            self._assets_size -= len(body)
@@ -3,6 +3,7 @@ import sys
 import json
 import uuid
 import asyncio
+import base64
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
@@ -14,6 +15,7 @@ from typing import Dict, List, Any, Optional, Callable
 from io import BytesIO
 import logging
 import shutil
+import threading
 
 # Replace aiocron with APScheduler
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -37,6 +39,9 @@ logging.getLogger('apscheduler').addHandler(stream_handler)
 class SchedulerService:
     """Service to manage scheduled reports"""
     
+    # Chunk size (bytes) of copying generated PDFs into the history directory
+    PDF_CHUNK_SIZE = 256 * 1024
+    
     def __init__(self, schedules_dir: str = "schedules"):
         """
         Initialize Scheduler Service
@@ -49,11 +54,16 @@ class SchedulerService:
         self.grafana_service = None
         self.template_service = None
         self.layout_service = None
+        self.capture_services = {}  # Shared capture services passed to each PDFGenerator, bound to the application event loop
+        self.prewarm_seconds = 60  # Seconds before a scheduled run its session and dashboards are warmed up
+        self.prewarmed_runs = {}  # Job ID -> run time that was already pre-warmed
+        self.loop = None  # Application event loop the browser pool runs on
         self.email_settings = {}  # Store email settings from application config
         
         # Job queue and processing
         self.job_queue = []  # Simple list as a queue
         self.currently_running_job = None  # Track currently running job
+        self.queue_lock = threading.Lock()  # Queue is checked from scheduler threads and when a job is queued
 
         # Initialize the APScheduler
         self.scheduler = AsyncIOScheduler(
@@ -70,12 +80,22 @@ class SchedulerService:
             id='queue_processor',
             replace_existing=True
         )
+        
+        # Add a job to pre-warm sessions and dashboards of schedules about to run
+        self.scheduler.add_job(
+            self._check_prewarm,
+            'interval',
+            seconds=15,
+            id='prewarm_checker',
+            replace_existing=True
+        )
     
         # Create schedules directory if it doesn't exist
         if not os.path.exists(schedules_dir):
             os.makedirs(schedules_dir)
     
-    def initialize(self, grafana_service, template_service, layout_service, email_settings=None):
+    def initialize(self, grafana_service, template_service, layout_service, email_settings=None,
+                   capture_services=None, capture_settings=None):
         """
         Initialize the scheduler with required services
         
@@ -84,10 +104,18 @@ class SchedulerService:
             template_service: TemplateService instance
             layout_service: LayoutService instance
             email_settings: Optional email settings from application config
+            capture_services: Optional shared services for report generation, see PDFGenerator.from_connection
+            capture_settings: Optional "capture" section of the application settings
         """
         self.grafana_service = grafana_service
         self.template_service = template_service
         self.layout_service = layout_service
+        self.capture_services = capture_services or {}
+        self.update_capture_settings(capture_settings)
+        try:
+            self.loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.loop = None
                 
         if email_settings:
             self.email_settings = email_settings
@@ -114,6 +142,18 @@ class SchedulerService:
         self.email_settings = email_settings
         logger.info("Email settings updated in SchedulerService")
 
+    def update_capture_settings(self, capture_settings):
+        """
+        Update the capture settings used by the scheduler
+        
+        Args:
+            capture_settings: "capture" section of the application settings
+        """
+        if not capture_settings:
+            return
+        self.prewarm_seconds = max(0, int(capture_settings.get("prewarmSeconds", self.prewarm_seconds)))
+        logger.debug(f"Schedules are pre-warmed {self.prewarm_seconds}s before they run")
+
     async def shutdown(self):
         """Clean up active jobs on shutdown"""
         # Clear the job queue
@@ -490,14 +530,12 @@ class SchedulerService:
             self.grafana_service.set_current_server(server_id)
             grafana_conn = self.grafana_service.get_connection_info()
 
-            grafana_url = grafana_conn.get("url")
-            grafana_username = grafana_conn.get("username")
-            grafana_password = grafana_conn.get("password")
+            capture_backend = self.grafana_service.get_server_option("captureBackend", "playwright")
             
-            logger.info(f"Creating PDF Generator with Grafana URL: {grafana_url}")
+            logger.info(f"Creating PDF Generator with Grafana URL: {grafana_conn.get('url')}")
             
             # Create and initialize PDF generator
-            pdf_generator = PDFGenerator(grafana_url, grafana_username, grafana_password)
+            pdf_generator = PDFGenerator.from_connection(grafana_conn, capture_backend, self.capture_services)
             await pdf_generator.initialize()
             
             try:
@@ -521,15 +559,29 @@ class SchedulerService:
                 if not os.path.exists(history_dir):
                     os.makedirs(history_dir)
                 
-                # Save PDF to history
-                with open(history_file_path, 'wb') as f:
-                    pdf_data.seek(0)
-                    shutil.copyfileobj(pdf_data, f)
+                # Save PDF to history, copied in chunks from the spooled file
+                # in a thread, the report runs on the API event loop
+                def save_history_file():
+                    with open(history_file_path, 'wb') as f:
+                        pdf_data.seek(0)
+                        shutil.copyfileobj(pdf_data, f, self.PDF_CHUNK_SIZE)
+                
+                try:
+                    await asyncio.to_thread(save_history_file)
+                finally:
+                    pdf_data.close()
                 
                 # Update history entry with success and file path
                 history_entry["status"] = "completed"
                 history_entry["message"] = "Report generated successfully"
                 history_entry["file_path"] = filename
+                history_entry["capture_stats"] = pdf_generator.capture_stats
+                if pdf_generator.failed_panels:
+                    # Delivered with placeholders for the panels that could not be captured
+                    failed_count = len(pdf_generator.failed_panels)
+                    history_entry["message"] = f"Report generated, {failed_count} panels could not be captured"
+                    history_entry["failed_panels"] = pdf_generator.failed_panels
+                    logger.warning(f"Scheduled report {schedule_id}: {failed_count} panels could not be captured")
                 
                 # Send report via email if configured
                 email_config = schedule_data.get("schedule", {}).get("email", {})
@@ -537,7 +589,7 @@ class SchedulerService:
                     logger.info(f"Sending email for schedule {schedule_id}")
                     try:
                         await self._send_report_email(
-                            pdf_data=pdf_data,
+                            pdf_path=history_file_path,
                             schedule_name=schedule_data.get("name", "Grafana Report"),
                             email_config=email_config
                         )
@@ -625,12 +677,34 @@ class SchedulerService:
         with open(schedule_path, 'w') as f:
             json.dump(schedule_data, f, indent=2)
     
-    async def _send_report_email(self, pdf_data: BytesIO, schedule_name: str, email_config: Dict[str, Any]):
+    def _encode_pdf_base64(self, pdf_path: str, mime: bool = False) -> str:
+        """
+        Encode a PDF file as base64 in chunks, without holding the raw file in memory
+        
+        Args:
+            pdf_path: Path of the PDF file
+            mime: Break lines after 76 characters as MIME requires
+        
+        Returns:
+            Base64 encoded PDF
+        """
+        # Multiple of 57 bytes, which encode to exactly one 76 character MIME line
+        chunk_size = 57 * 4096
+        parts = []
+        with open(pdf_path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                parts.append(base64.encodebytes(chunk) if mime else base64.b64encode(chunk))
+        return b''.join(parts).decode('ascii')
+
+    async def _send_report_email(self, pdf_path: str, schedule_name: str, email_config: Dict[str, Any]):
         """
         Send report via email
         
         Args:
-            pdf_data: PDF report as BytesIO
+            pdf_path: Path of the PDF report in the history directory
             schedule_name: Name of the schedule
             email_config: Email configuration from the schedule
         """
@@ -646,7 +720,7 @@ class SchedulerService:
         if use_graph_api:
             # Send using Graph API
             await self._send_email_graph_api(
-                pdf_data=pdf_data,
+                pdf_path=pdf_path,
                 recipients=recipients,
                 subject=email_config.get("subject", f"Grafana Report: {schedule_name}"),
                 body=email_config.get("body", f"Attached is your scheduled Grafana report: {schedule_name}"),
@@ -679,18 +753,17 @@ class SchedulerService:
             # Add body
             msg.attach(MIMEText(body))
             
-            # Add PDF attachment
-            pdf_data.seek(0)
+            # Add PDF attachment, encoded from the history file in chunks.
+            # Reports run on the API event loop, file and network I/O go to a thread
             attachment = MIMEBase('application', 'pdf')
-            attachment.set_payload(pdf_data.read())
-            encoders.encode_base64(attachment)
+            attachment.set_payload(await asyncio.to_thread(self._encode_pdf_base64, pdf_path, mime=True))
+            attachment['Content-Transfer-Encoding'] = 'base64'
             timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
             filename = f"{schedule_name.replace(' ', '_')}-{timestamp}.pdf"
             attachment.add_header('Content-Disposition', f'attachment; filename="{filename}"')
             msg.attach(attachment)
             
-            # Send email
-            try:
+            def send_message():
                 with smtplib.SMTP(smtp_server, smtp_port) as server:
                     if use_tls:
                         server.starttls()
@@ -699,24 +772,27 @@ class SchedulerService:
                         server.login(smtp_user, smtp_password)
                     
                     server.send_message(msg)
-                    logger.info(f"Email sent to {', '.join(recipients)}")
+            
+            # Send email
+            try:
+                await asyncio.to_thread(send_message)
+                logger.info(f"Email sent to {', '.join(recipients)}")
                     
             except Exception as e:
                 logger.error(f"Error sending email: {str(e)}")
 
-    async def _send_email_graph_api(self, pdf_data: BytesIO, recipients: List[str], subject: str, body: str, filename: str):
+    async def _send_email_graph_api(self, pdf_path: str, recipients: List[str], subject: str, body: str, filename: str):
         """
         Send report via Microsoft Graph API
         
         Args:
-            pdf_data: PDF report as BytesIO
+            pdf_path: Path of the PDF report in the history directory
             recipients: List of email recipients
             subject: Email subject
             body: Email body
             filename: Attachment filename
         """
         try:
-            import base64
             import msal
             import requests
             import json
@@ -777,17 +853,19 @@ class SchedulerService:
                 logger.debug("Proxy assigned to MSAL Client")
                 session.proxies = proxies
             
-            app = msal.ConfidentialClientApplication(
-                client_id=client_id,
-                client_credential=client_secret,
-                authority=f"https://login.microsoftonline.com/{tenant_id}",
-                http_client=session if proxies else None
-            )
+            def acquire_token():
+                # MSAL discovers the tenant while the app is created, both steps block on HTTP
+                app = msal.ConfidentialClientApplication(
+                    client_id=client_id,
+                    client_credential=client_secret,
+                    authority=f"https://login.microsoftonline.com/{tenant_id}",
+                    http_client=session if proxies else None
+                )
+                return app.acquire_token_for_client(scopes=['https://graph.microsoft.com/.default'])
             
-            # Get token
+            # Get token, reports run on the API event loop, so blocking calls go to a thread
             logger.debug("Acquiring token for Graph API")
-            scopes = ['https://graph.microsoft.com/.default']
-            result = app.acquire_token_for_client(scopes=scopes)
+            result = await asyncio.to_thread(acquire_token)
             
             if "access_token" not in result:
                 logger.error(f"Failed to get Graph API token: {result.get('error_description')}")
@@ -796,10 +874,8 @@ class SchedulerService:
             # Prepare email with attachment
             token = result["access_token"]
             
-            # Get PDF data and encode as base64
-            pdf_data.seek(0)
-            pdf_bytes = pdf_data.read()
-            encoded_attachment = base64.b64encode(pdf_bytes).decode('utf-8')
+            # Encode the PDF from the history file as base64
+            encoded_attachment = await asyncio.to_thread(self._encode_pdf_base64, pdf_path)
             
             # Create email payload
             email_payload = {
@@ -832,17 +908,20 @@ class SchedulerService:
             
             # Use the same proxy configuration for the direct Graph API call
             request_kwargs = {
-                'headers': headers,
-                'data': json.dumps(email_payload)
+                'headers': headers
             }
             
             if proxies:
                 request_kwargs['proxies'] = proxies
             
-            response = requests.post(
-                f'https://graph.microsoft.com/v1.0/users/{sender_email}/sendMail',
-                **request_kwargs
-            )
+            def post_mail():
+                return requests.post(
+                    f'https://graph.microsoft.com/v1.0/users/{sender_email}/sendMail',
+                    data=json.dumps(email_payload),
+                    **request_kwargs
+                )
+            
+            response = await asyncio.to_thread(post_mail)
             
             if response.status_code >= 400:
                 logger.error(f"Error sending email via Graph API: {response.status_code} - {response.text}")
@@ -937,6 +1016,9 @@ class SchedulerService:
             logger.info(f"Job {schedule_id} added to queue. Queue length: {len(self.job_queue)}")
         else:
             logger.info(f"Job {schedule_id} already in queue")
+        
+        # Start right away if nothing is running instead of waiting for the next queue check
+        self._process_queue()
 
     # Synchrone Methode zur Überprüfung und zum Start des nächsten Jobs
     def _process_queue(self):
@@ -944,18 +1026,23 @@ class SchedulerService:
         Check the job queue and start the next job if none is running
         This is a synchronous method called by APScheduler
         """
-        # Skip if no jobs in queue or a job is already running
-        if not self.job_queue or self.currently_running_job:
-            return
-        
-        # Get next job from queue
-        schedule_id = self.job_queue.pop(0)
-        self.currently_running_job = schedule_id
+        with self.queue_lock:
+            # Skip if no jobs in queue or a job is already running
+            if not self.job_queue or self.currently_running_job:
+                return
+            
+            # Get next job from queue
+            schedule_id = self.job_queue.pop(0)
+            self.currently_running_job = schedule_id
         logger.info(f"Starting queued job for schedule: {schedule_id}")
+
+        # Run on the application loop where the shared browser pool and render client live,
+        # Playwright and aiohttp objects cannot be used from another event loop
+        if self.loop and self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._run_report_and_cleanup(schedule_id), self.loop)
+            return
         
         # Starte einen neuen Thread für die asynchrone Verarbeitung
-        import threading
-        
         def run_async_job():
             import asyncio
             loop = asyncio.new_event_loop()
@@ -970,6 +1057,76 @@ class SchedulerService:
         thread.daemon = True  # Daemon-Thread, um das Beenden des Hauptprogramms nicht zu blockieren
         thread.start()
 
+    def _check_prewarm(self):
+        """
+        Start the pre-warm of schedules whose next run is due within prewarm_seconds
+        This is a synchronous method called by APScheduler
+        """
+        if self.prewarm_seconds <= 0 or not (self.loop and self.loop.is_running()):
+            # Warmed contexts only help reports running on the application loop
+            return
+        
+        for job_id in list(self.active_jobs.keys()):
+            job = self.scheduler.get_job(job_id)
+            if not job or not job.next_run_time:
+                continue
+            seconds_left = (job.next_run_time - datetime.now(job.next_run_time.tzinfo)).total_seconds()
+            if not 0 < seconds_left <= self.prewarm_seconds:
+                continue
+            if self.prewarmed_runs.get(job_id) == job.next_run_time:
+                continue
+            
+            self.prewarmed_runs[job_id] = job.next_run_time
+            schedule_id = job_id[len("schedule_"):]
+            logger.info(f"Pre-warming schedule {schedule_id}, next run in {seconds_left:.0f}s")
+            asyncio.run_coroutine_threadsafe(self._prewarm_schedule(schedule_id), self.loop)
+
+    async def _prewarm_schedule(self, schedule_id: str):
+        """
+        Log in to the schedule's Grafana server and load its dashboards before the run
+        
+        Args:
+            schedule_id: Schedule ID
+        """
+        try:
+            schedule_data = self.get_schedule(schedule_id)
+            layout_data = self.layout_service.get_layout(schedule_data.get("layoutId")) if schedule_data else None
+            if not layout_data:
+                logger.debug(f"Nothing to pre-warm for schedule {schedule_id}")
+                return
+            
+            # No switch of the current server, a report may be running meanwhile
+            server_id = schedule_data.get("server_id") or layout_data.get("server_id")
+            grafana_conn = self.grafana_service.get_connection_info(server_id)
+            if not grafana_conn:
+                return
+            capture_backend = self.grafana_service.get_server_option("captureBackend", "playwright", server_id)
+            if capture_backend == "render":
+                logger.debug(f"Schedule {schedule_id} uses the render endpoint, no browser to pre-warm")
+                return
+            
+            time_range = layout_data.get("timeRange", {})
+            dashboard_urls = [
+                self.grafana_service.get_dashboard_url(
+                    dashboard_uid,
+                    theme=layout_data.get("theme", "dark"),
+                    time_from=time_range.get("from", "now-6h"),
+                    time_to=time_range.get("to", "now"),
+                    server_id=server_id
+                )
+                for dashboard_uid in dict.fromkeys(panel["dashboardUid"] for panel in layout_data.get("panels", []))
+            ]
+            
+            pdf_generator = PDFGenerator.from_connection(grafana_conn, capture_backend, self.capture_services)
+            try:
+                warmed = await pdf_generator.prewarm(dashboard_urls)
+            finally:
+                await pdf_generator.close()
+            logger.info(f"Pre-warmed schedule {schedule_id}: {warmed} of {len(dashboard_urls)} dashboards loaded")
+        except Exception as e:
+            # The run itself logs in and loads everything again if the pre-warm failed
+            logger.warning(f"Error pre-warming schedule {schedule_id}: {str(e)}")
+
     # Hilfsmethode für Report-Ausführung und Aufräumen
     async def _run_report_and_cleanup(self, schedule_id):
         """Run report and clean up after completion"""
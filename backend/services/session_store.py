@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, Any, Optional
+from services.encryption_service import EncryptionService
+
+# Configure logging
+logger = logging.getLogger(__name__)
+logger.setLevel(os.environ.get('LOGLEVEL', 'DEBUG').upper())
+formatter = logging.Formatter("%(asctime)s [%(levelname)5s] %(name)30s: %(message)s")
+stream_handler = logging.StreamHandler(sys.stdout)
+stream_handler.setFormatter(formatter)
+logger.addHandler(stream_handler)
+
+class SessionStore:
+    """Cache of authenticated Playwright storage states (Grafana session cookies) per server"""
+
+    def __init__(self, sessions_dir: str = "config/sessions", persist: bool = False):
+        """
+        Initialize Session Store
+
+        Args:
+            sessions_dir: Directory for persisted sessions
+            persist: Whether sessions are also written to disk (encrypted)
+        """
+        self.sessions_dir = sessions_dir
+        self.persist = persist
+        self.sessions = {}  # Session key -> storage state
+        self._encryption_service = None
+
+        self.stats = {
+            "logins": 0,
+            "reused": 0,
+            "invalidated": 0
+        }
+
+    def configure(self, capture_settings: Dict[str, Any]):
+        """
+        Apply capture settings to the store
+
+        Args:
+            capture_settings: "capture" section of the application settings
+        """
+        if not capture_settings:
+            return
+        self.persist = capture_settings.get("persistSessions", self.persist)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a stored session that has not expired yet
+
+        Args:
+            key: Session key identifying the Grafana server and user
+
+        Returns:
+            Playwright storage state or None
+        """
+        state = self.sessions.get(key)
+        if state is None and self.persist:
+            state = self._load(key)
+            if state:
+                self.sessions[key] = state
+
+        if state is None:
+            return None
+
+        if self._is_expired(state):
+            logger.debug(f"Stored Grafana session for '{key}' expired")
+            self.invalidate(key)
+            return None
+
+        return state
+
+    def put(self, key: str, state: Dict[str, Any]):
+        """
+        Store the session of a logged-in context
+
+        Args:
+            key: Session key identifying the Grafana server and user
+            state: Playwright storage state of the context
+        """
+        self.sessions[key] = state
+        if self.persist:
+            self._save(key, state)
+
+    def invalidate(self, key: str = None):
+        """
+        Drop a stored session, or all sessions if no key is given
+
+        Args:
+            key: Session key, or None to drop all sessions
+        """
+        keys = [key] if key else list(self.sessions.keys())
+        for session_key in keys:
+            if self.sessions.pop(session_key, None) is not None:
+                self.stats["invalidated"] += 1
+            session_path = self._get_path(session_key)
+            if os.path.exists(session_path):
+                try:
+                    os.remove(session_path)
+                except Exception as e:
+                    logger.warning(f"Error removing stored session {session_path}: {str(e)}")
+
+        if key is None and os.path.isdir(self.sessions_dir):
+            for filename in os.listdir(self.sessions_dir):
+                if filename.endswith(".json"):
+                    try:
+                        os.remove(os.path.join(self.sessions_dir, filename))
+                    except Exception as e:
+                        logger.warning(f"Error removing stored session {filename}: {str(e)}")
+
+    def _is_expired(self, state: Dict[str, Any]) -> bool:
+        """Check if any session cookie has passed its expiry time"""
+        now = time.time()
+        for cookie in state.get("cookies", []):
+            expires = cookie.get("expires", -1)
+            if expires and expires > 0 and expires < now:
+                return True
+        return False
+
+    def _get_path(self, key: str) -> str:
+        """Get the file path of a persisted session"""
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.sessions_dir, f"{digest}.json")
+
+    def _get_encryption_service(self) -> EncryptionService:
+        """Create the encryption service on first use"""
+        if self._encryption_service is None:
+            self._encryption_service = EncryptionService()
+        return self._encryption_service
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Load a persisted session from disk"""
+        session_path = self._get_path(key)
+        if not os.path.exists(session_path):
+            return None
+        try:
+            with open(session_path, 'r') as f:
+                data = json.load(f)
+            state = json.loads(self._get_encryption_service().decrypt(data["state"]))
+            logger.debug(f"Loaded stored Grafana session for '{key}'")
+            return state
+        except Exception as e:
+            logger.warning(f"Error loading stored session for '{key}': {str(e)}")
+            return None
+
+    def _save(self, key: str, state: Dict[str, Any]):
+        """Write a session to disk, cookies are encrypted like passwords in the settings"""
+        try:
+            if not os.path.exists(self.sessions_dir):
+                os.makedirs(self.sessions_dir)
+            with open(self._get_path(key), 'w') as f:
+                json.dump({
+                    "state": self._get_encryption_service().encrypt(json.dumps(state))
+                }, f)
+        except Exception as e:
+            logger.warning(f"Error saving session for '{key}': {str(e)}")
@@ -33,6 +33,9 @@ class SettingsService:
         # Create encryption service
         self.encryption_service = EncryptionService()
         
+        # Grafana selectors compiled from the settings, see get_grafana_selector
+        self._selector_table = None
+        
         # Create settings directory if it doesn't exist
         if not os.path.exists(settings_dir):
             logger.info(f"Creating settings directory: {settings_dir}")
@@ -78,6 +81,8 @@ class SettingsService:
             for server in settings["grafana_servers"]:
                 if "password" in server:
                     server["password"] = self.encryption_service.decrypt(server["password"])
+                if server.get("apiToken"):
+                    server["apiToken"] = self.encryption_service.decrypt(server["apiToken"])
         
         # Rest of the method remains unchanged for email and LDAP passwords
         if "email" in settings:
@@ -140,6 +145,10 @@ class SettingsService:
                         server["password"] = self.encryption_service.encrypt(
                             server["password"]
                         )
+                    if server.get("apiToken"):
+                        server["apiToken"] = self.encryption_service.encrypt(
+                            server["apiToken"]
+                        )
             
             if "email" in settings_to_save:
                 if "password" in settings_to_save["email"]:
@@ -164,6 +173,7 @@ class SettingsService:
             # Save to file
             with open(self.settings_path, 'w') as f:
                 json.dump(settings_to_save, f, indent=2)
+            self.invalidate_cache()
             
             logger.info("Settings updated successfully")
             return True
@@ -171,6 +181,45 @@ class SettingsService:
             logger.error(f"Error updating settings: {str(e)}")
             return False
     
+    def get_grafana_selector(self, grafana_version: str) -> Optional[str]:
+        """
+        Get the panel selector configured for a Grafana version
+        
+        The grafana_selectors list is compiled once into (version prefix, selector)
+        pairs and results are remembered per version, so capturing a panel does not
+        read and decrypt the settings file.
+        
+        Args:
+            grafana_version: Grafana version string, e.g. "11.2.0"
+            
+        Returns:
+            Selector of the first entry whose version prefix matches, or None
+        """
+        if self._selector_table is None:
+            settings = self.get_settings() or {}
+            self._selector_table = {
+                "prefixes": [
+                    (selector_config.get("version", ""), selector_config["selector"])
+                    for selector_config in settings.get("grafana_selectors", [])
+                    if selector_config.get("selector")
+                ],
+                "versions": {}
+            }
+            logger.debug(f"Compiled {len(self._selector_table['prefixes'])} Grafana selectors")
+        
+        versions = self._selector_table["versions"]
+        if grafana_version not in versions:
+            versions[grafana_version] = next(
+                (selector for prefix, selector in self._selector_table["prefixes"]
+                 if grafana_version.startswith(prefix)),
+                None
+            )
+        return versions[grafana_version]
+    
+    def invalidate_cache(self):
+        """Drop values compiled from the settings file, e.g. after it was changed"""
+        self._selector_table = None
+    
     def _create_default_settings(self) -> Dict[str, Any]:
         """
         Create default settings file and return default settings
@@ -213,6 +262,38 @@ class SettingsService:
                     "selector": "data-testid panel content"
                 }
             ],
+            # Panel capture and browser pool settings
+            "capture": {
+                "browserPool": True,
+                "maxPagesPerBrowser": 500,
+                "renderMaxWait": 30,
+                "renderQuietPeriod": 0.5,
+                "captureScale": 2,
+                "vectorCapture": False,
+                "renderEndpointConcurrency": 8,
+                "renderEndpointTimeout": 60,
+                "persistSessions": False,
+                "dashboardCaptureMinPanels": 2,
+                "dashboardCaptureMinShare": 0.5,
+                "dashboardCaptureWidth": 1600,
+                "panelCache": True,
+                "panelCacheTtl": 300,
+                "panelCacheMemoryMb": 64,
+                "panelCacheDiskMb": 512,
+                "panelCacheTimeStep": 60,
+                "blockResources": True,
+                "staticAssetCacheMb": 64,
+                "panelTimeout": 60,
+                "panelRetries": 2,
+                "panelRetryBackoff": 2,
+                "reportTimeout": 900,
+                "browserRecoveries": 2,
+                "captureWorkers": 0,
+                "captureWorkerPages": 2,
+                "prewarmSeconds": 60,
+                "pdfImageWorkers": 4,
+                "pdfSpoolMb": 8
+            },
             # Keep the legacy "grafana" field for backward compatibility
             "grafana": {
                 "url": "LEGACY - NOT IN USE",
@@ -261,6 +342,7 @@ class SettingsService:
         try:
             with open(self.settings_path, 'w') as f:
                 json.dump(default_settings, f, indent=2)
+            self.invalidate_cache()
             logger.info(f"Default settings created at {self.settings_path}")
         except Exception as e:
             logger.error(f"Error creating default settings: {str(e)}")
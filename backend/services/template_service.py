@@ -204,6 +204,15 @@ class TemplateService:
                 "marginBottom": 20,
                 "marginLeft": 20,
                 "marginRight": 20
+            },
+            "image": {
+                "format": "png",
+                "quality": 85
+            },
+            "pdf": {
+                "imageDpi": 0,
+                "compressPages": True,
+                "linearize": False
             }
         }
         
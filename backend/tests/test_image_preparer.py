@@ -0,0 +1,75 @@
+import re
+import zlib
+from io import BytesIO
+
+from PIL import Image as PILImage
+from reportlab import rl_config
+from reportlab.pdfgen import canvas
+
+from services.image_preparer import prepare_image, embed_flate_image, draw_flate_image
+
+
+def encode_png(image):
+    data = BytesIO()
+    image.save(data, "PNG")
+    return data.getvalue()
+
+
+def image_objects(pdf_data):
+    """Dictionary and stream of every image XObject in an uncompressed-xref PDF"""
+    return re.findall(rb"<<([^>]*/Subtype /Image[^>]*)>>\s*stream\r?\n(.*?)endstream", pdf_data, re.S)
+
+
+def test_prepare_image_compresses_pixels():
+    image = PILImage.new("RGB", (40, 20), (10, 20, 30))
+    result = prepare_image(encode_png(image), {"format": "png"})
+
+    assert result["kind"] == "flate"
+    assert result["mode"] == "RGB"
+    assert tuple(result["size"]) == (40, 20)
+    assert zlib.decompress(result["data"]) == image.tobytes()
+    assert result["downsampled"] is False
+
+
+def test_prepare_image_downsamples_and_drops_alpha():
+    image = PILImage.new("RGBA", (300, 200), (255, 0, 0, 128))
+    result = prepare_image(encode_png(image), {"format": "png"}, (150, 150))
+
+    assert result["mode"] == "RGB"
+    assert tuple(result["size"]) == (150, 100)
+    assert result["downsampled"] is True
+
+
+def test_prepare_image_keeps_jpeg():
+    data = BytesIO()
+    PILImage.new("RGB", (30, 30), (0, 128, 0)).save(data, "JPEG")
+    result = prepare_image(data.getvalue(), {"format": "jpeg", "quality": 85})
+
+    assert result == {"kind": "jpeg", "data": data.getvalue(), "downsampled": False, "seconds": result["seconds"]}
+
+
+def test_flate_image_is_embedded_once_with_the_prepared_stream(monkeypatch):
+    monkeypatch.setattr(rl_config, "useA85", 0)
+    image = PILImage.new("RGB", (64, 32), (200, 100, 50))
+    result = prepare_image(encode_png(image), {"format": "png"})
+
+    output = BytesIO()
+    pdf = canvas.Canvas(output, pageCompression=0)
+    for _ in range(2):
+        # Same name on every page, as for a panel placed more than once
+        embed_flate_image(pdf, "image-test", result)
+        draw_flate_image(pdf, "image-test", result["size"], 10, 10, 200, 200)
+        pdf.showPage()
+    pdf.save()
+    pdf_data = output.getvalue()
+
+    images = image_objects(pdf_data)
+    assert len(images) == 1
+    dictionary, stream = images[0]
+    assert b"/Filter [ /FlateDecode ]" in dictionary
+    assert b"/Width 64" in dictionary and b"/Height 32" in dictionary
+    assert stream.rstrip(b"\r\n") == result["data"]
+
+    # Both pages draw it, fitted into the box with its aspect ratio
+    assert pdf_data.count(b"/FormXob.image-test Do") == 2
+    assert b"200 0 0 100 10 60 cm" in pdf_data
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from services.panel_cache import PanelCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_700_000_050.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_make_key_ignores_argument_order():
+    key = PanelCache.make_key(server="a", panel=2, time_range={"from": "now-6h", "to": "now"})
+
+    assert key == PanelCache.make_key(time_range={"to": "now", "from": "now-6h"}, panel=2, server="a")
+    assert key != PanelCache.make_key(server="a", panel=3, time_range={"from": "now-6h", "to": "now"})
+
+
+def test_get_returns_stored_image_until_it_expires(tmp_path, clock):
+    cache = PanelCache(str(tmp_path), ttl=60)
+    cache.put("key", b"image")
+
+    clock[0] += 59
+    assert cache.get("key") == b"image"
+    clock[0] += 1
+    assert cache.get("key") is None
+    assert cache.stats["memory_hits"] == 1
+    assert cache.stats["expired"] == 2  # Dropped from memory and from disk
+    assert not (tmp_path / "key.img").exists()
+
+
+def test_disk_tier_is_used_by_a_new_cache(tmp_path, clock):
+    PanelCache(str(tmp_path), ttl=60).put("key", b"image")
+
+    cache = PanelCache(str(tmp_path), ttl=60)
+    assert cache.get("key") == b"image"
+    assert cache.get("key") == b"image"
+    assert cache.stats["disk_hits"] == 1
+    assert cache.stats["memory_hits"] == 1
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = PanelCache(str(tmp_path), memory_max_mb=1, disk_max_mb=0)
+    image = b"x" * (400 * 1024)
+    cache.put("first", image)
+    cache.put("second", image)
+    cache.get("first")
+    cache.put("third", image)
+
+    assert cache.get("second") is None
+    assert cache.get("first") == image
+    assert cache.stats["evictions"] == 1
+
+
+def test_relative_time_range_resolves_to_the_time_step(clock):
+    cache = PanelCache(time_step=60)
+    time_range = cache.resolve_time_range("now-6h", "now")
+
+    assert time_range == {"from": "now-6h", "to": "now",
+                          "from_resolved": 1_700_000_040 - 6 * 3600,
+                          "to_resolved": 1_700_000_040}
+    # Same window within the step, a new one after it
+    clock[0] += 49
+    assert cache.resolve_time_range("now-6h", "now") == time_range
+    clock[0] += 1
+    assert cache.resolve_time_range("now-6h", "now")["to_resolved"] == 1_700_000_100
+
+
+def test_absolute_time_range_is_kept(clock):
+    cache = PanelCache(time_step=60)
+
+    assert cache.resolve_time_range("1700000000000", "1700003600000") == {
+        "from": "1700000000000", "to": "1700003600000"}
+
+
+def test_relative_time_range_is_not_cached_without_time_step(clock):
+    assert PanelCache(time_step=0).resolve_time_range("now-1d", "now") is None
+    assert PanelCache(time_step=60).resolve_time_range("now-1x", "now") is None
@@ -0,0 +1,139 @@
+import tempfile
+
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi import HTTPException
+
+from api.pdf_download import (
+    parse_range, iter_pdf_data, stream_pdf_data, open_pdf_reader, release_pdf_reader, close_pdf_data
+)
+
+
+PDF = b"%PDF-1.4\n" + bytes(range(256)) * 4 + b"%%EOF\n"
+
+
+def make_pdf_data():
+    pdf_data = tempfile.SpooledTemporaryFile(max_size=64)
+    pdf_data.write(PDF)
+    pdf_data.seek(0)
+    return pdf_data
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 100)),
+    ("bytes=100-", (100, 1000)),
+    ("bytes=-300", (700, 1000)),
+    ("bytes=900-5000", (900, 1000)),
+    ("bytes=-5000", (0, 1000)),
+    ("bytes=0-9,20-29", None),
+    ("items=0-9", None),
+    ("bytes=a-b", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1500-2000", "bytes=50-10"])
+def test_parse_range_outside_the_file(header):
+    with pytest.raises(HTTPException) as error:
+        parse_range(header, 1000)
+
+    assert error.value.status_code == 416
+    assert error.value.headers["Content-Range"] == "bytes */1000"
+
+
+def test_iter_pdf_data_reads_the_range(monkeypatch):
+    monkeypatch.setattr("api.pdf_download.PDF_CHUNK_SIZE", 100)
+    pdf_data = make_pdf_data()
+
+    assert b"".join(iter_pdf_data(pdf_data)) == PDF
+    chunks = list(iter_pdf_data(pdf_data, 150, 420))
+    assert [len(chunk) for chunk in chunks] == [100, 100, 70]
+    assert b"".join(chunks) == PDF[150:420]
+
+
+def test_close_is_deferred_until_the_last_download_is_released():
+    pdf_data = make_pdf_data()
+    assert open_pdf_reader(pdf_data)
+    assert open_pdf_reader(pdf_data)
+
+    close_pdf_data(pdf_data)
+    assert not pdf_data.closed
+    # The expired job accepts no new downloads
+    assert not open_pdf_reader(pdf_data)
+
+    release_pdf_reader(pdf_data)
+    assert not pdf_data.closed
+    release_pdf_reader(pdf_data)
+    assert pdf_data.closed
+
+
+def test_close_without_downloads_is_immediate():
+    pdf_data = make_pdf_data()
+    assert open_pdf_reader(pdf_data)
+    release_pdf_reader(pdf_data)
+
+    close_pdf_data(pdf_data)
+    assert pdf_data.closed
+    assert not open_pdf_reader(pdf_data)
+
+
+def test_stream_releases_the_reader_when_dropped():
+    pdf_data = make_pdf_data()
+    assert open_pdf_reader(pdf_data)
+    chunks = stream_pdf_data(pdf_data, 0, 10)
+    close_pdf_data(pdf_data)
+
+    assert next(chunks) == PDF[:10]
+    assert not pdf_data.closed
+    # A client disconnecting drops the unfinished stream
+    del chunks
+    assert pdf_data.closed
+
+
+@pytest.fixture
+def download_client(monkeypatch):
+    pytest.importorskip("httpx")
+    report_routes = pytest.importorskip("api.report_routes")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    progress_data = {"job": {"pdf_data": make_pdf_data()}}
+    monkeypatch.setattr(report_routes, "get_progress_data", lambda: progress_data)
+    app = FastAPI()
+    app.include_router(report_routes.router)
+    return TestClient(app)
+
+
+def test_download_serves_the_whole_pdf(download_client):
+    response = download_client.get("/api/download/job")
+
+    assert response.status_code == 200
+    assert response.content == PDF
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-length"] == str(len(PDF))
+
+
+def test_download_serves_a_range(download_client):
+    response = download_client.get("/api/download/job", headers={"Range": "bytes=10-19"})
+
+    assert response.status_code == 206
+    assert response.content == PDF[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(PDF)}"
+    assert response.headers["content-length"] == "10"
+
+
+def test_download_ignores_a_range_of_another_version(download_client):
+    response = download_client.get("/api/download/job",
+                                   headers={"Range": "bytes=10-19", "If-Range": '"other"'})
+
+    assert response.status_code == 200
+    assert response.content == PDF
+
+
+def test_download_rejects_a_range_outside_the_pdf(download_client):
+    response = download_client.get("/api/download/job", headers={"Range": f"bytes={len(PDF)}-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(PDF)}"
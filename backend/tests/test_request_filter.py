@@ -0,0 +1,133 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from services.request_filter import RequestFilter
+
+
+GRAFANA_URL = "http://grafana:3000"
+
+
+class FakeResponse:
+    status = 200
+    headers = {"content-type": "text/javascript", "content-encoding": "gzip", "content-length": "7"}
+
+    async def body(self):
+        return b"asset()"
+
+
+class FakeRoute:
+    """Records what the filter does with a request"""
+
+    def __init__(self, url, resource_type="script", method="GET"):
+        self.request = SimpleNamespace(url=url, resource_type=resource_type, method=method, headers={})
+        self.action = None
+        self.fetches = 0
+
+    async def abort(self, error_code=None):
+        self.action = ("abort", error_code)
+
+    async def continue_(self, headers=None):
+        self.action = ("continue", headers)
+
+    async def fetch(self, headers=None):
+        self.fetches += 1
+        return FakeResponse()
+
+    async def fulfill(self, **kwargs):
+        self.action = ("fulfill", kwargs)
+
+
+class FakeContext:
+    async def route(self, pattern, handler):
+        self.handler = handler
+
+
+def install(request_filter, api_token=None):
+    context = FakeContext()
+    asyncio.run(request_filter.install(context, GRAFANA_URL, api_token))
+    return context.handler
+
+
+def handle(handler, route):
+    asyncio.run(handler(route))
+    return route.action
+
+
+@pytest.mark.parametrize("resource_type, url, blocked", [
+    ("font", f"{GRAFANA_URL}/public/fonts/inter.woff2", True),
+    ("media", f"{GRAFANA_URL}/public/img/intro.mp4", True),
+    ("image", f"{GRAFANA_URL}/avatar/4e2f", True),
+    ("fetch", f"{GRAFANA_URL}/api/live/list", True),
+    ("script", "https://stats.grafana.org/grafana-usage-report", True),
+    ("fetch", f"{GRAFANA_URL}/api/ds/query", False),
+    ("script", f"{GRAFANA_URL}/public/build/app.js", False),
+    # The dashboard page itself is never blocked
+    ("document", f"{GRAFANA_URL}/api/news/d/abc", False),
+])
+def test_is_blocked(resource_type, url, blocked):
+    assert RequestFilter()._is_blocked(resource_type, url) is blocked
+
+
+def test_configure_replaces_the_blocked_lists():
+    request_filter = RequestFilter()
+    request_filter.configure({"blockedResourceTypes": ["image"], "blockedUrlPatterns": ["/api/search"]})
+
+    assert request_filter._is_blocked("image", f"{GRAFANA_URL}/public/img/logo.svg")
+    assert request_filter._is_blocked("fetch", f"{GRAFANA_URL}/api/search?query=")
+    assert not request_filter._is_blocked("font", f"{GRAFANA_URL}/public/fonts/inter.woff2")
+
+
+def test_blocked_request_is_aborted():
+    request_filter = RequestFilter()
+    handler = install(request_filter)
+
+    assert handle(handler, FakeRoute(f"{GRAFANA_URL}/avatar/4e2f", "image")) == ("abort", "blockedbyclient")
+    assert request_filter.stats["blocked"] == 1
+
+
+def test_disabled_filter_blocks_nothing():
+    handler = install(RequestFilter(enabled=False))
+
+    assert handle(handler, FakeRoute(f"{GRAFANA_URL}/avatar/4e2f", "image")) == ("continue", None)
+
+
+def test_api_token_is_only_sent_to_grafana():
+    handler = install(RequestFilter(), api_token="token")
+
+    assert handle(handler, FakeRoute(f"{GRAFANA_URL}/api/ds/query", "fetch", "POST")) == (
+        "continue", {"authorization": "Bearer token"})
+    assert handle(handler, FakeRoute("https://cdn.example.com/plugin.js")) == ("continue", None)
+
+
+def test_static_assets_are_fetched_once_and_stored_decoded():
+    request_filter = RequestFilter()
+    handler = install(request_filter)
+    url = f"{GRAFANA_URL}/public/build/app.js"
+
+    first = FakeRoute(url)
+    handle(handler, first)
+    second = FakeRoute(url)
+    action, response = handle(handler, second)
+
+    assert first.fetches == 1 and second.fetches == 0
+    assert action == "fulfill"
+    assert response == {"status": 200, "headers": {"content-type": "text/javascript"}, "body": b"asset()"}
+    assert request_filter.stats["asset_misses"] == 1
+    assert request_filter.stats["asset_hits"] == 1
+
+
+def test_asset_cache_evicts_least_recently_used():
+    request_filter = RequestFilter(asset_cache_mb=1)
+    asset = b"x" * (400 * 1024)
+    request_filter._put_asset("first", 200, {}, asset)
+    request_filter._put_asset("second", 200, {}, asset)
+    request_filter._get_asset("first")
+    request_filter._put_asset("third", 200, {}, asset)
+
+    assert request_filter._get_asset("second") is None
+    assert request_filter._get_asset("first") is not None
+    assert request_filter.get_stats()["asset_bytes"] == 2 * len(asset)
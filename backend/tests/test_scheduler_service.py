@@ -0,0 +1,111 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("apscheduler")
+scheduler_module = pytest.importorskip("services.scheduler_service")
+
+
+@pytest.fixture
+def service(tmp_path):
+    return scheduler_module.SchedulerService(str(tmp_path / "schedules"))
+
+
+@pytest.fixture
+def app_loop():
+    """Event loop running in its own thread, as the API loop does under uvicorn"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+def record_runs(service):
+    runs = []
+    done = threading.Event()
+
+    async def run_report_and_cleanup(schedule_id):
+        runs.append((schedule_id, asyncio.get_running_loop(), threading.get_ident()))
+        service.currently_running_job = None
+        done.set()
+
+    service._run_report_and_cleanup = run_report_and_cleanup
+    return runs, done
+
+
+def test_queued_report_runs_on_the_application_loop(service, app_loop):
+    service.loop = app_loop
+    runs, done = record_runs(service)
+    service.job_queue.append("daily")
+
+    # Called from an APScheduler thread
+    worker = threading.Thread(target=service._process_queue)
+    worker.start()
+    worker.join(5)
+
+    assert done.wait(5)
+    assert runs[0][0] == "daily"
+    assert runs[0][1] is app_loop
+
+
+def test_queued_report_gets_its_own_loop_without_application_loop(service):
+    runs, done = record_runs(service)
+    service.job_queue.append("daily")
+
+    service._process_queue()
+
+    assert done.wait(5)
+    assert runs[0][0] == "daily"
+    assert runs[0][2] != threading.get_ident()
+
+
+def test_queue_waits_for_the_running_job(service, app_loop):
+    service.loop = app_loop
+    runs, done = record_runs(service)
+    service.currently_running_job = "hourly"
+    service.job_queue.append("daily")
+
+    service._process_queue()
+
+    assert not done.wait(0.2)
+    assert service.job_queue == ["daily"]
+
+
+def test_smtp_session_runs_off_the_event_loop(service, tmp_path, monkeypatch):
+    sessions = []
+
+    class FakeSMTP:
+        def __init__(self, server, port):
+            sessions.append({"server": server, "port": port, "thread": threading.get_ident()})
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+        def send_message(self, msg):
+            sessions[-1]["message"] = msg
+
+    monkeypatch.setattr(scheduler_module.smtplib, "SMTP", FakeSMTP)
+    pdf_path = tmp_path / "report.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4\n%%EOF\n")
+    service.email_settings = {"server": "smtp.example.com", "port": 25, "useTLS": False}
+
+    async def send():
+        await service._send_report_email(str(pdf_path), "Daily Report", {"recipients": ["ops@example.com"]})
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(send())
+
+    assert len(sessions) == 1
+    assert sessions[0]["server"] == "smtp.example.com"
+    assert sessions[0]["thread"] != loop_thread
+    message = sessions[0]["message"]
+    assert message["To"] == "ops@example.com"
+    attachment = message.get_payload()[1]
+    assert attachment.get_payload(decode=True) == b"%PDF-1.4\n%%EOF\n"